@@ -0,0 +1,12 @@
+"""
+Benchmarks for the analysis API.
+
+    python -m benchmarks generate ./bench_media          # synthetic corpus
+    python -m benchmarks load --media ./bench_media --serve --mock-models
+    python -m benchmarks micro --baseline benchmarks/micro_baseline.json
+
+media        synthetic images and videos (offline, reproducible)
+load         end-to-end load driver: throughput and p50/p95/p99 per endpoint
+mock_models  app with the detectors replaced by fixed-latency stand-ins, for CI
+micro        per-analyzer microbenchmarks with a baseline regression gate
+"""
@@ -0,0 +1,228 @@
+"""
+python -m benchmarks <command>
+
+Commands:
+    generate   write a synthetic media corpus
+    load       drive every endpoint at a given concurrency and report latency percentiles
+    micro      time each analyzer function and gate on a saved baseline
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+# Run from anywhere: the backend modules import each other as top-level packages
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Longest a --serve server may take to report /ready (real models load first)
+READY_TIMEOUT_SECONDS = 600
+
+
+def _size(value: str):
+    width, _, height = value.lower().partition('x')
+    return int(width), int(height)
+
+
+def cmd_generate(args) -> int:
+    from benchmarks.media import generate_corpus
+    
+    manifest = generate_corpus(
+        args.output,
+        images_per_size=args.images_per_size,
+        image_sizes=args.image_sizes,
+        videos_per_size=args.videos_per_size,
+        video_sizes=args.video_sizes,
+        video_seconds=args.video_seconds,
+        audio=not args.no_audio,
+    )
+    images = sum(1 for entry in manifest if entry['kind'] == 'image')
+    print(f"Wrote {images} images and {len(manifest) - images} videos to {os.path.abspath(args.output)}")
+    return 0
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(args, work_dir: str):
+    """Run uvicorn on a free local port; returns (process, base URL)"""
+    port = _free_port()
+    env = dict(os.environ)
+    # Keep benchmark uploads and history out of the real ones
+    env.setdefault('UPLOAD_DIR', os.path.join(work_dir, 'uploads'))
+    env.setdefault('RESULT_STORE_PATH', os.path.join(work_dir, 'results.db'))
+    env.setdefault('RESULT_CACHE_DIR', '')
+    app = 'main:app'
+    if args.mock_models:
+        app = 'benchmarks.mock_models:app'
+        env['BENCH_MOCK_SCALE'] = str(args.mock_scale)
+    
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', app, '--host', '127.0.0.1', '--port', str(port),
+         '--log-level', 'warning'],
+        cwd=BACKEND_DIR, env=env
+    )
+    return process, f'http://127.0.0.1:{port}'
+
+
+def _wait_ready(base_url: str, process, timeout: float) -> bool:
+    import requests
+    
+    end = time.time() + timeout
+    while time.time() < end:
+        if process is not None and process.poll() is not None:
+            return False
+        try:
+            if requests.get(f'{base_url}/ready', timeout=5).status_code == 200:
+                return True
+        except requests.RequestException:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def cmd_load(args) -> int:
+    from benchmarks.load import LoadDriver, format_report, write_report
+    from benchmarks.media import MANIFEST_FILE, generate_corpus, load_corpus
+    
+    if not os.path.exists(os.path.join(args.media, MANIFEST_FILE)):
+        print(f"No corpus in {args.media}, generating one...")
+        generate_corpus(args.media)
+    corpus = load_corpus(args.media)
+    
+    process = None
+    work_dir = tempfile.mkdtemp(prefix='veritas-bench-')
+    base_url = args.url
+    try:
+        if args.serve:
+            process, base_url = _start_server(args, work_dir)
+            print(f"Started {'mock-model ' if args.mock_models else ''}server at {base_url}, waiting for /ready...")
+        if not _wait_ready(base_url, process, args.ready_timeout):
+            print(f"Error: {base_url} did not become ready", file=sys.stderr)
+            return 1
+        
+        driver = LoadDriver(base_url, corpus, unique=not args.cached)
+        try:
+            report = driver.run(args.endpoints, args.requests, args.concurrency)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+    
+    print()
+    print(format_report(report))
+    if args.output:
+        settings = {
+            'url': None if args.serve else base_url,
+            'mock_models': args.mock_models,
+            'mock_scale': args.mock_scale if args.mock_models else None,
+            'concurrency': args.concurrency,
+            'requests': args.requests,
+            'cached': args.cached,
+            'corpus': [{k: v for k, v in entry.items() if k != 'data'} for entry in corpus],
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        }
+        write_report(report, args.output, settings)
+        print(f"\nReport written to {args.output}")
+    return 0
+
+
+def cmd_micro(args) -> int:
+    from benchmarks.micro import (compare, format_comparison, load_baseline, run_benchmarks,
+                                  save_baseline)
+    
+    baseline = None
+    if args.baseline:
+        if os.path.exists(args.baseline):
+            try:
+                baseline = load_baseline(args.baseline)
+            except ValueError as e:
+                print(f"Error: {e}", file=sys.stderr)
+                return 2
+        elif not args.save_baseline:
+            print(f"Error: no baseline at {args.baseline} (create one with --save-baseline)", file=sys.stderr)
+            return 2
+    
+    results = run_benchmarks(args.only, args.repeat)
+    
+    passed = True
+    if baseline is not None:
+        rows, passed = compare(results, baseline, args.max_regression)
+        print()
+        print(format_comparison(rows, args.max_regression))
+    
+    if args.save_baseline:
+        save_baseline(results, args.save_baseline)
+        print(f"\nBaseline written to {args.save_baseline}")
+    
+    if not passed:
+        print("\nMicrobenchmark gate failed", file=sys.stderr)
+        return 1
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    from benchmarks.media import IMAGE_SIZES, VIDEO_SIZES
+    
+    parser = argparse.ArgumentParser(prog='python -m benchmarks')
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    generate = commands.add_parser('generate', help='Write a synthetic image/video corpus')
+    generate.add_argument('output', nargs='?', default='./bench_media', help='Corpus directory (default: ./bench_media)')
+    generate.add_argument('--images-per-size', type=int, default=3, help='Images per resolution (EXIF profiles rotate)')
+    generate.add_argument('--image-sizes', type=_size, nargs='+', default=list(IMAGE_SIZES), metavar='WxH')
+    generate.add_argument('--videos-per-size', type=int, default=1, help='Videos per resolution')
+    generate.add_argument('--video-sizes', type=_size, nargs='+', default=list(VIDEO_SIZES), metavar='WxH')
+    generate.add_argument('--video-seconds', type=float, default=3.0)
+    generate.add_argument('--no-audio', action='store_true', help="Don't mux an audio track (no ffmpeg needed)")
+    generate.set_defaults(func=cmd_generate)
+    
+    load = commands.add_parser('load', help='Drive the API endpoints and report latency percentiles')
+    load.add_argument('--media', default='./bench_media', help='Corpus directory (generated if missing)')
+    target = load.add_mutually_exclusive_group()
+    target.add_argument('--url', default='http://localhost:8000', help='Server to benchmark (default: http://localhost:8000)')
+    target.add_argument('--serve', action='store_true', help='Start a local server for the run')
+    load.add_argument('--mock-models', action='store_true',
+                      help='With --serve: replace the detectors with fixed-latency stand-ins (fast, offline CI runs)')
+    load.add_argument('--mock-scale', type=float, default=1.0, help='Multiplier for the mocked model latencies')
+    load.add_argument('--endpoints', nargs='+', metavar='NAME', help='Phases to run (default: all)')
+    load.add_argument('--concurrency', type=int, default=4, help='Requests in flight (default: 4)')
+    load.add_argument('--requests', type=int, default=20, help='Requests per endpoint (default: 20)')
+    load.add_argument('--cached', action='store_true',
+                      help='Re-send identical bytes (measures the result cache instead of analysis)')
+    load.add_argument('--ready-timeout', type=float, default=READY_TIMEOUT_SECONDS)
+    load.add_argument('-o', '--output', help='Also write the report as JSON')
+    load.set_defaults(func=cmd_load)
+    
+    micro = commands.add_parser('micro', help='Time each analyzer on fixed synthetic inputs')
+    micro.add_argument('--only', nargs='+', metavar='PATTERN',
+                       help="Benchmarks to run, as name patterns (e.g. 'analyze_metadata*')")
+    micro.add_argument('--repeat', type=int, default=5, help='Timed runs per benchmark, after one warm-up (default: 5)')
+    micro.add_argument('--baseline', help='Baseline JSON to compare against')
+    micro.add_argument('--max-regression', type=float, default=15.0,
+                       help='Fail when a median is this many percent slower than the baseline (default: 15)')
+    micro.add_argument('--save-baseline', metavar='PATH', help='Write this run as the new baseline')
+    micro.set_defaults(func=cmd_micro)
+    
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if getattr(args, 'mock_models', False) and not args.serve:
+        print("Error: --mock-models needs --serve", file=sys.stderr)
+        return 2
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
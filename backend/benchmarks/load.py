@@ -0,0 +1,266 @@
+"""
+End-to-end load driver.
+
+Runs one phase per endpoint against a live server: `requests` requests at
+`concurrency` in flight, each uploading media from a synthetic corpus
+(benchmarks.media). Every request is timed on the client, and each phase
+reports throughput and p50/p95/p99 latency for every endpoint it called
+(a job phase also calls POST /jobs and GET /jobs/{id}), plus the status
+codes seen.
+
+Uploads are made unique per request by default, so the numbers measure
+analysis rather than the result cache; pass unique=False to measure the
+cached path instead.
+"""
+import hashlib
+import itertools
+import json
+import math
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import requests
+
+from benchmarks.media import make_unique
+
+# Seconds between GET /jobs/{id} polls while waiting for an async job
+JOB_POLL_SECONDS = 0.05
+REQUEST_TIMEOUT_SECONDS = 600
+
+
+def percentile(sorted_values: List[float], fraction: float) -> Optional[float]:
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+class Recorder:
+    """Latencies and status codes per endpoint label, from many threads"""
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+    
+    def record(self, label: str, seconds: float, status):
+        with self._lock:
+            self.latencies.setdefault(label, []).append(seconds)
+            counts = self.statuses.setdefault(label, {})
+            counts[str(status)] = counts.get(str(status), 0) + 1
+    
+    def timed(self, label: str, call: Callable[[], requests.Response]) -> Optional[requests.Response]:
+        start = time.perf_counter()
+        try:
+            response = call()
+        except requests.RequestException as e:
+            self.record(label, time.perf_counter() - start, type(e).__name__)
+            return None
+        self.record(label, time.perf_counter() - start, response.status_code)
+        return response
+    
+    def summary(self, wall_seconds: float) -> Dict[str, dict]:
+        """Per-endpoint stats; throughput is over the phase's wall-clock time"""
+        report = {}
+        wall = max(1e-9, wall_seconds)
+        for label, values in self.latencies.items():
+            values = sorted(values)
+            ok = sum(count for status, count in self.statuses[label].items() if status.startswith('2'))
+            report[label] = {
+                'requests': len(values),
+                'ok': ok,
+                'statuses': dict(sorted(self.statuses[label].items())),
+                'throughput_rps': round(len(values) / wall, 2),
+                'mean_ms': round(sum(values) / len(values) * 1000, 1),
+                'p50_ms': round(percentile(values, 0.50) * 1000, 1),
+                'p95_ms': round(percentile(values, 0.95) * 1000, 1),
+                'p99_ms': round(percentile(values, 0.99) * 1000, 1),
+                'max_ms': round(values[-1] * 1000, 1),
+            }
+        return report
+
+
+class LoadDriver:
+    def __init__(self, base_url: str, corpus: List[dict], unique: bool = True):
+        self.base_url = base_url.rstrip('/')
+        self.images = [entry for entry in corpus if entry['kind'] == 'image']
+        self.videos = [entry for entry in corpus if entry['kind'] == 'video']
+        self.unique = unique
+        self.recorder = Recorder()  # replaced for every phase
+        self._local = threading.local()
+        self._counter = itertools.count()
+        self._counter_lock = threading.Lock()
+        # SHA-256 of uploads sent so far, for GET /results/{hash}
+        self.sent_hashes: List[str] = []
+    
+    # Helpers
+    
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+    
+    def _pick(self, kind: str) -> dict:
+        entries = self.images if kind == 'image' else self.videos
+        if not entries:
+            raise ValueError(f"The corpus has no {kind}s")
+        with self._counter_lock:
+            index = next(self._counter)
+        return entries[index % len(entries)]
+    
+    def _upload(self, kind: str):
+        entry = self._pick(kind)
+        data = entry['data']
+        if self.unique:
+            data = make_unique(data, entry['file'], uuid.uuid4().bytes)
+        self.sent_hashes.append(hashlib.sha256(data).hexdigest())
+        return {'file': (entry['file'], data)}
+    
+    def _get(self, label: str, path: str, **kwargs):
+        return self.recorder.timed(label, lambda: self._session().get(
+            self.base_url + path, timeout=REQUEST_TIMEOUT_SECONDS, **kwargs))
+    
+    def _post(self, label: str, path: str, **kwargs):
+        return self.recorder.timed(label, lambda: self._session().post(
+            self.base_url + path, timeout=REQUEST_TIMEOUT_SECONDS, **kwargs))
+    
+    def _submit_job(self, kind: str, analysis_type: str, job_id: Optional[str] = None):
+        params = {'job_id': job_id} if job_id else None
+        response = self._post('POST /jobs', '/jobs', files=self._upload(kind),
+                              data={'analysis_type': analysis_type}, params=params)
+        if response is None or response.status_code != 202:
+            return None
+        return response.json()['job_id']
+    
+    # Scenarios - one request (or request chain) each
+    
+    def analyze(self, path: str, kind: str):
+        def run():
+            self._post(f'POST {path}', path, files=self._upload(kind))
+        return run
+    
+    def job_roundtrip(self, analysis_type: str = 'image_quick'):
+        """POST /jobs, then poll GET /jobs/{id} until it finishes"""
+        kind = analysis_type.split('_')[0]
+        
+        def run():
+            start = time.perf_counter()
+            job_id = self._submit_job(kind, analysis_type)
+            if job_id is None:
+                return
+            while True:
+                response = self._get('GET /jobs/{id}', f'/jobs/{job_id}')
+                if response is None or response.status_code != 200:
+                    return
+                if response.json()['status'] not in ('queued', 'running'):
+                    break
+                time.sleep(JOB_POLL_SECONDS)
+            self.recorder.record('job end-to-end (POST /jobs + polling)',
+                                 time.perf_counter() - start, response.json()['status'])
+        return run
+    
+    def progress_stream(self, analysis_type: str = 'image_quick'):
+        """Open /analyze/progress/{id} for a fresh job and read it until it closes"""
+        kind = analysis_type.split('_')[0]
+        
+        def run():
+            job_id = uuid.uuid4().hex
+            if self._submit_job(kind, analysis_type, job_id) is None:
+                return
+            
+            def stream():
+                response = self._session().get(f'{self.base_url}/analyze/progress/{job_id}',
+                                                stream=True, timeout=REQUEST_TIMEOUT_SECONDS)
+                for _ in response.iter_lines():
+                    pass
+                return response
+            self.recorder.timed('GET /analyze/progress/{id} (until done)', stream)
+        return run
+    
+    def cancel(self, analysis_type: str = 'video_comprehensive'):
+        kind = analysis_type.split('_')[0]
+        
+        def run():
+            job_id = self._submit_job(kind, analysis_type)
+            if job_id is not None:
+                self.recorder.timed('DELETE /jobs/{id}', lambda: self._session().delete(
+                    f'{self.base_url}/jobs/{job_id}', timeout=REQUEST_TIMEOUT_SECONDS))
+        return run
+    
+    def result_history(self):
+        def run():
+            content_hash = self.sent_hashes[-1] if self.sent_hashes else '0' * 64
+            self._get('GET /results/{hash}', f'/results/{content_hash}')
+        return run
+    
+    def scenarios(self) -> Dict[str, Callable[[], None]]:
+        """Endpoint name -> scenario, in the order phases run by default"""
+        return {
+            'image_quick': self.analyze('/analyze/image', 'image'),
+            'image_comprehensive': self.analyze('/analyze/image/comprehensive', 'image'),
+            'video_legacy': self.analyze('/analyze/video', 'video'),
+            'video_quick': self.analyze('/analyze/video/quick', 'video'),
+            'video_comprehensive': self.analyze('/analyze/video/comprehensive', 'video'),
+            'jobs': self.job_roundtrip(),
+            'progress': self.progress_stream(),
+            'cancel': self.cancel(),
+            'results': lambda: self._get('GET /results', '/results', params={'limit': 50}),
+            'result_history': self.result_history(),
+            'health': lambda: self._get('GET /health', '/health'),
+            'ready': lambda: self._get('GET /ready', '/ready'),
+            'metrics': lambda: self._get('GET /metrics', '/metrics'),
+            'root': lambda: self._get('GET /', '/'),
+        }
+    
+    def run_phase(self, scenario: Callable[[], None], requests_count: int, concurrency: int) -> Dict[str, dict]:
+        self.recorder = Recorder()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='load') as executor:
+            for future in [executor.submit(scenario) for _ in range(requests_count)]:
+                future.result()
+        return self.recorder.summary(time.perf_counter() - start)
+    
+    def run(self, endpoints: Optional[List[str]] = None, requests_count: int = 20,
+            concurrency: int = 4, log: Callable[[str], None] = print) -> Dict[str, Dict[str, dict]]:
+        """Run the phases in order; returns phase -> endpoint label -> stats"""
+        scenarios = self.scenarios()
+        endpoints = endpoints or list(scenarios)
+        unknown = [name for name in endpoints if name not in scenarios]
+        if unknown:
+            raise ValueError(f"Unknown endpoints: {', '.join(unknown)}. Available: {', '.join(scenarios)}")
+        
+        report = {}
+        for name in endpoints:
+            if name.startswith('video') and not self.videos:
+                log(f"Skipping {name}: the corpus has no videos")
+                continue
+            log(f"Phase {name}: {requests_count} requests, concurrency {concurrency}")
+            report[name] = self.run_phase(scenarios[name], requests_count, concurrency)
+        return report
+
+
+def format_report(report: Dict[str, Dict[str, dict]]) -> str:
+    header = (f"{'phase':20} {'endpoint':40} {'reqs':>5} {'ok':>5} {'rps':>8} "
+              f"{'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}  statuses")
+    lines = [header, '-' * len(header)]
+    for phase, endpoints in report.items():
+        for label, stats in endpoints.items():
+            statuses = ' '.join(f'{status}:{count}' for status, count in stats['statuses'].items())
+            lines.append(
+                f"{phase:20} {label:40} {stats['requests']:>5} {stats['ok']:>5} {stats['throughput_rps']:>8} "
+                f"{stats['p50_ms']:>9} {stats['p95_ms']:>9} {stats['p99_ms']:>9}  {statuses}"
+            )
+    return '\n'.join(lines)
+
+
+def write_report(report: Dict[str, Dict[str, dict]], path: str, settings: dict):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'settings': settings, 'phases': report}, f, indent=2)
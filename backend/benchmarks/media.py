@@ -0,0 +1,205 @@
+"""
+Synthetic test media, generated locally (no downloads).
+
+Images come in several resolutions and EXIF flavours (camera metadata,
+an editing-software tag, none), videos are rendered with cv2.VideoWriter
+and get a generated audio track muxed in by ffmpeg when it is installed.
+Everything is seeded, so a corpus is reproducible from its arguments.
+
+The corpus directory holds the files plus a manifest.json the load driver
+reads: [{"file": ..., "kind": "image" | "video", ...properties}, ...].
+"""
+import json
+import math
+import os
+import shutil
+import struct
+import subprocess
+import tempfile
+import wave
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+MANIFEST_FILE = 'manifest.json'
+
+IMAGE_SIZES = ((320, 240), (1280, 720), (1920, 1080), (4032, 3024))
+# camera: plausible capture metadata; edited: a software tag metadata forensics flags;
+# none: no metadata at all (written as PNG, like a screenshot)
+EXIF_PROFILES = ('camera', 'edited', 'none')
+VIDEO_SIZES = ((640, 360), (1280, 720))
+
+
+def _scene(width: int, height: int, rng: np.random.Generator, t: float = 0.0) -> np.ndarray:
+    """RGB frame: gradient background, noise and a few moving ellipses (stand-ins for faces)"""
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    frame = np.empty((height, width, 3), dtype=np.float32)
+    frame[..., 0] = 255 * x / max(1, width - 1)
+    frame[..., 1] = 255 * y / max(1, height - 1)
+    frame[..., 2] = 128 + 64 * np.sin((x + y) / 40 + t)
+    frame += rng.normal(0, 12, frame.shape)
+    
+    for i in range(3):
+        cx = width * (0.25 + 0.25 * i) + width * 0.05 * math.sin(t + i)
+        cy = height * 0.5 + height * 0.1 * math.cos(t * 0.7 + i)
+        rx, ry = width * 0.08, height * 0.14
+        mask = ((x - cx) / rx) ** 2 + ((y - cy) / ry) ** 2 <= 1
+        frame[mask] = (224, 172, 140)
+    return np.clip(frame, 0, 255).astype(np.uint8)
+
+
+def _exif_bytes(profile: str, width: int, height: int) -> Optional[bytes]:
+    if profile == 'none':
+        return None
+    import piexif
+    
+    zeroth = {piexif.ImageIFD.XResolution: (72, 1), piexif.ImageIFD.YResolution: (72, 1)}
+    exif = {piexif.ExifIFD.PixelXDimension: width, piexif.ExifIFD.PixelYDimension: height}
+    if profile == 'camera':
+        zeroth.update({
+            piexif.ImageIFD.Make: b'Canon',
+            piexif.ImageIFD.Model: b'Canon EOS 5D Mark IV',
+            piexif.ImageIFD.DateTime: b'2024:05:01 12:00:00',
+        })
+        exif.update({
+            piexif.ExifIFD.DateTimeOriginal: b'2024:05:01 12:00:00',
+            piexif.ExifIFD.ExposureTime: (1, 125),
+            piexif.ExifIFD.FNumber: (28, 10),
+            piexif.ExifIFD.ISOSpeedRatings: 400,
+            piexif.ExifIFD.FocalLength: (50, 1),
+        })
+    else:
+        zeroth.update({
+            piexif.ImageIFD.Software: b'Adobe Photoshop 25.0',
+            piexif.ImageIFD.DateTime: b'2024:05:02 09:30:00',
+        })
+    return piexif.dump({'0th': zeroth, 'Exif': exif})
+
+
+def generate_image(path: str, width: int, height: int, exif: str = 'camera', seed: int = 0):
+    from PIL import Image
+    
+    image = Image.fromarray(_scene(width, height, np.random.default_rng(seed)))
+    if path.lower().endswith('.png'):
+        image.save(path)
+        return
+    exif_bytes = _exif_bytes(exif, width, height)
+    if exif_bytes is None:
+        image.save(path, quality=90)
+    else:
+        image.save(path, quality=90, exif=exif_bytes)
+
+
+def write_tone(path: str, seconds: float, sample_rate: int = 16000):
+    """Mono 16-bit WAV: a voice-band tone with a slow vibrato plus noise"""
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    signal = 0.3 * np.sin(2 * np.pi * (180 + 20 * np.sin(2 * np.pi * 3 * t)) * t)
+    signal += 0.02 * np.random.default_rng(0).normal(size=t.shape)
+    samples = (np.clip(signal, -1, 1) * 32767).astype('<i2')
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(samples.tobytes())
+
+
+def generate_frames(output_dir: str, width: int, height: int, count: int = 8, seed: int = 0) -> list:
+    """JPEG frames of a moving scene, like the frame extractor writes; returns their paths"""
+    from PIL import Image
+    
+    os.makedirs(output_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    paths = []
+    for index in range(count):
+        path = os.path.join(output_dir, f'frame_{index:04d}.jpg')
+        Image.fromarray(_scene(width, height, rng, t=index / 12)).save(path, quality=90)
+        paths.append(path)
+    return paths
+
+
+def generate_video(path: str, width: int, height: int, seconds: float = 3.0, fps: int = 24,
+                   audio: bool = True, seed: int = 0) -> bool:
+    """Render an MP4; returns whether it got an audio track (needs ffmpeg)"""
+    import cv2
+    
+    rng = np.random.default_rng(seed)
+    work_dir = tempfile.mkdtemp(prefix='veritas-media-')
+    try:
+        silent = os.path.join(work_dir, 'video.mp4')
+        writer = cv2.VideoWriter(silent, cv2.VideoWriter_fourcc(*'mp4v'), fps, (width, height))
+        for index in range(int(seconds * fps)):
+            frame = _scene(width, height, rng, t=index / fps * 2)
+            writer.write(cv2.cvtColor(frame, cv2.COLOR_RGB2BGR))
+        writer.release()
+        
+        ffmpeg = shutil.which('ffmpeg')
+        if not audio or ffmpeg is None:
+            shutil.move(silent, path)
+            return False
+        
+        tone = os.path.join(work_dir, 'audio.wav')
+        write_tone(tone, seconds)
+        subprocess.run(
+            [ffmpeg, '-y', '-loglevel', 'error', '-i', silent, '-i', tone,
+             '-c:v', 'copy', '-c:a', 'aac', '-shortest', path],
+            check=True
+        )
+        return True
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def generate_corpus(output_dir: str, images_per_size: int = 3,
+                    image_sizes: Sequence[Tuple[int, int]] = IMAGE_SIZES,
+                    videos_per_size: int = 1, video_sizes: Sequence[Tuple[int, int]] = VIDEO_SIZES,
+                    video_seconds: float = 3.0, audio: bool = True) -> List[dict]:
+    """Write a corpus of images and videos to output_dir and return its manifest"""
+    os.makedirs(output_dir, exist_ok=True)
+    manifest = []
+    seed = 0
+    
+    for width, height in image_sizes:
+        for index in range(images_per_size):
+            exif = EXIF_PROFILES[index % len(EXIF_PROFILES)]
+            extension = '.png' if exif == 'none' else '.jpg'
+            name = f'image_{width}x{height}_{index}_{exif}{extension}'
+            generate_image(os.path.join(output_dir, name), width, height, exif, seed)
+            manifest.append({'file': name, 'kind': 'image', 'width': width, 'height': height,
+                             'exif': exif})
+            seed += 1
+    
+    if audio and videos_per_size and shutil.which('ffmpeg') is None:
+        print("ffmpeg not found - videos are generated without audio")
+    for width, height in video_sizes:
+        for index in range(videos_per_size):
+            name = f'video_{width}x{height}_{index}.mp4'
+            has_audio = generate_video(os.path.join(output_dir, name), width, height,
+                                       video_seconds, audio=audio, seed=seed)
+            manifest.append({'file': name, 'kind': 'video', 'width': width, 'height': height,
+                             'seconds': video_seconds, 'audio': has_audio})
+            seed += 1
+    
+    with open(os.path.join(output_dir, MANIFEST_FILE), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def load_corpus(corpus_dir: str) -> List[dict]:
+    """Manifest entries with each file's bytes under 'data'"""
+    with open(os.path.join(corpus_dir, MANIFEST_FILE), encoding='utf-8') as f:
+        manifest = json.load(f)
+    for entry in manifest:
+        with open(os.path.join(corpus_dir, entry['file']), 'rb') as f:
+            entry['data'] = f.read()
+    return manifest
+
+
+def make_unique(data: bytes, filename: str, token: bytes) -> bytes:
+    """
+    The same media with different bytes, so every request misses the
+    result cache: a trailing MP4 'free' box, or bytes after the image's
+    end marker - both are ignored by decoders.
+    """
+    if filename.lower().endswith(('.mp4', '.mov', '.m4v')):
+        return data + struct.pack('>I', 8 + len(token)) + b'free' + token
+    return data + token
@@ -0,0 +1,245 @@
+"""
+Per-analyzer microbenchmarks with a baseline regression gate.
+
+Each analyzer function runs on fixed synthetic inputs (benchmarks.media,
+seeded) at several sizes: images and frame sequences per resolution,
+audio per duration. A benchmark is warmed up once, then timed `repeat`
+times; its median is what gets compared.
+
+    python -m benchmarks micro --save-baseline benchmarks/micro_baseline.json
+    python -m benchmarks micro --baseline benchmarks/micro_baseline.json --max-regression 15
+
+With a baseline, any benchmark whose median grew by more than
+max_regression percent fails the run (exit code 1), so an optimization,
+once measured, stays measured. Baselines are only comparable on the same
+hardware - record one per CI runner class.
+"""
+import fnmatch
+import json
+import os
+import platform
+import shutil
+import statistics
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from benchmarks import media
+
+BASELINE_VERSION = 1
+
+IMAGE_SIZES = ((320, 240), (1280, 720), (1920, 1080))
+# Frame sequences are what the video layers see after extraction
+FRAME_SIZES = ((640, 360), (1280, 720))
+FRAMES_PER_SEQUENCE = 8
+AUDIO_SECONDS = (2, 5, 10)
+
+
+class MicroBenchmark:
+    """One analyzer at one input size; setup() returns the zero-argument call to time"""
+    def __init__(self, name: str, setup: Callable[[], Callable[[], object]]):
+        self.name = name
+        self.setup = setup
+
+
+class Fixtures:
+    """Synthetic inputs, generated once per run in a scratch directory"""
+    def __init__(self):
+        self.root = tempfile.mkdtemp(prefix='veritas-micro-')
+        self._cache: Dict[tuple, object] = {}
+    
+    def _cached(self, key: tuple, build: Callable[[], object]):
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+    
+    def image_path(self, width: int, height: int) -> str:
+        def build():
+            path = os.path.join(self.root, f'image_{width}x{height}.jpg')
+            media.generate_image(path, width, height, exif='camera', seed=width * height)
+            return path
+        return self._cached(('image', width, height), build)
+    
+    def image(self, width: int, height: int):
+        from PIL import Image
+        return self._cached(('pil', width, height),
+                            lambda: Image.open(self.image_path(width, height)).convert('RGB'))
+    
+    def frames(self, width: int, height: int) -> List[str]:
+        return self._cached(('frames', width, height), lambda: media.generate_frames(
+            os.path.join(self.root, f'frames_{width}x{height}'), width, height, FRAMES_PER_SEQUENCE))
+    
+    def audio(self, seconds: float) -> str:
+        def build():
+            path = os.path.join(self.root, f'audio_{seconds}s.wav')
+            media.write_tone(path, seconds)
+            return path
+        return self._cached(('audio', seconds), build)
+    
+    def cleanup(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+
+def build_benchmarks(fixtures: Fixtures) -> List[MicroBenchmark]:
+    benchmarks = []
+    
+    for width, height in IMAGE_SIZES:
+        size = f'{width}x{height}'
+        
+        def frequency(width=width, height=height):
+            from models.frequency_analyzer import analyze_frequency_domain
+            image = fixtures.image(width, height)
+            return lambda: analyze_frequency_domain(image)
+        
+        def metadata(width=width, height=height):
+            from models.metadata_analyzer import analyze_metadata
+            path = fixtures.image_path(width, height)
+            return lambda: analyze_metadata(path)
+        
+        def face(width=width, height=height):
+            from models.face_analyzer import get_face_analyzer
+            analyzer = get_face_analyzer()
+            image = fixtures.image(width, height)
+            return lambda: analyzer.analyze_face(image)
+        
+        benchmarks += [
+            MicroBenchmark(f'analyze_frequency_domain[{size}]', frequency),
+            MicroBenchmark(f'analyze_metadata[{size}]', metadata),
+            MicroBenchmark(f'FaceAnalyzer.analyze_face[{size}]', face),
+        ]
+    
+    for width, height in FRAME_SIZES:
+        size = f'{width}x{height}x{FRAMES_PER_SEQUENCE}'
+        
+        def compression(width=width, height=height):
+            from models.video.compression_analyzer import analyze_region_compression
+            frames = fixtures.frames(width, height)
+            return lambda: analyze_region_compression(frames)
+        
+        def boundaries(width=width, height=height):
+            from models.video.boundary_analyzer import analyze_boundaries
+            frames = fixtures.frames(width, height)
+            scenes = [0, len(frames) // 2]
+            timestamps = [index / 24 for index in range(len(frames))]
+            return lambda: analyze_boundaries(frames, scenes, timestamps)
+        
+        def optical_flow(width=width, height=height):
+            from models.video.temporal_analyzer import analyze_optical_flow
+            frames = fixtures.frames(width, height)
+            return lambda: analyze_optical_flow(frames)
+        
+        benchmarks += [
+            MicroBenchmark(f'analyze_region_compression[{size}]', compression),
+            MicroBenchmark(f'analyze_boundaries[{size}]', boundaries),
+            MicroBenchmark(f'analyze_optical_flow[{size}]', optical_flow),
+        ]
+    
+    for seconds in AUDIO_SECONDS:
+        def voice(seconds=seconds):
+            from models.video.audio_analyzer import detect_voice_deepfake
+            path = fixtures.audio(seconds)
+            return lambda: detect_voice_deepfake(path)
+        
+        benchmarks.append(MicroBenchmark(f'detect_voice_deepfake[{seconds}s]', voice))
+    
+    return benchmarks
+
+
+def time_call(call: Callable[[], object], repeat: int, warmup: int = 1) -> dict:
+    for _ in range(warmup):
+        call()
+    runs = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        runs.append(time.perf_counter() - start)
+    return {
+        'median_ms': round(statistics.median(runs) * 1000, 3),
+        'min_ms': round(min(runs) * 1000, 3),
+        'max_ms': round(max(runs) * 1000, 3),
+        'repeat': repeat,
+    }
+
+
+def run_benchmarks(patterns: Optional[List[str]] = None, repeat: int = 5,
+                   log: Callable[[str], None] = print) -> Dict[str, dict]:
+    """Run the benchmarks whose name matches any of patterns (fnmatch; all by default)"""
+    fixtures = Fixtures()
+    results = {}
+    try:
+        for benchmark in build_benchmarks(fixtures):
+            if patterns and not any(fnmatch.fnmatch(benchmark.name, pattern) for pattern in patterns):
+                continue
+            try:
+                results[benchmark.name] = time_call(benchmark.setup(), repeat)
+            except Exception as e:
+                results[benchmark.name] = {'error': f'{type(e).__name__}: {e}'}
+            entry = results[benchmark.name]
+            log(f"{benchmark.name:48} " + (f"{entry['median_ms']:10.2f} ms" if 'error' not in entry else entry['error']))
+    finally:
+        fixtures.cleanup()
+    return results
+
+
+def save_baseline(results: Dict[str, dict], path: str):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    baseline = {
+        'version': BASELINE_VERSION,
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'machine': {'platform': platform.platform(), 'processor': platform.processor(),
+                    'python': platform.python_version(), 'cpus': os.cpu_count()},
+        'benchmarks': {name: entry for name, entry in results.items() if 'error' not in entry},
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, indent=2, sort_keys=True)
+
+
+def load_baseline(path: str) -> dict:
+    with open(path, encoding='utf-8') as f:
+        baseline = json.load(f)
+    if baseline.get('version') != BASELINE_VERSION:
+        raise ValueError(f"{path} is a version {baseline.get('version')} baseline, expected {BASELINE_VERSION}")
+    return baseline
+
+
+def compare(results: Dict[str, dict], baseline: dict, max_regression: float) -> Tuple[List[dict], bool]:
+    """
+    Rows of (name, baseline, current, change %, status) and whether the gate
+    passed: no benchmark slower than max_regression percent, none erroring.
+    """
+    rows, passed = [], True
+    for name, entry in results.items():
+        previous = baseline['benchmarks'].get(name)
+        row = {'name': name, 'baseline_ms': previous['median_ms'] if previous else None,
+               'median_ms': entry.get('median_ms'), 'change_pct': None}
+        if 'error' in entry:
+            row['status'] = 'error'
+            passed = False
+        elif previous is None:
+            row['status'] = 'new'
+        else:
+            change = (entry['median_ms'] - previous['median_ms']) / max(previous['median_ms'], 1e-9) * 100
+            row['change_pct'] = round(change, 1)
+            if change > max_regression:
+                row['status'] = 'REGRESSED'
+                passed = False
+            elif change < -max_regression:
+                row['status'] = 'faster'
+            else:
+                row['status'] = 'ok'
+        rows.append(row)
+    return rows, passed
+
+
+def format_comparison(rows: List[dict], max_regression: float) -> str:
+    header = f"{'benchmark':48} {'baseline ms':>12} {'median ms':>12} {'change':>9}  status"
+    lines = [header, '-' * len(header)]
+    for row in rows:
+        baseline = f"{row['baseline_ms']:.2f}" if row['baseline_ms'] is not None else '-'
+        current = f"{row['median_ms']:.2f}" if row['median_ms'] is not None else '-'
+        change = f"{row['change_pct']:+.1f}%" if row['change_pct'] is not None else '-'
+        lines.append(f"{row['name']:48} {baseline:>12} {current:>12} {change:>9}  {row['status']}")
+    lines.append(f"(regression threshold: +{max_regression:g}% on the median)")
+    return '\n'.join(lines)
@@ -0,0 +1,98 @@
+"""
+Mocked models for fast, offline benchmark runs.
+
+install() swaps every analysis task for one that decodes the media (so
+uploads, spooling and I/O are still real) and then sleeps a fixed, per
+type latency instead of running the detectors, and empties the model
+warmup list so nothing is loaded or downloaded. What remains is the API
+itself: upload handling, hashing, caching, queueing, lanes, coalescing,
+progress streams and serialization.
+
+`app` is main.app with the mocks installed, for uvicorn:
+
+    BENCH_MOCK_SCALE=0.1 uvicorn benchmarks.mock_models:app
+"""
+import os
+import time
+
+# Simulated model time per analysis type (seconds), multiplied by BENCH_MOCK_SCALE
+MOCK_LATENCY_SECONDS = {
+    'image_quick': 0.02,
+    'image_comprehensive': 0.15,
+    'video_quick': 0.4,
+    'video_comprehensive': 1.5,
+    'video_legacy': 0.3,
+}
+
+
+def _decode(source) -> dict:
+    """Open the media the way the detectors would, so I/O and decoding still count"""
+    if isinstance(source, (bytes, bytearray)) or source.lower().endswith(('.jpg', '.jpeg', '.png', '.bmp', '.webp')):
+        import io
+        from PIL import Image
+        image = Image.open(io.BytesIO(source) if isinstance(source, (bytes, bytearray)) else source)
+        image.load()
+        return {'width': image.width, 'height': image.height}
+    
+    import cv2
+    capture = cv2.VideoCapture(source)
+    try:
+        frames = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+        ok, _ = capture.read()
+        if not ok:
+            raise ValueError("Could not read video")
+        return {'frames': frames}
+    finally:
+        capture.release()
+
+
+def make_mock_task(analysis_type: str, latency: float):
+    def task(path, frames_dir=None, deadline_at=None):
+        from models.progress_tracker import get_progress_tracker
+        from services.analysis_tasks import AnalysisError, remove_dir, remove_file
+        from utils.cancellation import check_cancelled
+        
+        tracker = get_progress_tracker()
+        try:
+            media = _decode(path)
+            tracker.update("Mock analysis running")
+            # Sleep in steps so cancellation behaves like the real checkpoints
+            end = time.perf_counter() + latency
+            while time.perf_counter() < end:
+                time.sleep(min(0.05, max(0.0, end - time.perf_counter())))
+                check_cancelled()
+            tracker.update("Complete!")
+            return {
+                'final_score': 0.5,
+                'risk_level': 'Medium',
+                'confidence': 0.5,
+                'analysis_type': analysis_type,
+                'media': media,
+                'mock': True,
+            }
+        except Exception as e:
+            raise AnalysisError(f"Mock analysis failed: {e}")
+        finally:
+            remove_file(path)
+            remove_dir(frames_dir)
+    
+    return task
+
+
+def install(scale: float = 1.0):
+    """Replace the analysis tasks and model warmup in this process"""
+    import config
+    from services import model_warmup
+    from services.analysis_tasks import ANALYSIS_TASKS
+    
+    # Mocks live in this process; worker processes would import the real tasks
+    config.ANALYSIS_WORKER_MODE = 'thread'
+    model_warmup.MODEL_SPECS[:] = []
+    for analysis_type, (_, extensions) in list(ANALYSIS_TASKS.items()):
+        latency = MOCK_LATENCY_SECONDS.get(analysis_type, 0.1) * scale
+        ANALYSIS_TASKS[analysis_type] = (make_mock_task(analysis_type, latency), extensions)
+
+
+install(float(os.getenv('BENCH_MOCK_SCALE', '1.0')))
+
+from main import app  # noqa: E402
@@ -14,6 +14,16 @@ def get_float_env(key: str, default: float) -> float:
     except ValueError:
         return default
 
+# Helper function to parse int from env
+def get_int_env(key: str, default: int) -> int:
+    try:
+        return int(os.getenv(key, str(default)))
+    except ValueError:
+        return default
+
+# API version - part of the result cache key
+API_VERSION = "2.0"
+
 # AGGRESSIVE ensemble weights - heavily favors neural networks when confident
 ENSEMBLE_WEIGHTS = {
     'neural': 0.50,      # Base weight for neural networks
@@ -41,6 +51,97 @@ ALLOWED_VIDEO_EXTENSIONS = {'.mp4', '.avi', '.mov', '.mkv'}
 
 # Upload directory - configurable for deployment
 UPLOAD_DIR = os.getenv('UPLOAD_DIR', 'uploads')
+# Images up to this size are analyzed straight from memory (0 = always spool to disk)
+UPLOAD_IN_MEMORY_MAX_MB = get_float_env('UPLOAD_IN_MEMORY_MAX_MB', 8.0)
+# Resumable chunked uploads (/uploads): chunk size, idle time before an
+# unfinished upload is dropped, and how many may be in progress at once
+CHUNKED_UPLOAD_CHUNK_MB = get_float_env('CHUNKED_UPLOAD_CHUNK_MB', 8.0)
+CHUNKED_UPLOAD_TTL_SECONDS = get_int_env('CHUNKED_UPLOAD_TTL_SECONDS', 86400)
+CHUNKED_UPLOAD_MAX_SESSIONS = get_int_env('CHUNKED_UPLOAD_MAX_SESSIONS', 64)
+# Directories POST /analyze/path may read media from in place (comma-separated;
+# empty = the endpoint is disabled). Only for volumes the API is meant to expose
+ANALYZE_PATH_ROOTS = [os.path.realpath(root.strip())
+                      for root in os.getenv('ANALYZE_PATH_ROOTS', '').split(',') if root.strip()]
+
+# Per-job progress channels - finished trackers are kept this long so
+# late subscribers can still replay the job's messages
+PROGRESS_RETENTION_SECONDS = get_int_env('PROGRESS_RETENTION_SECONDS', 300)
+# Messages kept per job for replay to (re)connecting clients (Last-Event-ID)
+PROGRESS_BUFFER_SIZE = get_int_env('PROGRESS_BUFFER_SIZE', 200)
+
+# Analysis workers and job queue - requests beyond the queue get 429 + Retry-After
+ANALYSIS_WORKERS = get_int_env('ANALYSIS_WORKERS', 2)
+# 'thread' runs analyses in the API process; 'process' runs them in worker
+# processes that each preload the models (more RAM, scales with cores);
+# 'broker' hands them to `python -m veritas worker` nodes through JOB_BROKER_URL
+ANALYSIS_WORKER_MODE = os.getenv('ANALYSIS_WORKER_MODE', 'thread').lower()
+# memory:// (workers in the API process), sqlite:///path.db (one host) or redis://host:6379/0
+JOB_BROKER_URL = os.getenv('JOB_BROKER_URL', 'memory://')
+# A brokered job with no outcome after this long fails with 504
+BROKER_JOB_TIMEOUT_SECONDS = get_int_env('BROKER_JOB_TIMEOUT_SECONDS', 1800)
+# A claimed job goes back to the queue once its worker's heartbeat is this old,
+# and fails after this many claims (workers lost on it)
+BROKER_LEASE_SECONDS = get_int_env('BROKER_LEASE_SECONDS', 60)
+BROKER_MAX_DELIVERIES = get_int_env('BROKER_MAX_DELIVERIES', 3)
+# API and workers see UPLOAD_DIR (and ANALYZE_PATH_ROOTS) at the same paths:
+# jobs carry the file's path instead of its bytes
+BROKER_SHARED_STORAGE = get_bool_env('BROKER_SHARED_STORAGE', False)
+JOB_QUEUE_SIZE = get_int_env('JOB_QUEUE_SIZE', 8)
+# Finished /jobs results are kept this long for polling
+JOB_RESULT_TTL_SECONDS = get_int_env('JOB_RESULT_TTL_SECONDS', 3600)
+
+# Scheduling lanes: each caps how many workers its jobs may hold at once, and
+# free workers go to the waiting job with the highest priority + wait / JOB_AGING_SECONDS.
+# By default comprehensive video keeps one worker free for everything else.
+JOB_LANES = {
+    'image_quick': {
+        'priority': 3,
+        'max_concurrency': get_int_env('LANE_IMAGE_QUICK_WORKERS', ANALYSIS_WORKERS),
+    },
+    'video_quick': {
+        'priority': 2,
+        'max_concurrency': get_int_env('LANE_VIDEO_QUICK_WORKERS', ANALYSIS_WORKERS),
+    },
+    'image_comprehensive': {
+        'priority': 1,
+        'max_concurrency': get_int_env('LANE_IMAGE_COMPREHENSIVE_WORKERS', ANALYSIS_WORKERS),
+    },
+    'video_comprehensive': {
+        'priority': 0,
+        'max_concurrency': get_int_env('LANE_VIDEO_COMPREHENSIVE_WORKERS', max(1, ANALYSIS_WORKERS - 1)),
+    },
+}
+# Seconds of waiting worth one priority level (anti-starvation aging)
+JOB_AGING_SECONDS = get_float_env('JOB_AGING_SECONDS', 10.0)
+
+# Content-addressed result cache (in-memory LRU + optional on-disk tier)
+RESULT_CACHE_ENABLED = get_bool_env('RESULT_CACHE_ENABLED', True)
+RESULT_CACHE_MAX_ENTRIES = get_int_env('RESULT_CACHE_MAX_ENTRIES', 1024)
+RESULT_CACHE_DIR = os.getenv('RESULT_CACHE_DIR', '')  # empty = memory only
+RESULT_CACHE_DISK_MAX_ENTRIES = get_int_env('RESULT_CACHE_DISK_MAX_ENTRIES', 10000)
+# Bump to invalidate cached results after a model or scoring change
+RESULT_CACHE_VERSION = os.getenv('RESULT_CACHE_VERSION', '1')
+
+# SQLite history of every analysis (GET /results); also answers repeat
+# uploads from disk when the result cache is enabled
+RESULT_STORE_ENABLED = get_bool_env('RESULT_STORE_ENABLED', True)
+RESULT_STORE_PATH = os.getenv('RESULT_STORE_PATH', 'results.db')
+
+# ?trace=1 requests also write a Chrome trace file here (empty = response only)
+TRACE_DIR = os.getenv('TRACE_DIR', '')
+
+# Peak RSS of every analysis layer, in the layer metrics and trace spans
+MEMORY_ACCOUNTING_ENABLED = get_bool_env('MEMORY_ACCOUNTING_ENABLED', True)
+# Also the Python heap peak via tracemalloc - slows analysis down, enable to investigate
+MEMORY_TRACEMALLOC = get_bool_env('MEMORY_TRACEMALLOC', False)
+
+# RAM budget for loaded models, per process (0 = unlimited). Past it, the
+# least recently used optional models are evicted and reload on next use.
+MODEL_MEMORY_BUDGET_MB = get_float_env('MODEL_MEMORY_BUDGET_MB', 0)
+
+# Directory written by `python -m veritas bundle`: models load from it
+# (memory-mapped, offline) instead of being downloaded. Empty = download.
+MODEL_BUNDLE_DIR = os.getenv('MODEL_BUNDLE_DIR', '')
 
 # Analysis settings - configurable via environment variables
 FREQUENCY_ANALYSIS_ENABLED = get_bool_env('FREQUENCY_ANALYSIS_ENABLED', True)
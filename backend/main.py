@@ -1,28 +1,53 @@
-from services.video_analyzer import analyze_video
-from services.report_generator import generate_report, generate_comprehensive_report
-from services.comprehensive_analyzer import analyze_image_comprehensive
-from fastapi import FastAPI, UploadFile, File, HTTPException
-from fastapi.responses import JSONResponse, StreamingResponse
+from services.analysis_tasks import (
+    ANALYSIS_LANES, ANALYSIS_TASKS, DEADLINE_ANALYSIS_TYPES, AnalysisError, without_deadline_report
+)
+from services.job_manager import get_job_manager, QueueFullError
+from services.model_warmup import get_model_warmup, start_model_warmup
+from models.model_registry import get_model_registry
+from services.result_cache import get_result_cache
+from services.result_store import get_result_store
+from services.upload_spool import spool_upload, UploadTooLargeError, UploadSizeLimitMiddleware
+from services.chunked_upload import get_upload_manager, UploadSessionError
+from services.path_ingest import (
+    PathNotAllowedError, default_analysis_type, link_ingest_path, resolve_ingest_path
+)
+from fastapi import FastAPI, UploadFile, File, Form, Header, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 import os
-import shutil
+import re
 import asyncio
 import json
-from queue import Queue
-import threading
-from concurrent.futures import ThreadPoolExecutor
 import time
+from typing import Optional
 
-from utils.image_utils import preprocess_image
-from models.deepfake_detector import predict_image
-from models.progress_tracker import get_progress_tracker, reset_progress_tracker
+from models.progress_tracker import (
+    get_progress_tracker,
+    get_or_create_job_tracker,
+    new_job_id,
+    is_valid_job_id,
+)
 import config
+from utils.cancellation import AnalysisCancelled
+from utils.deadline import Deadline
+from utils import fast_json
+from utils.metrics import REGISTRY, MetricsMiddleware
+from utils.tracing import span, start_trace, use_span
 
 
-app = FastAPI(title="Deepfake Detection API", version="2.0")
+class FastJSONResponse(JSONResponse):
+    """
+    Encoded straight from the result by utils.fast_json: returning it skips
+    FastAPI's jsonable_encoder copy of the whole structure
+    """
+    def render(self, content) -> bytes:
+        return fast_json.dumps(content)
 
-# Thread pool for running heavy analysis without blocking SSE
-executor = ThreadPoolExecutor(max_workers=2)
+
+app = FastAPI(title="Deepfake Detection API", version=config.API_VERSION)
+
+# Reject oversized uploads up front (added first so CORS headers still apply)
+app.add_middleware(UploadSizeLimitMiddleware)
 
 # Enable CORS for frontend - using config from environment
 app.add_middleware(
@@ -34,13 +59,24 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+# Outermost, so rejected and failed requests are timed too
+app.add_middleware(MetricsMiddleware)
+
 UPLOAD_DIR = config.UPLOAD_DIR
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
+# Extracted video frames - each job gets its own subdirectory
+FRAMES_DIR = "temp_frames"
+
+CONTENT_HASH_PATTERN = re.compile(r'^[0-9a-f]{64}$')
 
-def validate_file(file: UploadFile, allowed_extensions: set):
+# How often a synchronous request checks whether its client is still there
+DISCONNECT_POLL_SECONDS = 1.0
+
+
+def validate_file(filename: str, allowed_extensions: set):
     """Validate file type and size"""
-    file_ext = os.path.splitext(file.filename)[1].lower()
+    file_ext = os.path.splitext(filename)[1].lower()
     
     if file_ext not in allowed_extensions:
         raise HTTPException(
@@ -51,18 +87,245 @@ def validate_file(file: UploadFile, allowed_extensions: set):
     return True
 
 
+def start_job(job_id: Optional[str]):
+    """
+    Resolve the job ID for a new analysis and claim its progress tracker.
+    Clients may pass their own job_id to subscribe to /analyze/progress/{job_id}
+    before uploading; otherwise one is generated and returned in the response.
+    """
+    if job_id is None:
+        job_id = new_job_id()
+    elif not is_valid_job_id(job_id):
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid job_id. Use 8-64 characters: letters, digits, '-' or '_'"
+        )
+    
+    tracker = get_or_create_job_tracker(job_id)
+    if not tracker.claim():
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is already running")
+    
+    return job_id, tracker
+
+
+async def enqueue_analysis(analysis_type: str, file: UploadFile, job_id: Optional[str],
+                           trace: bool = False, deadline_ms: Optional[int] = None):
+    """
+    Validate and spool an upload, then queue it on the job manager.
+    Heavy analysis runs in the worker pool so the event loop (and SSE) stays free.
+    With trace=True the result carries a span tree of every stage.
+    deadline_ms is a latency budget counted from now: the analysis drops
+    frames and low-value layers rather than run past it.
+    """
+    async def spool(path: str, memory_limit: int):
+        return await spool_upload(file, path, memory_limit)
+    
+    return await enqueue_upload(analysis_type, file.filename, job_id, trace, deadline_ms, spool)
+
+
+async def enqueue_upload(analysis_type: str, filename: str, job_id: Optional[str],
+                         trace: bool, deadline_ms: Optional[int], spool):
+    """
+    enqueue_analysis() for any upload source: spool(path, memory_limit)
+    puts the media at the job's upload path and returns its SpooledUpload.
+    """
+    if analysis_type not in ANALYSIS_TASKS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid analysis_type. Allowed: {', '.join(ANALYSIS_TASKS)}"
+        )
+    
+    deadline = Deadline.from_budget_ms(deadline_ms)
+    if deadline_ms is not None:
+        if deadline_ms <= 0:
+            raise HTTPException(status_code=400, detail="deadline_ms must be positive")
+        if analysis_type not in DEADLINE_ANALYSIS_TYPES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"deadline_ms is only supported for: {', '.join(sorted(DEADLINE_ANALYSIS_TYPES))}"
+            )
+    
+    task, allowed_extensions = ANALYSIS_TASKS[analysis_type]
+    validate_file(filename, allowed_extensions)
+    
+    # Every analysis gets its own job ID and progress tracker
+    job_id, tracker = start_job(job_id)
+    
+    file_ext = os.path.splitext(filename)[1].lower()
+    path = os.path.join(UPLOAD_DIR, f"{job_id}{file_ext}")
+    
+    # Small images never touch the disk
+    memory_limit = 0
+    if file_ext in config.ALLOWED_IMAGE_EXTENSIONS:
+        memory_limit = int(config.UPLOAD_IN_MEMORY_MAX_MB * 1024 * 1024)
+    
+    trace_root = start_trace(analysis_type, job_id=job_id) if trace else None
+    
+    upload = None
+    try:
+        with use_span(trace_root), span('upload') as upload_span:
+            upload = await spool(path, memory_limit)
+        if upload_span is not None:
+            upload_span.attrs.update(bytes=upload.size, in_memory=upload.in_memory)
+        content_hash = upload.content_hash
+        
+        tracker.update("File uploaded successfully")
+        
+        # Identical media analyzed with the same models/config: answer from
+        # the cache, or from the result history on disk
+        cache = get_result_cache()
+        store = get_result_store()
+        cache_key = None
+        if cache is not None:
+            cache_key = cache.make_key(analysis_type, content_hash)
+            # Both tiers may touch disk - off the event loop
+            with use_span(trace_root), span('cache_lookup'):
+                cached = await asyncio.to_thread(cache.get, cache_key)
+            
+            if cached is None and store is not None:
+                with use_span(trace_root), span('result_store_lookup'):
+                    cached = await asyncio.to_thread(store.find, analysis_type, content_hash)
+                if cached is not None:
+                    await asyncio.to_thread(cache.put, cache_key, cached)
+            
+            if cached is not None:
+                upload.discard()
+                cached["cached"] = True
+                tracker.update("Complete! (cached result)")
+                return get_job_manager().complete(job_id, analysis_type, tracker, cached, trace=trace_root)
+        
+        task_args = [upload.source, os.path.join(FRAMES_DIR, job_id)]
+        dedup_key = f"{analysis_type}:{content_hash}"
+        if deadline.enabled:
+            task_args.append(deadline.expires_at)
+            # A deadline run may be partial - never share it with other requests
+            dedup_key = None
+        
+        # Identical media already being analyzed: follow that job (single-flight)
+        job = get_job_manager().submit(
+            job_id,
+            analysis_type,
+            tracker,
+            task,
+            *task_args,
+            dedup_key=dedup_key,
+            trace=trace_root,
+            lane=ANALYSIS_LANES.get(analysis_type)
+        )
+        
+        if job.leader is not None:
+            upload.discard()
+        else:
+            def store_result(future):
+                if future.exception() is not None:
+                    # Cancelled before a worker picked it up: the task never cleaned up its input
+                    if isinstance(future.exception(), AnalysisCancelled) and job.started_at is None:
+                        upload.discard()
+                    return
+                result = future.result()
+                # Runs on the analysis thread that settled the job, so the disk writes
+                # below stay off the event loop.
+                # Results degraded to meet a deadline are not the full analysis; a
+                # deadline run that finished in full is, minus its own deadline report
+                if not result.get('degraded_layers'):
+                    result = without_deadline_report(result)
+                    if cache_key is not None:
+                        cache.put(cache_key, result)
+                if store is not None:
+                    finished_at = time.time()
+                    timings = {
+                        'queue_seconds': round(job.started_at - job.created_at, 3),
+                        'analysis_seconds': round(finished_at - job.started_at, 3),
+                    }
+                    try:
+                        store.record(job_id, analysis_type, content_hash, result, timings)
+                    except Exception as e:
+                        print(f"Result store write error: {e}")
+            
+            job.future.add_done_callback(store_result)
+        
+        return job
+    
+    except UploadTooLargeError as e:
+        tracker.finish()
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadSessionError as e:
+        tracker.finish()
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except QueueFullError as e:
+        tracker.finish()
+        upload.discard()
+        raise HTTPException(
+            status_code=429,
+            detail="Server busy: analysis queue is full",
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    except Exception as e:
+        tracker.finish()
+        if upload is not None:
+            upload.discard()
+        raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
+
+
+async def wait_for_job(job, request: Request):
+    """
+    Wait for a job's result while watching the client: if it disconnects
+    (or this request is cancelled) the job is cancelled, so an abandoned
+    analysis stops at its next checkpoint and frees its worker.
+    """
+    future = asyncio.wrap_future(job.future)
+    try:
+        while True:
+            done, _ = await asyncio.wait({future}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return future.result()
+            if await request.is_disconnected():
+                get_job_manager().cancel(job.job_id, "client disconnected")
+                return await future
+    except asyncio.CancelledError:
+        get_job_manager().cancel(job.job_id, "request cancelled")
+        raise
+
+
+async def run_analysis(analysis_type: str, file: UploadFile, job_id: Optional[str],
+                       request: Request, trace: bool = False, deadline_ms: Optional[int] = None):
+    """Synchronous analyze endpoints: queue the job and wait for its result"""
+    job = await enqueue_analysis(analysis_type, file, job_id, trace, deadline_ms)
+    return await job_result_response(job, request)
+
+
+async def job_result_response(job, request: Request):
+    """Wait for a queued job and answer with its result, errors mapped to HTTP"""
+    try:
+        return FastJSONResponse(await wait_for_job(job, request))
+    except AnalysisCancelled as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except AnalysisError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+
 @app.get("/")
 async def root():
     """API root endpoint"""
     return {
         "message": "Deepfake Detection API",
-        "version": "2.0",
+        "version": config.API_VERSION,
         "endpoints": {
             "health": "/health",
+            "ready": "/ready",
+            "metrics": "/metrics",
             "quick_image_analysis": "/analyze/image",
             "comprehensive_image_analysis": "/analyze/image/comprehensive",
             "simple_video_analysis": "/analyze/video",
-            "comprehensive_video_analysis": "/analyze/video/comprehensive"
+            "comprehensive_video_analysis": "/analyze/video/comprehensive",
+            "job_progress": "/analyze/progress/{job_id}",
+            "submit_job": "/jobs",
+            "job_status": "/jobs/{job_id}",
+            "cancel_job": "DELETE /jobs/{job_id}",
+            "results": "/results",
+            "result_history": "/results/{content_hash}"
         }
     }
 
@@ -70,6 +333,10 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
+    cache = get_result_cache()
+    store = get_result_store()
+    job_manager = get_job_manager()
+    
     return {
         "status": "healthy",
         "features": {
@@ -77,61 +344,59 @@ async def health_check():
             "frequency_analysis": config.FREQUENCY_ANALYSIS_ENABLED,
             "face_analysis": config.FACE_ANALYSIS_ENABLED,
             "metadata_analysis": config.METADATA_ANALYSIS_ENABLED
-        }
+        },
+        "queue": job_manager.stats(),
+        "cache": cache.stats() if cache else {"enabled": False},
+        "result_store": (await asyncio.to_thread(store.stats)) if store else {"enabled": False},
+        # In process/broker mode the models live in the workers instead
+        "models": get_model_registry().stats() if job_manager.worker_pool is None else None
     }
 
 
+@app.get("/ready")
+async def readiness_check():
+    """
+    Readiness probe: 200 once every model is loaded and warmed up, 503 before.
+    Reports each model's state, load time and warm-up latency.
+    """
+    job_manager = get_job_manager()
+    if job_manager.worker_pool is not None:
+        report = job_manager.worker_pool.readiness()
+    else:
+        warmup = get_model_warmup()
+        report = warmup.report() if warmup is not None else {"ready": False, "models": {}}
+    
+    return JSONResponse(status_code=200 if report["ready"] else 503, content=report)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics: request/layer latency, queue depth, workers, model loads, cache"""
+    return Response(REGISTRY.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 @app.post("/analyze/image")
-async def analyze_image(file: UploadFile = File(...)):
+async def analyze_image(
+    request: Request,
+    file: UploadFile = File(...),
+    job_id: Optional[str] = None,
+    trace: bool = False
+):
     """
     Quick image analysis using single neural network.
     Faster but less comprehensive than /analyze/image/comprehensive
     """
-    try:
-        validate_file(file, config.ALLOWED_IMAGE_EXTENSIONS)
-        
-        path = os.path.join(UPLOAD_DIR, file.filename)
-        
-        with open(path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        image = preprocess_image(path)
-        fake_prob = predict_image(image)
-        
-        if fake_prob > config.RISK_THRESHOLDS['high']:
-            risk = "High"
-        elif fake_prob > config.RISK_THRESHOLDS['medium']:
-            risk = "Medium"
-        else:
-            risk = "Low"
-        
-        report = generate_report(
-            media_type="image",
-            fake_probability=fake_prob,
-            risk_level=risk
-        )
-        
-        # Cleanup
-        try:
-            os.remove(path)
-        except:
-            pass
-        
-        return {
-            "fake_probability": round(fake_prob, 2),
-            "risk_level": risk,
-            "report": report,
-            "analysis_type": "quick"
-        }
-    
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+    return await run_analysis("image_quick", file, job_id, request, trace)
 
 
 @app.post("/analyze/image/comprehensive")
-async def analyze_image_comprehensive_endpoint(file: UploadFile = File(...)):
+async def analyze_image_comprehensive_endpoint(
+    request: Request,
+    file: UploadFile = File(...),
+    job_id: Optional[str] = None,
+    trace: bool = False,
+    deadline_ms: Optional[int] = None
+):
     """
     Comprehensive image analysis using all detection methods:
     - Neural network ensemble (multiple models)
@@ -140,120 +405,65 @@ async def analyze_image_comprehensive_endpoint(file: UploadFile = File(...)):
     - Metadata forensics (EXIF, ELA)
     
     Slower but more accurate and robust.
-    """
-    try:
-        validate_file(file, config.ALLOWED_IMAGE_EXTENSIONS)
-        
-        # Reset progress tracker for new analysis
-        reset_progress_tracker()
-        tracker = get_progress_tracker()
-        
-        path = os.path.join(UPLOAD_DIR, file.filename)
-        
-        with open(path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        tracker.update("File uploaded successfully")
-        
-        # Run comprehensive analysis in background thread to not block SSE
-        loop = asyncio.get_event_loop()
-        results = await loop.run_in_executor(
-            executor,
-            analyze_image_comprehensive,
-            path
-        )
-        
-        # Check for errors
-        if results is None or 'error' in results:
-            error_msg = results.get('error', 'Analysis failed') if results else 'Analysis returned no results'
-            raise HTTPException(status_code=500, detail=error_msg)
-        
-        # Generate detailed report
-        report = generate_comprehensive_report(results)
-        
-        # Cleanup
-        try:
-            os.remove(path)
-        except:
-            pass
-        
-        # Build response with safe defaults
-        response = {
-            "final_score": round(results.get('final_score', 0.5), 3),
-            "risk_level": results.get('risk_level', 'Unknown'),
-            "confidence": round(results.get('confidence', 0.0), 3),
-            "analysis_type": "comprehensive",
-            "report": report
-        }
-        
-        # Add detailed breakdown if enabled
-        if config.ENABLE_DETAILED_BREAKDOWN:
-            response["analysis_breakdown"] = {
-                "neural_network": results.get('neural_network'),
-                "frequency_domain": results.get('frequency_domain'),
-                "facial_analysis": results.get('facial_analysis'),
-                "metadata_forensics": results.get('metadata_forensics')
-            }
-        
-        tracker.update("Complete!")
-        
-        return response
     
-    except HTTPException:
-        raise
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Comprehensive analysis failed: {str(e)}")
+    deadline_ms: optional latency budget - methods other than the neural
+    ensemble are skipped once they no longer fit (see degraded_layers).
+    """
+    return await run_analysis("image_comprehensive", file, job_id, request, trace, deadline_ms)
 
 
-@app.get("/analyze/progress")
-async def get_analysis_progress():
+def progress_event_stream(tracker, replay: bool = False, last_event_id: Optional[str] = None):
     """
-    Server-Sent Events endpoint for real-time progress updates
-    IMPROVED: Better error handling and connection stability
+    Build the SSE generator for a tracker.
+    With replay=True (job channels), buffered messages after last_event_id
+    (all of them for a new client) are replayed first and the stream closes
+    once the job has finished.
+    
+    Messages are pushed from the worker threads onto an asyncio.Queue, so an
+    idle connection just waits - no polling.
     """
+    try:
+        resume_after = max(0, int(last_event_id)) if last_event_id else 0
+    except ValueError:
+        resume_after = 0
+    
     async def event_generator():
-        tracker = get_progress_tracker()
-        message_queue = Queue()
-        last_heartbeat = time.time()
-        max_idle_time = 30  # Close connection after 30 seconds of no activity
+        loop = asyncio.get_running_loop()
+        message_queue = asyncio.Queue()
+        heartbeat_interval = 15  # Keep proxies from closing idle connections
         
-        def callback(message):
-            try:
-                message_queue.put(message)
-            except Exception as e:
-                print(f"Callback error: {e}")
+        def callback(event_id, message):
+            # Runs on the worker thread that sent the update
+            loop.call_soon_threadsafe(message_queue.put_nowait, (event_id, message))
         
-        tracker.add_callback(callback)
+        backlog = tracker.subscribe(callback, resume_after)
+        if replay:
+            for event in backlog:
+                message_queue.put_nowait(event)
+            if tracker.finished:
+                message_queue.put_nowait((None, None))
         
         try:
             while True:
                 try:
-                    # Check for new messages with timeout
-                    if not message_queue.empty():
-                        message = message_queue.get_nowait()
-                        data = json.dumps({'message': message})
-                        yield f"data: {data}\n\n"
-                        last_heartbeat = time.time()
-                    else:
-                        # Check if connection has been idle too long
-                        current_time = time.time()
-                        if current_time - last_heartbeat > max_idle_time:
-                            print(f"SSE connection idle for {max_idle_time}s, closing...")
-                            break
-                        
-                        # Send heartbeat every 15 seconds to keep connection alive
-                        if current_time - last_heartbeat > 15:
-                            yield f": heartbeat\n\n"
-                            last_heartbeat = current_time
-                        
-                        # Small sleep to prevent CPU spinning
-                        await asyncio.sleep(0.1)
-                        
-                except Exception as e:
-                    print(f"SSE error: {e}")
-                    await asyncio.sleep(0.1)
+                    event_id, message = await asyncio.wait_for(
+                        message_queue.get(), timeout=heartbeat_interval
+                    )
+                except asyncio.TimeoutError:
+                    yield ": heartbeat\n\n"
+                    continue
+                
+                if message is None:
+                    # Job channel is done once the job finished and everything was sent
+                    if replay:
+                        break
+                    continue
+                
+                data = json.dumps({'message': message})
+                if event_id is not None:
+                    yield f"id: {event_id}\ndata: {data}\n\n"
+                else:
+                    yield f"data: {data}\n\n"
                     
         except (asyncio.CancelledError, GeneratorExit) as e:
             # Client disconnected - clean up gracefully
@@ -261,8 +471,7 @@ async def get_analysis_progress():
         finally:
             # Always try to remove callback on exit
             try:
-                if callback in tracker.callbacks:
-                    tracker.callbacks.remove(callback)
+                tracker.remove_callback(callback)
             except Exception as e:
                 print(f"Cleanup error: {e}")
     
@@ -278,161 +487,114 @@ async def get_analysis_progress():
     )
 
 
+@app.post("/analyze/path")
+async def analyze_path(
+    request: Request,
+    path: str = Form(...),
+    analysis_type: Optional[str] = Form(None),
+    job_id: Optional[str] = None,
+    trace: bool = False,
+    deadline_ms: Optional[int] = None
+):
+    """
+    Analyze a file already on a volume the API can read, without uploading it.
+    
+    path: absolute, or relative to one of ANALYZE_PATH_ROOTS; it must resolve
+    inside them (403 otherwise). Disabled (404) unless ANALYZE_PATH_ROOTS is set.
+    analysis_type: defaults to image_comprehensive or video_comprehensive
+    by the file's extension.
+    
+    The file is read in place - no copy into UPLOAD_DIR and no upload size
+    limit - and is never modified or deleted.
+    """
+    try:
+        real_path = resolve_ingest_path(path)
+    except PathNotAllowedError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+    
+    if analysis_type is None:
+        analysis_type = default_analysis_type(real_path)
+        if analysis_type is None:
+            raise HTTPException(status_code=400, detail="Not an image or video file")
+    
+    async def spool(dest_path: str, memory_limit: int):
+        return await asyncio.to_thread(link_ingest_path, real_path, dest_path)
+    
+    job = await enqueue_upload(analysis_type, real_path, job_id, trace, deadline_ms, spool)
+    return await job_result_response(job, request)
+
+
+@app.get("/analyze/progress")
+async def get_analysis_progress():
+    """
+    Server-Sent Events endpoint for real-time progress updates
+    IMPROVED: Better error handling and connection stability
+    LEGACY: Streams the messages of every running job.
+    Use /analyze/progress/{job_id} to follow a single analysis.
+    """
+    return progress_event_stream(get_progress_tracker())
+
+
+@app.get("/analyze/progress/{job_id}")
+async def get_job_progress(
+    job_id: str,
+    last_event_id: Optional[str] = Header(None),
+    after: Optional[str] = None
+):
+    """
+    Server-Sent Events endpoint for a single job.
+    May be opened before the upload starts by passing the same job_id
+    to the analyze endpoint; earlier messages are replayed on connect.
+    Reconnecting clients resume after their Last-Event-ID header
+    (or ?after=<event id>) instead of receiving everything again.
+    """
+    if not is_valid_job_id(job_id):
+        raise HTTPException(status_code=400, detail="Invalid job_id")
+    
+    return progress_event_stream(
+        get_or_create_job_tracker(job_id),
+        replay=True,
+        last_event_id=last_event_id or after
+    )
+
+
 @app.post("/analyze/video")
-async def analyze_video_endpoint(file: UploadFile = File(...)):
+async def analyze_video_endpoint(
+    request: Request,
+    file: UploadFile = File(...),
+    job_id: Optional[str] = None,
+    trace: bool = False
+):
     """
     OLD Simple video analysis (frame-by-frame only).
     Use /analyze/video/comprehensive for full hybrid detection.
     """
-    try:
-        validate_file(file, config.ALLOWED_VIDEO_EXTENSIONS)
-        
-        video_path = os.path.join(UPLOAD_DIR, file.filename)
-        
-        with open(video_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        result = analyze_video(video_path)
-        
-        # Cleanup
-        try:
-            os.remove(video_path)
-        except:
-            pass
-        
-        if result is None:
-            raise HTTPException(status_code=400, detail="No frames could be analyzed")
-        
-        return result
-    
-    except HTTPException:
-        raise
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Video analysis failed: {str(e)}")
+    return await run_analysis("video_legacy", file, job_id, request, trace)
 
 
 @app.post("/analyze/video/quick")
-async def analyze_video_quick_endpoint(file: UploadFile = File(...)):
+async def analyze_video_quick_endpoint(
+    request: Request,
+    file: UploadFile = File(...),
+    job_id: Optional[str] = None,
+    trace: bool = False
+):
     """
     Quick video deepfake detection (Layers 1, 2A, 2B only).
     Faster but potentially less accurate than comprehensive analysis.
     Skips: Physiological analysis, Physics checks, and Specialized detection.
     """
-    try:
-        validate_file(file, config.ALLOWED_VIDEO_EXTENSIONS)
-        
-        # Reset progress tracker for new analysis
-        reset_progress_tracker()
-        tracker = get_progress_tracker()
-        
-        video_path = os.path.join(UPLOAD_DIR, file.filename)
-        
-        # Save uploaded file
-        with open(video_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        tracker.update("File uploaded successfully")
-        
-        # Import quick detector
-        from models.video.quick_detector import analyze_video_quick
-        
-        # Run quick analysis in background thread
-        loop = asyncio.get_event_loop()
-        results = await loop.run_in_executor(
-            executor,
-            analyze_video_quick,
-            video_path
-        )
-        
-        # Cleanup uploaded file and temp frames
-        try:
-            os.remove(video_path)
-        except:
-            pass
-        
-        try:
-            import shutil as sh
-            if os.path.exists("temp_frames"):
-                sh.rmtree("temp_frames")
-        except:
-            pass
-        
-        # Check for errors
-        if results is None:
-            raise HTTPException(status_code=500, detail="Analysis returned no results")
-            
-        if 'error' in results:
-            raise HTTPException(status_code=500, detail=results['error'])
-        
-        # Build response
-        response = {
-            "final_score": round(results.get('final_score', 0.5), 3),
-            "risk_level": results.get('risk_level', 'Unknown'),
-            "confidence": round(results.get('confidence', 0.0), 3),
-            "analysis_type": "quick",
-            "method_breakdown": results.get('method_breakdown', {}),
-            "warning": "Quick analysis - some detection layers were skipped for speed"
-        }
-        
-        # Add layer summaries
-        response["layer_summaries"] = {}
-        
-        # Layer 1: Metadata
-        if results.get('layer1_metadata'):
-            meta = results['layer1_metadata']
-            response["layer_summaries"]["metadata"] = {
-                "score": round(meta.get('score', 0), 3),
-                "has_audio": meta.get('has_audio', False)
-            }
-        
-        # Layer 2A: Visual
-        response["layer_summaries"]["visual"] = {}
-        
-        if results.get('layer2a_frame_based'):
-            frame = results['layer2a_frame_based']
-            response["layer_summaries"]["visual"]["frame_based"] = {
-                "ensemble_avg": round(frame.get('avg_ensemble', 0), 3),
-                "ensemble_max": round(frame.get('max_ensemble', 0), 3),
-                "face_avg": round(frame.get('avg_face', 0), 3)
-            }
-        
-        if results.get('layer2a_temporal'):
-            temp = results['layer2a_temporal']
-            response["layer_summaries"]["visual"]["temporal"] = {
-                "score": round(temp.get('score', 0), 3),
-                "identity_shifts": temp.get('identity_shifts', 0)
-            }
-        
-        if results.get('layer2a_3d_video'):
-            video3d = results['layer2a_3d_video']
-            response["layer_summaries"]["visual"]["3d_model"] = {
-                "score": round(video3d.get('score', 0), 3)
-            }
-        
-        # Layer 2B: Audio
-        if results.get('layer2b_audio'):
-            audio = results['layer2b_audio']
-            if audio.get('has_audio'):
-                response["layer_summaries"]["audio"] = {
-                    "score": round(audio.get('score', 0), 3)
-                }
-            else:
-                response["layer_summaries"]["audio"] = {"present": False}
-        
-        tracker.update("Quick analysis complete!")
-        
-        return response
-    
-    except HTTPException:
-        raise
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Quick video analysis failed: {str(e)}")
+    return await run_analysis("video_quick", file, job_id, request, trace)
 
 
 @app.post("/analyze/video/comprehensive")
-async def analyze_video_comprehensive_endpoint(file: UploadFile = File(...)):
+async def analyze_video_comprehensive_endpoint(
+    request: Request,
+    file: UploadFile = File(...),
+    job_id: Optional[str] = None,
+    trace: bool = False,
+    deadline_ms: Optional[int] = None
+):
     """
     Comprehensive HYBRID video deepfake detection:
     
@@ -463,167 +625,217 @@ async def analyze_video_comprehensive_endpoint(file: UploadFile = File(...)):
        - Shadow analysis
     
     Returns detailed multi-modal analysis with high confidence scoring.
+    
+    deadline_ms: optional latency budget - fewer frames are analyzed and the
+    3D model, physics and boundary layers are skipped when time runs short.
+    The response lists what was cut in degraded_layers.
+    """
+    return await run_analysis("video_comprehensive", file, job_id, request, trace, deadline_ms)
+
+
+@app.post("/jobs", status_code=202)
+async def submit_job_endpoint(
+    file: UploadFile = File(...),
+    analysis_type: str = Form(...),
+    job_id: Optional[str] = None,
+    trace: bool = False,
+    deadline_ms: Optional[int] = None
+):
+    """
+    Asynchronous analysis: queue the upload and return immediately.
+    
+    analysis_type: image_quick, image_comprehensive, video_quick, video_comprehensive or video_legacy
+    deadline_ms (comprehensive types only): latency budget, queue time included
+    
+    Poll GET /jobs/{job_id} for status and result, or follow
+    /analyze/progress/{job_id} for live progress.
+    Returns 429 with Retry-After when the queue is full.
     """
+    job = await enqueue_analysis(analysis_type, file, job_id, trace, deadline_ms)
+    
+    return job_accepted(job)
+
+
+def job_accepted(job) -> dict:
+    """Response of the asynchronous submit endpoints"""
+    return {
+        "job_id": job.job_id,
+        "status": job.status,
+        "status_url": f"/jobs/{job.job_id}",
+        "progress_url": f"/analyze/progress/{job.job_id}"
+    }
+
+
+@app.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """Status of a queued job, with the result once completed"""
+    job = get_job_manager().get(job_id)
+    
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    
+    return FastJSONResponse(job.to_dict())
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """
+    Cancel a job. A queued job is dropped; a running one stops at its next
+    checkpoint. A job sharing its analysis with other requests (coalesced)
+    only stops that analysis once none of them still wait for it.
+    """
+    job_manager = get_job_manager()
+    job = job_manager.cancel(job_id, "cancelled by client")
+    
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Unknown job {job_id}")
+    
+    return FastJSONResponse(job.to_dict())
+
+
+def upload_session_call(method, *args):
     try:
-        validate_file(file, config.ALLOWED_VIDEO_EXTENSIONS)
-        
-        # Reset progress tracker for new analysis
-        reset_progress_tracker()
-        tracker = get_progress_tracker()
-        
-        video_path = os.path.join(UPLOAD_DIR, file.filename)
-        
-        # Save uploaded file
-        with open(video_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        tracker.update("File uploaded successfully")
-        
-        # Import comprehensive detector
-        from models.video.comprehensive_detector import analyze_video_comprehensive
-        
-        # Run full hybrid analysis in background thread to not block SSE
-        loop = asyncio.get_event_loop()
-        results = await loop.run_in_executor(
-            executor,
-            analyze_video_comprehensive,
-            video_path
+        return method(*args)
+    except UploadSessionError as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+
+@app.post("/uploads", status_code=201)
+async def create_upload(
+    filename: str = Form(...),
+    size: int = Form(...),
+    sha256: Optional[str] = Form(None)
+):
+    """
+    Start a resumable chunked upload of a large file.
+    
+    size: total bytes; sha256 (optional): SHA-256 of the whole file, checked on complete
+    
+    PUT each chunk (chunk_size bytes, the last one shorter) to
+    /uploads/{upload_id}/chunks/{index} with its SHA-256 in X-Chunk-SHA256,
+    in any order, then POST /uploads/{upload_id}/complete.
+    """
+    manager = get_upload_manager()
+    session = await asyncio.to_thread(upload_session_call, manager.create, filename, size, sha256)
+    return session.to_dict()
+
+
+@app.put("/uploads/{upload_id}/chunks/{index}")
+async def upload_chunk(
+    upload_id: str,
+    index: int,
+    request: Request,
+    x_chunk_sha256: str = Header(...)
+):
+    """
+    Store one chunk. 400 if it doesn't match its X-Chunk-SHA256 (send it
+    again); re-sending a chunk already stored is harmless. Content-Length
+    must be the chunk's length, so a wrong chunk is refused before its body
+    is read.
+    """
+    manager = get_upload_manager()
+    session = upload_session_call(manager.get, upload_id)
+    expected = upload_session_call(session.expected_length, index)
+    content_length = request.headers.get('content-length')
+    if content_length is None:
+        raise HTTPException(status_code=411, detail=f"Content-Length is required (chunk {index} is {expected} bytes)")
+    if content_length != str(expected):
+        raise HTTPException(
+            status_code=400, detail=f"Chunk {index} must be {expected} bytes, got Content-Length {content_length}"
         )
-        
-        # Cleanup uploaded file and temp frames
-        try:
-            os.remove(video_path)
-        except:
-            pass
-        
-        try:
-            import shutil as sh
-            if os.path.exists("temp_frames"):
-                sh.rmtree("temp_frames")
-        except:
-            pass
-        
-        # Check for errors
-        if results is None:
-            raise HTTPException(status_code=500, detail="Analysis returned no results")
-            
-        if 'error' in results:
-            raise HTTPException(status_code=500, detail=results['error'])
-        
-        # Build response with safe defaults
-        response = {
-            "final_score": round(results.get('final_score', 0.5), 3),
-            "risk_level": results.get('risk_level', 'Unknown'),
-            "confidence": round(results.get('confidence', 0.0), 3),
-            "analysis_type": "comprehensive_hybrid",
-            "method_breakdown": results.get('method_breakdown', {})
-        }
-        
-        # Add layer summaries with safe gets
-        response["layer_summaries"] = {}
-        
-        # Layer 1: Metadata
-        if results.get('layer1_metadata'):
-            meta = results['layer1_metadata']
-            response["layer_summaries"]["metadata"] = {
-                "score": round(meta.get('score', 0), 3),
-                "has_audio": meta.get('has_audio', False),
-                "suspicious_indicators": meta.get('suspicious_indicators', [])
-            }
-        
-        # Layer 2A: Visual
-        response["layer_summaries"]["visual"] = {}
-        
-        if results.get('layer2a_frame_based'):
-            frame = results['layer2a_frame_based']
-            response["layer_summaries"]["visual"]["frame_based"] = {
-                "ensemble_avg": round(frame.get('avg_ensemble', 0), 3),
-                "ensemble_max": round(frame.get('max_ensemble', 0), 3),
-                "face_avg": round(frame.get('avg_face', 0), 3),
-                "frequency_avg": round(frame.get('avg_frequency', 0), 3)
-            }
-        
-        if results.get('layer2a_temporal'):
-            temp = results['layer2a_temporal']
-            response["layer_summaries"]["visual"]["temporal"] = {
-                "score": round(temp.get('score', 0), 3),
-                "identity_shifts": temp.get('identity_shifts', 0),
-                "motion_smoothness": round(temp.get('motion_smoothness', 0), 3),
-                "anomalies": temp.get('inconsistencies', [])
-            }
-        
-        if results.get('layer2a_3d_video'):
-            video3d = results['layer2a_3d_video']
-            response["layer_summaries"]["visual"]["3d_model"] = {
-                "score": round(video3d.get('score', 0), 3),
-                "method": video3d.get('method', 'unknown')
-            }
-        
-        # Layer 2B: Audio
-        if results.get('layer2b_audio'):
-            audio = results['layer2b_audio']
-            if audio.get('has_audio'):
-                response["layer_summaries"]["audio"] = {
-                    "score": round(audio.get('score', 0), 3),
-                    "voice_deepfake": round(audio.get('voice_deepfake_score', 0), 3),
-                    "lip_sync": round(audio.get('lip_sync_score', 0), 3),
-                    "anomalies": audio.get('anomalies', [])
-                }
-            else:
-                response["layer_summaries"]["audio"] = {"present": False}
-        
-        # Layer 2C: Physiological
-        if results.get('layer2c_physiological'):
-            physio = results['layer2c_physiological']
-            response["layer_summaries"]["physiological"] = {
-                "score": round(physio.get('score', 0), 3),
-                "heartbeat_detected": physio.get('heartbeat_detected', False),
-                "heartbeat_bpm": physio.get('heartbeat_bpm', 0),
-                "natural_blink_pattern": physio.get('blink_pattern_natural', False),
-                "blink_count": physio.get('blink_count', 0),
-                "anomalies": physio.get('anomalies', [])
-            }
-        
-        # Layer 2D: Physics
-        if results.get('layer2d_physics'):
-            physics = results['layer2d_physics']
-            response["layer_summaries"]["physics"] = {
-                "score": round(physics.get('score', 0), 3),
-                "lighting_consistent": physics.get('lighting_consistent', True),
-                "depth_plausible": physics.get('depth_plausible', True),
-                "anomalies": physics.get('anomalies', [])
-            }
-        
-        # Layer 3: Specialized
-        response["layer_summaries"]["specialized"] = {}
-        
-        if results.get('layer3_boundary'):
-            boundary = results['layer3_boundary']
-            response["layer_summaries"]["specialized"]["boundary"] = {
-                "score": round(boundary.get('score', 0), 3),
-                "suspicious_transitions": len(boundary.get('suspicious_transitions', [])),
-                "quality_drops": boundary.get('quality_drops', 0)
-            }
-        
-        if results.get('layer3_compression'):
-            compression = results['layer3_compression']
-            response["layer_summaries"]["specialized"]["compression"] = {
-                "score": round(compression.get('score', 0), 3),
-                "mismatches": compression.get('compression_mismatches', 0),
-                "face_compression": round(compression.get('avg_face_compression', 0), 3),
-                "background_compression": round(compression.get('avg_background_compression', 0), 3)
-            }
-        
-        tracker.update("Analysis complete!")
-        
-        return response
+    data = await request.body()
+    session = await asyncio.to_thread(
+        upload_session_call, manager.write_chunk, upload_id, index, data, x_chunk_sha256
+    )
+    return session.to_dict()
+
+
+@app.get("/uploads/{upload_id}")
+async def get_upload(upload_id: str):
+    """Upload status - missing_chunks are what a resuming client still has to send"""
+    return upload_session_call(get_upload_manager().get, upload_id).to_dict()
+
+
+@app.post("/uploads/{upload_id}/complete", status_code=202)
+async def complete_upload(
+    upload_id: str,
+    analysis_type: str = Form(...),
+    job_id: Optional[str] = None,
+    trace: bool = False,
+    deadline_ms: Optional[int] = None
+):
+    """
+    Queue the analysis of a fully uploaded file, as POST /jobs does.
+    409 while chunks are missing; 422 (and the upload is dropped) if the
+    file doesn't match the sha256 it was started with.
+    """
+    manager = get_upload_manager()
+    # Before a job is claimed, so a client can still send what's missing
+    session = upload_session_call(manager.check_complete, upload_id)
     
-    except HTTPException:
-        raise
-    except Exception as e:
-        import traceback
-        traceback.print_exc()
-        raise HTTPException(status_code=500, detail=f"Comprehensive video analysis failed: {str(e)}")
+    async def spool(path: str, memory_limit: int):
+        # Linked into place without copying; always analyzed from disk
+        return await asyncio.to_thread(manager.assemble, upload_id, path)
+    
+    job = await enqueue_upload(analysis_type, session.filename, job_id, trace, deadline_ms, spool)
+    # Queued (or answered from the cache): the job has its own link to the file.
+    # Until then the upload stays, so a 429 can be retried without re-sending it
+    manager.close(upload_id)
+    
+    return job_accepted(job)
+
+
+@app.delete("/uploads/{upload_id}")
+async def cancel_upload(upload_id: str):
+    """Abandon an upload and free its disk space"""
+    if not get_upload_manager().close(upload_id):
+        raise HTTPException(status_code=404, detail=f"Unknown or expired upload {upload_id}")
+    return {"upload_id": upload_id, "status": "cancelled"}
+
+
+def require_result_store():
+    store = get_result_store()
+    if store is None:
+        raise HTTPException(status_code=404, detail="Result history is disabled (RESULT_STORE_ENABLED)")
+    return store
+
+
+@app.get("/results")
+async def list_results(
+    limit: int = 50,
+    before: Optional[int] = None,
+    analysis_type: Optional[str] = None,
+    media_type: Optional[str] = None,
+    since: Optional[float] = None,
+    until: Optional[float] = None
+):
+    """
+    Analysis history, newest first: hash, media type, score, risk level,
+    per-layer scores, timings and model versions of every analysis.
+    
+    Paginate with limit (max 200) and before=<next_before of the previous page>.
+    Filter by analysis_type, media_type (image|video) and since/until (unix time).
+    """
+    store = require_result_store()
+    page = await asyncio.to_thread(
+        store.page, limit, before, analysis_type, media_type, since, until
+    )
+    return FastJSONResponse(page)
+
+
+@app.get("/results/{content_hash}")
+async def get_result_history(content_hash: str):
+    """Every recorded analysis of the media with this SHA-256, full results included"""
+    store = require_result_store()
+    content_hash = content_hash.lower()
+    if not CONTENT_HASH_PATTERN.match(content_hash):
+        raise HTTPException(status_code=400, detail="content_hash must be a SHA-256 hex digest")
+    
+    results = await asyncio.to_thread(store.history, content_hash)
+    if not results:
+        raise HTTPException(status_code=404, detail=f"No results for {content_hash}")
+    
+    return FastJSONResponse({"content_hash": content_hash, "results": results})
 
 
 @app.on_event("startup")
@@ -638,14 +850,17 @@ async def startup_event():
     print(f"  - Metadata Analysis: {config.METADATA_ANALYSIS_ENABLED}")
     print(f"  - Hybrid Video Detection: Available (Layer 1 + 2)")
     
-    # Preload models
-    if config.NEURAL_ENSEMBLE_ENABLED:
-        from models.ensemble_detector import get_ensemble_detector
-        get_ensemble_detector()
-    
-    if config.FACE_ANALYSIS_ENABLED:
-        from models.face_analyzer import get_face_analyzer
-        get_face_analyzer()
+    # Models load and warm up in the background; /ready reports when they're done
+    job_manager = get_job_manager()
+    if job_manager.worker_pool is not None:
+        # Models are loaded inside each worker process (or worker node) instead
+        if job_manager.worker_pool.mode == 'broker':
+            print(f"  - Job broker: {config.JOB_BROKER_URL}")
+        else:
+            print(f"  - Worker processes: {config.ANALYSIS_WORKERS}")
+        job_manager.worker_pool.start()
+    else:
+        start_model_warmup()
     
     print("\nVideo Detection Capabilities:")
     print("  - Smart frame extraction")
@@ -655,7 +870,15 @@ async def startup_event():
     print("  - Physiological signals (heartbeat, blinks)")
     print("  - Physics consistency checks")
     
-    print("\nSystem ready!")
+    print("\nServer started - models warming up (see /ready)")
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop worker processes (or in-process broker workers)"""
+    job_manager = get_job_manager()
+    if job_manager.worker_pool is not None:
+        job_manager.worker_pool.shutdown()
 
 
 if __name__ == "__main__":
@@ -1,26 +1,14 @@
-import torch
-from transformers import AutoImageProcessor, AutoModelForImageClassification
-from PIL import Image
-
-DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+"""
+Quick single-model prediction (dima806/deepfake_vs_real_image_detection).
 
-processor = AutoImageProcessor.from_pretrained(
-    "dima806/deepfake_vs_real_image_detection",
-    use_fast=True
-)
+The model is not loaded separately: the copy held by the EnsembleDetector
+is used, so the process keeps one ViT instead of two.
+"""
+from PIL import Image
+from models.ensemble_detector import get_ensemble_detector
 
-model = AutoModelForImageClassification.from_pretrained(
-    "dima806/deepfake_vs_real_image_detection"
-).to(DEVICE)
+QUICK_MODEL = "dima806/deepfake_vs_real_image_detection"
 
-model.eval()
 
 def predict_image(image: Image.Image):
-    inputs = processor(images=image, return_tensors="pt").to(DEVICE)
-
-    with torch.no_grad():
-        outputs = model(**inputs)
-        probs = torch.softmax(outputs.logits, dim=1)
-
-    fake_prob = probs[0][1].item()
-    return fake_prob
+    return get_ensemble_detector().predict_single(image, QUICK_MODEL)
@@ -1,8 +1,11 @@
 import torch
-from transformers import AutoImageProcessor, AutoModelForImageClassification
 from PIL import Image
 import numpy as np
+from models.model_bundle import load_hf_model
+from models.model_registry import get_model, register_model
 from models.progress_tracker import get_progress_tracker
+from utils.metrics import timed_layer, time_model_load
+from utils.tracing import span
 
 # Fix for torch.compiler compatibility issue with Transformers 4.57.3
 if not hasattr(torch, 'compiler'):
@@ -36,15 +39,11 @@ class EnsembleDetector:
         try:
             cache_dir = "./models_cache/huggingface"
             print(f"  [1/2] Loading prithivMLmods/Deep-Fake-Detector-Model...")
-            processor1 = AutoImageProcessor.from_pretrained(
-                "prithivMLmods/Deep-Fake-Detector-Model",
-                cache_dir=cache_dir,
-                use_fast=True
-            )
-            model1 = AutoModelForImageClassification.from_pretrained(
+            processor1, model1 = load_hf_model(
                 "prithivMLmods/Deep-Fake-Detector-Model",
                 cache_dir=cache_dir
-            ).to(DEVICE)
+            )
+            model1 = model1.to(DEVICE)
             model1.eval()
             
             self.models.append(model1)
@@ -60,14 +59,11 @@ class EnsembleDetector:
         try:
             cache_dir = "./models_cache/huggingface"
             print(f"  [2/2] Loading dima806/deepfake_vs_real_image_detection...")
-            processor2 = AutoImageProcessor.from_pretrained(
+            processor2, model2 = load_hf_model(
                 "dima806/deepfake_vs_real_image_detection",
                 cache_dir=cache_dir
             )
-            model2 = AutoModelForImageClassification.from_pretrained(
-                "dima806/deepfake_vs_real_image_detection",
-                cache_dir=cache_dir
-            ).to(DEVICE)
+            model2 = model2.to(DEVICE)
             model2.eval()
             
             self.models.append(model2)
@@ -189,6 +185,22 @@ class EnsembleDetector:
             'num_models': len(self.models)
         }
     
+    def predict_single(self, image, model_name):
+        """
+        Fake probability from one of the ensemble's models (quick scans).
+        Raises if that model failed to load - the ensemble score is a
+        different measurement and is not passed off as this one.
+        """
+        if model_name not in self.model_names:
+            raise RuntimeError(f"{model_name} failed to load - quick analysis is unavailable")
+        
+        if isinstance(image, str):
+            image = Image.open(image).convert('RGB')
+        
+        i = self.model_names.index(model_name)
+        score, _ = self._predict_huggingface(image, self.models[i], self.processors[i], i + 1, len(self.models), silent=True)
+        return score
+    
     def _predict_huggingface(self, image, model, processor, model_num, total_models, silent=False):
         """Run inference on HuggingFace model"""
         if not silent:
@@ -196,7 +208,7 @@ class EnsembleDetector:
             tracker.update(f"      Running neural network inference...")
         inputs = processor(images=image, return_tensors="pt").to(DEVICE)
         
-        with torch.no_grad():
+        with span(f"forward:ensemble_model_{model_num}"), torch.no_grad():
             outputs = model(**inputs)
             probs = torch.softmax(outputs.logits, dim=1)
         
@@ -238,15 +250,18 @@ class EnsembleDetector:
             return "disagreement"
 
 
-_ensemble_detector = None
+def _load_ensemble_detector():
+    with time_model_load('ensemble'):
+        return EnsembleDetector()
+
+
+register_model('ensemble', _load_ensemble_detector, required=True)
 
 def get_ensemble_detector():
-    global _ensemble_detector
-    if _ensemble_detector is None:
-        _ensemble_detector = EnsembleDetector()
-    return _ensemble_detector
+    return get_model('ensemble')
 
 
+@timed_layer()
 def predict_ensemble(image, silent=False):
     """Convenience function"""
     detector = get_ensemble_detector()
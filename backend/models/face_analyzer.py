@@ -2,8 +2,13 @@ import numpy as np
 from PIL import Image
 import cv2
 import os
+import threading
 import urllib.request
+from models.model_registry import get_model, register_model
+from utils.metrics import timed_layer, time_model_load
+from utils.tracing import span
 
+@timed_layer()
 def analyze_face(image):
     """
     Enhanced facial analysis with weighted scoring.
@@ -234,7 +239,8 @@ class FaceAnalyzer:
                 import mediapipe as mp
                 
                 mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=image)
-                detection_result = self.detector.detect(mp_image)
+                with span("forward:face_landmarker"):
+                    detection_result = self.detector.detect(mp_image)
                 
                 if not detection_result.face_landmarks:
                     return None
@@ -526,10 +532,61 @@ class FaceAnalyzer:
         return float(score)
 
 
-_face_analyzer = None
+class SharedFaceLandmarker:
+    """
+    MediaPipe face landmarker shared by the video analyzers.
+    One graph serves every analysis, so detect() calls are serialized.
+    """
+    def __init__(self):
+        if not MEDIAPIPE_AVAILABLE:
+            raise RuntimeError("MediaPipe Tasks API not available")
+        if not download_model():
+            raise RuntimeError("Face landmarker model not found")
+        
+        from mediapipe.tasks import python
+        from mediapipe.tasks.python import vision
+        
+        base_options = python.BaseOptions(
+            model_asset_path=FACE_LANDMARKER_MODEL,
+            delegate=python.BaseOptions.Delegate.CPU
+        )
+        
+        options = vision.FaceLandmarkerOptions(
+            base_options=base_options,
+            running_mode=vision.RunningMode.IMAGE,
+            output_face_blendshapes=False,
+            output_facial_transformation_matrixes=False,
+            num_faces=1,
+            min_face_detection_confidence=0.5,
+            min_face_presence_confidence=0.5,
+            min_tracking_confidence=0.5
+        )
+        
+        self._landmarker = vision.FaceLandmarker.create_from_options(options)
+        self._lock = threading.Lock()
+    
+    def detect(self, mp_image):
+        with self._lock:
+            return self._landmarker.detect(mp_image)
+
+
+def _load_face_analyzer():
+    with time_model_load('face_analyzer'):
+        return FaceAnalyzer()
+
+
+def _load_video_face_landmarker():
+    with time_model_load('video_face_landmarker'):
+        return SharedFaceLandmarker()
+
+
+register_model('face_analyzer', _load_face_analyzer)
+register_model('video_face_landmarker', _load_video_face_landmarker)
 
 def get_face_analyzer():
-    global _face_analyzer
-    if _face_analyzer is None:
-        _face_analyzer = FaceAnalyzer()
-    return _face_analyzer
+    return get_model('face_analyzer')
+
+
+def get_video_face_landmarker():
+    """Shared landmarker for the video analyzers (raises if MediaPipe is unavailable)"""
+    return get_model('video_face_landmarker')
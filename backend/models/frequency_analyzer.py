@@ -3,8 +3,10 @@ from PIL import Image
 import cv2
 from scipy import fftpack
 from utils.forensics_utils import convert_to_frequency_domain, apply_dct
+from utils.metrics import timed_layer
 
 
+@timed_layer()
 def analyze_frequency_domain(image):
     """
     Main entry point for frequency domain analysis.
@@ -3,8 +3,11 @@ from PIL import Image
 import piexif
 import numpy as np
 from utils.forensics_utils import apply_ela
+from utils.image_utils import open_image
+from utils.metrics import timed_layer
 
 
+@timed_layer()
 def analyze_metadata(image_path):
     """
     Enhanced metadata and file forensics analysis.
@@ -216,7 +219,7 @@ def check_compression_consistency(image_path):
     Enhanced JPEG compression consistency check.
     """
     try:
-        image = Image.open(image_path).convert('RGB')
+        image = open_image(image_path).convert('RGB')
         img_array = np.array(image)
         
         h, w = img_array.shape[:2]
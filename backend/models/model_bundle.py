@@ -0,0 +1,268 @@
+"""
+Offline model bundle.
+
+`python -m veritas bundle <dir>` downloads every model once and writes it
+to <dir> as safetensors, next to a manifest.json. With MODEL_BUNDLE_DIR
+pointing at that directory, the loaders read weights from it instead of
+the network:
+
+- weights are memory-mapped (copy-on-write) and assigned straight into the
+  model, so nothing is deserialized onto the heap and every process on the
+  host shares the same page-cache pages;
+- HuggingFace configs/processors, the MiDaS hub code and the FaceNet
+  architecture all come from local files, so startup works offline.
+
+Anything missing from the bundle falls back to the usual download path.
+"""
+import contextlib
+import json
+import mmap
+import os
+import shutil
+import struct
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+import config
+
+BUNDLE_FORMAT_VERSION = 1
+MANIFEST_FILE = 'manifest.json'
+
+# HuggingFace repos used by the analyzers: repo id -> (model class, processor class, processor kwargs)
+HF_MODELS = {
+    'prithivMLmods/Deep-Fake-Detector-Model': ('AutoModelForImageClassification', 'AutoImageProcessor', {'use_fast': True}),
+    'dima806/deepfake_vs_real_image_detection': ('AutoModelForImageClassification', 'AutoImageProcessor', {'use_fast': True}),
+    'MCG-NJU/videomae-base': ('VideoMAEForVideoClassification', 'VideoMAEImageProcessor', {}),
+}
+
+FACENET_WEIGHTS = 'facenet_vggface2'
+# The VGGFace2 checkpoint carries its 8631-identity classifier; only the embedder is used
+FACENET_UNUSED_PREFIXES = ('logits.',)
+MIDAS_WEIGHTS = 'midas_small'
+MIDAS_HUB_REPOS = ('intel-isl_MiDaS_master', 'rwightman_gen-efficientnet-pytorch_master')
+
+_manifest: Optional[dict] = None
+_manifest_checked = False
+
+
+def get_manifest() -> Optional[dict]:
+    global _manifest, _manifest_checked
+    if not _manifest_checked:
+        _manifest_checked = True
+        if config.MODEL_BUNDLE_DIR:
+            path = os.path.join(config.MODEL_BUNDLE_DIR, MANIFEST_FILE)
+            try:
+                with open(path, encoding='utf-8') as f:
+                    _manifest = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Model bundle not usable ({path}): {e} - downloading models instead")
+    return _manifest
+
+
+def bundled_path(name: str) -> Optional[str]:
+    """Absolute path of a bundled model entry, or None if it isn't bundled"""
+    manifest = get_manifest()
+    if manifest is None or name not in manifest['models']:
+        return None
+    return os.path.join(config.MODEL_BUNDLE_DIR, manifest['models'][name]['path'])
+
+
+def load_safetensors_mmap(path: str) -> Dict[str, 'torch.Tensor']:
+    """
+    Tensors of a safetensors file, backed by a private memory map of it.
+    Pages are shared with the page cache until written, and inference
+    never writes weights.
+    """
+    import torch
+    
+    dtypes = {
+        'F64': torch.float64, 'F32': torch.float32, 'F16': torch.float16, 'BF16': torch.bfloat16,
+        'I64': torch.int64, 'I32': torch.int32, 'I16': torch.int16, 'I8': torch.int8,
+        'U8': torch.uint8, 'BOOL': torch.bool,
+    }
+    
+    with open(path, 'rb') as f:
+        header_len = struct.unpack('<Q', f.read(8))[0]
+        header = json.loads(f.read(header_len))
+        buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_COPY)
+    header.pop('__metadata__', None)
+    data_start = 8 + header_len
+    
+    tensors = {}
+    for name, info in header.items():
+        dtype = dtypes[info['dtype']]
+        begin, end = info['data_offsets']
+        shape = info['shape']
+        if end == begin:
+            tensors[name] = torch.empty(shape, dtype=dtype)
+            continue
+        count = (end - begin) // torch.empty((), dtype=dtype).element_size()
+        tensors[name] = torch.frombuffer(buffer, dtype=dtype, count=count, offset=data_start + begin).reshape(shape)
+    return tensors
+
+
+def assign_bundled_weights(module, path: str, ignore_prefixes: Tuple[str, ...] = ()):
+    """
+    Point module's parameters at the memory-mapped weights in path.
+    Tensors under ignore_prefixes are left out (bundles written before
+    they were dropped still carry them).
+    """
+    state = load_safetensors_mmap(path)
+    if ignore_prefixes:
+        state = {name: tensor for name, tensor in state.items() if not name.startswith(ignore_prefixes)}
+    missing, unexpected = module.load_state_dict(state, strict=False, assign=True)
+    if missing or unexpected:
+        raise ValueError(f"{os.path.basename(path)} does not match the model "
+                         f"(missing {len(missing)}, unexpected {len(unexpected)} tensors)")
+
+
+def _transformers_class(name: str):
+    import transformers
+    return getattr(transformers, name)
+
+
+def load_hf_model(repo_id: str, cache_dir: Optional[str] = None):
+    """
+    (processor, model) for a HuggingFace repo - from the bundle when it
+    has it (memory-mapped, offline), otherwise via from_pretrained.
+    """
+    model_name, processor_name, processor_kwargs = HF_MODELS[repo_id]
+    model_cls = _transformers_class(model_name)
+    processor_cls = _transformers_class(processor_name)
+    
+    local_dir = bundled_path(repo_id)
+    if local_dir is None:
+        processor = processor_cls.from_pretrained(repo_id, cache_dir=cache_dir, **processor_kwargs)
+        model = model_cls.from_pretrained(repo_id, cache_dir=cache_dir)
+        return processor, model
+    
+    processor = processor_cls.from_pretrained(local_dir, local_files_only=True, **processor_kwargs)
+    try:
+        model = _build_hf_model(model_cls, local_dir)
+    except Exception as e:
+        # Still offline, just not memory-mapped
+        print(f"Memory-mapped load of {repo_id} failed ({e}), reading it from the bundle instead")
+        model = model_cls.from_pretrained(local_dir, local_files_only=True)
+    return processor, model
+
+
+def _build_hf_model(model_cls, local_dir: str):
+    from transformers import AutoConfig
+    try:
+        from transformers.modeling_utils import no_init_weights
+    except ImportError:
+        no_init_weights = contextlib.nullcontext
+    
+    hf_config = AutoConfig.from_pretrained(local_dir, local_files_only=True)
+    build = getattr(model_cls, 'from_config', model_cls)
+    # Skip random init - every weight is replaced by the bundled one
+    with no_init_weights():
+        model = build(hf_config)
+    assign_bundled_weights(model, os.path.join(local_dir, 'model.safetensors'))
+    return model
+
+
+def load_bundled_midas():
+    """(model, transform) for MiDaS_small from the bundle, or None if not bundled"""
+    import torch
+    
+    weights = bundled_path(MIDAS_WEIGHTS)
+    if weights is None:
+        return None
+    
+    # The MiDaS hub code (and the EfficientNet backbone it pulls in) is bundled too
+    hub_dir = os.path.join(config.MODEL_BUNDLE_DIR, 'torch_hub')
+    torch.hub.set_dir(hub_dir)
+    repo = os.path.join(hub_dir, MIDAS_HUB_REPOS[0])
+    model = torch.hub.load(repo, 'MiDaS_small', source='local', pretrained=False, verbose=False)
+    assign_bundled_weights(model, weights)
+    transform = torch.hub.load(repo, 'transforms', source='local', verbose=False).small_transform
+    return model, transform
+
+
+# Bundle creation (python -m veritas bundle)
+
+def _save_weights(module, path: str, exclude_prefixes: Tuple[str, ...] = ()):
+    from safetensors.torch import save_file
+    state = {name: tensor.detach().cpu().contiguous() for name, tensor in module.state_dict().items()
+             if not name.startswith(exclude_prefixes)}
+    save_file(state, path)
+
+
+def _bundle_hf(repo_id: str, output_dir: str) -> dict:
+    processor, model = load_hf_model(repo_id)
+    relative = os.path.join('hf', repo_id.replace('/', '--'))
+    target = os.path.join(output_dir, relative)
+    os.makedirs(target, exist_ok=True)
+    processor.save_pretrained(target)
+    model.save_pretrained(target, safe_serialization=True)
+    return {'kind': 'huggingface', 'path': relative}
+
+
+def _bundle_facenet(output_dir: str) -> dict:
+    from facenet_pytorch import InceptionResnetV1
+    resnet = InceptionResnetV1(pretrained='vggface2').eval()
+    relative = f'{FACENET_WEIGHTS}.safetensors'
+    _save_weights(resnet, os.path.join(output_dir, relative), exclude_prefixes=FACENET_UNUSED_PREFIXES)
+    return {'kind': 'torch_module', 'path': relative}
+
+
+def _bundle_midas(output_dir: str) -> dict:
+    import torch
+    model = torch.hub.load("intel-isl/MiDaS", "MiDaS_small", verbose=False)
+    torch.hub.load("intel-isl/MiDaS", "transforms", verbose=False)
+    relative = f'{MIDAS_WEIGHTS}.safetensors'
+    _save_weights(model, os.path.join(output_dir, relative))
+    
+    # Hub code and backbone checkpoints, so the architecture builds offline
+    source = torch.hub.get_dir()
+    target = os.path.join(output_dir, 'torch_hub')
+    for repo in MIDAS_HUB_REPOS:
+        shutil.copytree(os.path.join(source, repo), os.path.join(target, repo), dirs_exist_ok=True)
+    checkpoints = os.path.join(source, 'checkpoints')
+    if os.path.isdir(checkpoints):
+        shutil.copytree(checkpoints, os.path.join(target, 'checkpoints'), dirs_exist_ok=True)
+    return {'kind': 'torch_hub', 'path': relative}
+
+
+BUNDLE_TARGETS = {
+    **{repo_id: (lambda output_dir, repo_id=repo_id: _bundle_hf(repo_id, output_dir)) for repo_id in HF_MODELS},
+    FACENET_WEIGHTS: _bundle_facenet,
+    MIDAS_WEIGHTS: _bundle_midas,
+}
+
+
+def create_bundle(output_dir: str, names: Optional[Iterable[str]] = None) -> dict:
+    """
+    Download the models (all by default) and write them to output_dir.
+    Entries already in an existing manifest there are kept.
+    """
+    global _manifest, _manifest_checked
+    # Always read from the network while bundling, never from a bundle
+    _manifest, _manifest_checked = None, True
+    
+    names = list(names) if names else list(BUNDLE_TARGETS)
+    unknown = [name for name in names if name not in BUNDLE_TARGETS]
+    if unknown:
+        raise ValueError(f"Unknown models: {', '.join(unknown)}. Available: {', '.join(BUNDLE_TARGETS)}")
+    
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_FILE)
+    manifest = {'version': BUNDLE_FORMAT_VERSION, 'models': {}}
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as f:
+            manifest['models'].update(json.load(f).get('models', {}))
+    
+    for name in names:
+        print(f"Bundling {name}...")
+        start = time.perf_counter()
+        entry = BUNDLE_TARGETS[name](output_dir)
+        entry['bundled_at'] = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        manifest['models'][name] = entry
+        print(f"  done in {time.perf_counter() - start:.1f}s -> {entry['path']}")
+        
+        # Written after every model so an interrupted run keeps what it finished
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2)
+    
+    return manifest
@@ -0,0 +1,194 @@
+"""
+Central model registry.
+
+Every model is registered once with a loader and loaded on first use.
+The registry records roughly how much memory each loaded model holds
+(torch parameter/buffer bytes, or the RSS growth during loading for
+non-torch models) and, when MODEL_MEMORY_BUDGET_MB is set, evicts the
+least recently used optional models until the total fits again. Required
+models are never evicted.
+
+Eviction only drops the registry's reference: an analysis already using
+the model keeps it alive, and its memory is returned when that finishes.
+The next get() loads it again.
+"""
+import gc
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+import config
+from utils.memory import current_rss_bytes, torch_module_bytes
+from utils.metrics import Counter, Gauge
+
+
+class ModelEntry:
+    def __init__(self, name: str, loader: Callable, required: bool = False):
+        self.name = name
+        self.loader = loader
+        self.required = required
+        self.model = None
+        self.size_bytes = 0
+        self.last_used = 0.0
+        self.loads = 0
+        self.evictions = 0
+        # Held while loading, so each model loads once even under concurrency
+        self.load_lock = threading.Lock()
+    
+    @property
+    def loaded(self) -> bool:
+        return self.model is not None
+
+
+class ModelRegistry:
+    def __init__(self, budget_bytes: int = 0):
+        # 0 = no limit
+        self.budget_bytes = budget_bytes
+        self._entries: Dict[str, ModelEntry] = {}
+        self._lock = threading.Lock()
+    
+    def register(self, name: str, loader: Callable, required: bool = False):
+        """Declare a model; loader() builds it and raises if it can't"""
+        with self._lock:
+            if name not in self._entries:
+                self._entries[name] = ModelEntry(name, loader, required)
+    
+    def get(self, name: str):
+        """The loaded model, loading it first if needed"""
+        entry = self._entries[name]
+        model = entry.model
+        if model is None:
+            with entry.load_lock:
+                model = entry.model
+                if model is None:
+                    model = self._load(entry)
+        
+        entry.last_used = time.monotonic()
+        return model
+    
+    def evict(self, name: str) -> bool:
+        """Drop a loaded model (required models included, if asked explicitly)"""
+        entry = self._entries.get(name)
+        if entry is None:
+            return False
+        with self._lock:
+            if entry.model is None:
+                return False
+            self._evict_locked(entry)
+        self._release_memory()
+        return True
+    
+    def resident_bytes(self) -> int:
+        with self._lock:
+            return sum(entry.size_bytes for entry in self._entries.values() if entry.loaded)
+    
+    def stats(self) -> dict:
+        with self._lock:
+            models = {
+                entry.name: {
+                    'loaded': entry.loaded,
+                    'required': entry.required,
+                    'resident_mb': round(entry.size_bytes / (1024 * 1024), 1) if entry.loaded else 0.0,
+                    'loads': entry.loads,
+                    'evictions': entry.evictions,
+                }
+                for entry in self._entries.values()
+            }
+        return {
+            'budget_mb': round(self.budget_bytes / (1024 * 1024), 1) if self.budget_bytes else None,
+            'resident_mb': round(self.resident_bytes() / (1024 * 1024), 1),
+            'models': models,
+        }
+    
+    def _load(self, entry: ModelEntry):
+        rss_before = current_rss_bytes()
+        model = entry.loader()
+        rss_growth = max(0, current_rss_bytes() - rss_before)
+        
+        # Tensor sizes are exact; RSS growth is the fallback (and is blurred
+        # by anything else loading at the same time)
+        size = torch_module_bytes(model) or rss_growth
+        
+        with self._lock:
+            entry.model = model
+            entry.size_bytes = size
+            entry.loads += 1
+            entry.last_used = time.monotonic()
+            evicted = self._enforce_budget_locked(keep=entry)
+        
+        if evicted:
+            self._release_memory()
+        print(f"Model {entry.name} resident: {size / (1024 * 1024):.0f} MB")
+        return model
+    
+    def _enforce_budget_locked(self, keep: ModelEntry) -> bool:
+        """Evict LRU optional models while over budget; True if any were"""
+        if not self.budget_bytes:
+            return False
+        
+        evicted = False
+        while True:
+            loaded = [entry for entry in self._entries.values() if entry.loaded]
+            total = sum(entry.size_bytes for entry in loaded)
+            if total <= self.budget_bytes:
+                break
+            
+            candidates = [entry for entry in loaded if not entry.required and entry is not keep]
+            if not candidates:
+                print(f"Model memory {total / (1024 * 1024):.0f} MB is over budget "
+                      f"({self.budget_bytes / (1024 * 1024):.0f} MB) but nothing can be evicted")
+                break
+            
+            victim = min(candidates, key=lambda entry: entry.last_used)
+            print(f"Evicting model {victim.name} ({victim.size_bytes / (1024 * 1024):.0f} MB) to stay within budget")
+            self._evict_locked(victim)
+            evicted = True
+        
+        return evicted
+    
+    def _evict_locked(self, entry: ModelEntry):
+        entry.model = None
+        entry.size_bytes = 0
+        entry.evictions += 1
+        MODEL_EVICTIONS.inc(model=entry.name)
+    
+    @staticmethod
+    def _release_memory():
+        gc.collect()
+        try:
+            import torch
+            if torch.cuda.is_available():
+                torch.cuda.empty_cache()
+        except ImportError:
+            pass
+
+
+_model_registry = ModelRegistry(int(config.MODEL_MEMORY_BUDGET_MB * 1024 * 1024))
+
+
+def get_model_registry() -> ModelRegistry:
+    return _model_registry
+
+
+def register_model(name: str, loader: Callable, required: bool = False):
+    _model_registry.register(name, loader, required)
+
+
+def get_model(name: str):
+    return _model_registry.get(name)
+
+
+MODEL_EVICTIONS = Counter(
+    'veritas_model_evictions_total',
+    'Models evicted to stay within MODEL_MEMORY_BUDGET_MB',
+    ['model']
+)
+
+
+def _collect_resident():
+    with _model_registry._lock:
+        return [({'model': entry.name}, entry.size_bytes) for entry in _model_registry._entries.values()]
+
+
+Gauge('veritas_model_resident_bytes', 'Approximate memory held by each loaded model', ['model'],
+      collect=_collect_resident)
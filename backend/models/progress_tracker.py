@@ -1,42 +1,134 @@
 """
 Progress tracking system for real-time updates to frontend
 IMPROVED: Better thread safety and error handling
+PER-JOB: Every analysis owns its own tracker, keyed by job ID
+
+Each message gets an increasing event ID and the last PROGRESS_BUFFER_SIZE
+are kept, so SSE clients can resume with Last-Event-ID after a reconnect.
+Callbacks are called as callback(event_id, message); message is None once
+the job has finished.
 """
+import contextvars
+import re
 import threading
-from typing import Optional, Callable, List
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Optional, Callable, List, Dict, Tuple
+
+import config
+
+JOB_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+
 
 class ProgressTracker:
-    def __init__(self):
+    def __init__(self, job_id: Optional[str] = None, parent: Optional['ProgressTracker'] = None):
+        self.job_id = job_id
+        self.parent = parent
         self.callbacks: List[Callable] = []
-        self.messages: List[str] = []
+        # (event_id, message), oldest dropped first
+        self.events: deque = deque(maxlen=config.PROGRESS_BUFFER_SIZE)
+        self.last_event_id = 0
+        self.created_at = time.time()
+        self.started = False
+        self.finished = False
+        self.finished_at: Optional[float] = None
         self._lock = threading.Lock()
     
-    def add_callback(self, callback: Callable[[str], None]):
+    def add_callback(self, callback: Callable[[Optional[int], Optional[str]], None]):
         """Add a callback function to be called on progress updates"""
         with self._lock:
             if callback not in self.callbacks:
                 self.callbacks.append(callback)
     
-    def remove_callback(self, callback: Callable[[str], None]):
+    def remove_callback(self, callback: Callable[[Optional[int], Optional[str]], None]):
         """Remove a specific callback"""
         with self._lock:
             if callback in self.callbacks:
                 self.callbacks.remove(callback)
     
+    def subscribe(self, callback: Callable[[Optional[int], Optional[str]], None],
+                  last_event_id: int = 0) -> List[Tuple[int, str]]:
+        """
+        Register a callback and return the buffered events after last_event_id.
+        Both happen under the lock so no message is missed or duplicated.
+        """
+        with self._lock:
+            if callback not in self.callbacks:
+                self.callbacks.append(callback)
+            return [event for event in self.events if event[0] > last_event_id]
+    
     def update(self, message: str):
         """Send progress update to all callbacks"""
         # Remove emojis and sanitize for SSE
         sanitized = self._sanitize_message(message)
         
         with self._lock:
-            self.messages.append(sanitized)
+            event_id = self._append_locked(sanitized)
             # Create a copy of callbacks to avoid modification during iteration
             callbacks_copy = self.callbacks.copy()
         
-        # Call callbacks outside of lock to avoid deadlocks
+        self._dispatch(event_id, sanitized, callbacks_copy)
+        
+        # Mirror job messages to the legacy process-wide stream (no event IDs there)
+        if self.parent is not None:
+            with self.parent._lock:
+                parent_callbacks = self.parent.callbacks.copy()
+            self.parent._dispatch(None, sanitized, parent_callbacks)
+    
+    def follow(self, leader: 'ProgressTracker'):
+        """
+        Mirror another job's messages into this tracker.
+        Used when identical uploads are coalesced onto one running analysis.
+        """
+        def relay(leader_event_id, message):
+            # The follower is finished by its own job, not the leader's
+            if message is None:
+                return
+            with self._lock:
+                event_id = self._append_locked(message)
+                callbacks_copy = self.callbacks.copy()
+            self._dispatch(event_id, message, callbacks_copy)
+        
+        with self._lock:
+            backlog = [
+                (self._append_locked(message), message)
+                for _, message in leader.subscribe(relay)
+            ]
+            callbacks_copy = self.callbacks.copy()
+        
+        for event_id, message in backlog:
+            self._dispatch(event_id, message, callbacks_copy)
+    
+    def claim(self) -> bool:
+        """Bind the tracker to a running analysis. Returns False if already bound."""
+        with self._lock:
+            if self.started:
+                return False
+            self.started = True
+            return True
+    
+    def finish(self):
+        """Mark the job as finished so progress streams can close"""
+        with self._lock:
+            self.finished = True
+            self.finished_at = time.time()
+            callbacks_copy = self.callbacks.copy()
+        
+        self._dispatch(None, None, callbacks_copy)
+    
+    def _append_locked(self, message: str) -> int:
+        self.last_event_id += 1
+        self.events.append((self.last_event_id, message))
+        return self.last_event_id
+    
+    def _dispatch(self, event_id: Optional[int], sanitized: Optional[str],
+                  callbacks_copy: List[Callable]):
+        """Call callbacks outside of lock to avoid deadlocks"""
         for callback in callbacks_copy:
             try:
-                callback(sanitized)
+                callback(event_id, sanitized)
             except Exception as e:
                 print(f"Callback error: {e}")
                 # Remove failed callback
@@ -46,7 +138,6 @@ class ProgressTracker:
     
     def _sanitize_message(self, message: str) -> str:
         """Remove emojis, clean up, and shorten messages for frontend display"""
-        import re
         # Remove emojis
         emoji_pattern = re.compile("["
             u"\U0001F600-\U0001F64F"  # emoticons
@@ -94,28 +185,109 @@ class ProgressTracker:
         """Clear all callbacks and messages"""
         with self._lock:
             self.callbacks = []
-            self.messages = []
+            self.events.clear()
     
     def get_messages(self) -> List[str]:
-        """Get a copy of all messages"""
+        """Get a copy of the buffered messages"""
         with self._lock:
-            return self.messages.copy()
+            return [message for _, message in self.events]
 
-# Global progress tracker
+# Global progress tracker (legacy stream that mirrors every job)
 _global_tracker = None
 _tracker_lock = threading.Lock()
 
-def get_progress_tracker() -> ProgressTracker:
+# Per-job trackers
+_job_trackers: Dict[str, ProgressTracker] = {}
+
+# Tracker bound to the analysis running in the current thread
+_current_tracker: contextvars.ContextVar[Optional[ProgressTracker]] = contextvars.ContextVar(
+    'current_progress_tracker', default=None
+)
+
+
+def _get_global_tracker() -> ProgressTracker:
     global _global_tracker
     with _tracker_lock:
         if _global_tracker is None:
             _global_tracker = ProgressTracker()
         return _global_tracker
 
+
+def get_progress_tracker() -> ProgressTracker:
+    """
+    Get the tracker of the job running in the current context.
+    Falls back to the global tracker outside of a job.
+    """
+    tracker = _current_tracker.get()
+    if tracker is not None:
+        return tracker
+    return _get_global_tracker()
+
+
+@contextmanager
+def use_progress_tracker(tracker: ProgressTracker):
+    """Bind a tracker to the current context for the duration of the block"""
+    token = _current_tracker.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _current_tracker.reset(token)
+
+
+def run_with_progress_tracker(tracker: ProgressTracker, func: Callable, *args, **kwargs):
+    """Run func with tracker bound - use as the target of executor.submit"""
+    with use_progress_tracker(tracker):
+        return func(*args, **kwargs)
+
+
+def new_job_id() -> str:
+    return uuid.uuid4().hex
+
+
+def is_valid_job_id(job_id: str) -> bool:
+    return bool(job_id) and JOB_ID_PATTERN.match(job_id) is not None
+
+
+def get_or_create_job_tracker(job_id: str) -> ProgressTracker:
+    """
+    Get the tracker for a job, creating it if needed.
+    Clients may subscribe to progress before the upload starts, so
+    the tracker can exist before the analysis is bound to it.
+    """
+    parent = _get_global_tracker()
+    with _tracker_lock:
+        _prune_job_trackers_locked()
+        tracker = _job_trackers.get(job_id)
+        if tracker is None:
+            tracker = ProgressTracker(job_id=job_id, parent=parent)
+            _job_trackers[job_id] = tracker
+        return tracker
+
+
+def get_job_tracker(job_id: str) -> Optional[ProgressTracker]:
+    with _tracker_lock:
+        return _job_trackers.get(job_id)
+
+
+def _prune_job_trackers_locked():
+    """Drop finished (or never used) trackers older than the retention window"""
+    now = time.time()
+    retention = config.PROGRESS_RETENTION_SECONDS
+    expired = []
+    for job_id, tracker in _job_trackers.items():
+        if tracker.finished:
+            if now - tracker.finished_at > retention:
+                expired.append(job_id)
+        elif not tracker.started and now - tracker.created_at > retention:
+            expired.append(job_id)
+    for job_id in expired:
+        del _job_trackers[job_id]
+
+
 def reset_progress_tracker():
     """Clear messages but keep callbacks alive for SSE"""
     global _global_tracker
     with _tracker_lock:
         if _global_tracker is not None:
             with _global_tracker._lock:
-                _global_tracker.messages = []  # Clear old messages but KEEP callbacks
+                _global_tracker.events.clear()  # Clear old messages but KEEP callbacks
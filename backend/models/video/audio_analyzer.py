@@ -8,6 +8,8 @@ import librosa
 import subprocess
 import os
 import tempfile
+from utils.cancellation import check_cancelled
+from utils.metrics import timed_layer
 
 # Read FFmpeg path from environment variable (same as video_utils.py)
 FFMPEG_PATH = os.getenv("FFMPEG_PATH", "ffmpeg")
@@ -17,6 +19,7 @@ FFPROBE_PATH = FFMPEG_PATH.replace("ffmpeg", "ffprobe") if "ffmpeg" in FFMPEG_PA
 MODELS_CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'models_cache')
 
 
+@timed_layer()
 def analyze_audio_stream(video_path):
     """
     Comprehensive audio analysis
@@ -64,26 +67,34 @@ def analyze_audio_stream(video_path):
                 'anomalies': ['Audio extraction failed - FFmpeg required']
             }
         
-        # 1. Voice Deepfake Detection
-        voice_result = detect_voice_deepfake(audio_path)
-        results['voice_deepfake_score'] = voice_result.get('score', 0.5)
-        
-        if voice_result.get('suspicious', False):
-            results['anomalies'].append('Suspicious voice patterns detected')
-        
-        # 2. Lip-Sync Analysis
-        lip_sync_result = analyze_lip_sync(video_path, audio_path)
-        results['lip_sync_score'] = lip_sync_result.get('score', 0.0)
-        
-        if lip_sync_result.get('out_of_sync', False):
-            results['anomalies'].append('Audio-video desynchronization detected')
-        
-        # 3. Audio Consistency
-        consistency_result = check_audio_consistency(audio_path)
-        results['audio_consistency'] = consistency_result.get('score', 0.0)
-        
-        if consistency_result.get('inconsistent', False):
-            results['anomalies'].append('Audio quality inconsistencies')
+        try:
+            # 1. Voice Deepfake Detection
+            check_cancelled()
+            voice_result = detect_voice_deepfake(audio_path)
+            results['voice_deepfake_score'] = voice_result.get('score', 0.5)
+            
+            if voice_result.get('suspicious', False):
+                results['anomalies'].append('Suspicious voice patterns detected')
+            
+            # 2. Lip-Sync Analysis
+            check_cancelled()
+            lip_sync_result = analyze_lip_sync(video_path, audio_path)
+            results['lip_sync_score'] = lip_sync_result.get('score', 0.0)
+            
+            if lip_sync_result.get('out_of_sync', False):
+                results['anomalies'].append('Audio-video desynchronization detected')
+            
+            # 3. Audio Consistency
+            check_cancelled()
+            consistency_result = check_audio_consistency(audio_path)
+            results['audio_consistency'] = consistency_result.get('score', 0.0)
+            
+            if consistency_result.get('inconsistent', False):
+                results['anomalies'].append('Audio quality inconsistencies')
+        finally:
+            # Cleanup (also when cancelled between stages)
+            if os.path.exists(audio_path):
+                os.remove(audio_path)
         
         # Calculate overall score
         results['score'] = (
@@ -92,10 +103,6 @@ def analyze_audio_stream(video_path):
             results['audio_consistency'] * 0.2
         )
         
-        # Cleanup
-        if os.path.exists(audio_path):
-            os.remove(audio_path)
-        
         return results
         
     except Exception as e:
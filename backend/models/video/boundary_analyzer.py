@@ -4,8 +4,10 @@ Focuses on scene boundaries and frame transitions where deepfakes often fail
 """
 import cv2
 import numpy as np
+from utils.metrics import timed_layer
 
 
+@timed_layer()
 def analyze_boundaries(frame_paths, scene_boundaries, timestamps):
     """
     Enhanced analysis of scene boundaries and transitions
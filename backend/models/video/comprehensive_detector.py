@@ -3,29 +3,15 @@ Comprehensive Video Deepfake Detector - HYBRID APPROACH
 Combines all Layer 1 and Layer 2 analyses
 """
 import os
+import time
 from PIL import Image
 import numpy as np
 from models.progress_tracker import get_progress_tracker
-
-
-def convert_numpy_types(obj):
-    """
-    Recursively convert numpy types to Python native types for JSON serialization
-    """
-    if isinstance(obj, dict):
-        return {key: convert_numpy_types(value) for key, value in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_numpy_types(item) for item in obj]
-    elif isinstance(obj, np.integer):
-        return int(obj)
-    elif isinstance(obj, np.floating):
-        return float(obj)
-    elif isinstance(obj, np.bool_):
-        return bool(obj)
-    elif isinstance(obj, np.ndarray):
-        return obj.tolist()
-    else:
-        return obj
+from utils.cancellation import check_cancelled
+from utils.deadline import MIN_DEADLINE_FRAMES, Deadline, spread_order
+from utils.metrics import layer_section, timed_layer
+from utils.tracing import traced
+from models.video.results import FrameScores, native
 
 # Layer 1
 from models.video.metadata_analyzer import analyze_video_metadata
@@ -51,15 +37,34 @@ from models.video.physics_checker import analyze_physics_consistency
 from models.video.boundary_analyzer import analyze_boundaries, get_boundary_weighted_scores
 from models.video.compression_analyzer import analyze_region_compression
 
+# Fusion weight of the layers a deadline may skip (lowest value first)
+SKIPPABLE_LAYER_WEIGHTS = {
+    'physics': 0.08,
+    'boundary': 0.08,
+    '3d_video': 0.10,
+}
+
 
-def analyze_video_comprehensive(video_path, output_dir="temp_frames"):
+# Whole-job span and memory high-water mark, around the per-layer ones
+@timed_layer()
+def analyze_video_comprehensive(video_path, output_dir="temp_frames", deadline=None):
     """
     Comprehensive hybrid video deepfake detection
     
+    With a deadline (utils.deadline.Deadline), frames are analyzed
+    coarse-to-fine until the budget left is needed by the remaining layers,
+    and the 3D model, physics and boundary layers are skipped when they no
+    longer fit. What was cut is listed in results['degraded_layers'].
+    
+    Checks the job's cancellation token between layers and frames
+    (utils.cancellation), raising AnalysisCancelled once it is cancelled.
+    
     Returns:
         dict: Complete analysis results with multi-modal scoring
     """
     tracker = get_progress_tracker()
+    if deadline is None:
+        deadline = Deadline()
     
     try:
         print(f"\n{'='*60}")
@@ -81,8 +86,10 @@ def analyze_video_comprehensive(video_path, output_dir="temp_frames"):
             'final_score': 0.0,
             'risk_level': 'Unknown',
             'confidence': 0.0,
-            'method_breakdown': {}
+            'method_breakdown': {},
+            'degraded_layers': {}
         }
+        degraded = results['degraded_layers']
         
         # =====================================================
         # LAYER 1: Pre-Analysis (Metadata & Quick Checks)
@@ -103,6 +110,7 @@ def analyze_video_comprehensive(video_path, output_dir="temp_frames"):
         # =====================================================
         
         # Smart frame extraction
+        check_cancelled()
         print(f"\nLAYER 2A: Smart Frame Extraction")
         tracker.update("LAYER 2A: Extracting key frames...")
         frame_data = smart_frame_extraction(video_path, output_dir, target_frames=50)
@@ -123,62 +131,94 @@ def analyze_video_comprehensive(video_path, output_dir="temp_frames"):
         # =====================================================
         # LAYER 2A: VISUAL STREAM - Frame-Based Analysis
         # =====================================================
+        check_cancelled()
         print(f"\nLAYER 2A: Frame-Based Analysis")
         tracker.update("Analyzing frames with AI models...")
         
-        frame_results = {
-            'ensemble_scores': [],
-            'face_scores': [],
-            'frequency_scores': [],
-            'avg_ensemble': 0.0,
-            'avg_face': 0.0,
-            'avg_frequency': 0.0
-        }
+        frame_results = FrameScores()
         
-        for idx, frame_path in enumerate(frame_paths):
-            try:
-                img = Image.open(frame_path).convert('RGB')
-                
-                # 1. Ensemble detector (silent mode to avoid progress spam)
-                ensemble_result = predict_ensemble(img, silent=True)
-                frame_results['ensemble_scores'].append(ensemble_result.get('score', 0.5))
-                
-                # 2. Face analysis (if face present)
-                face_result = analyze_face(img)
-                if face_result.get('face_detected', False):
-                    frame_results['face_scores'].append(face_result.get('score', 0.5))
-                
-                # 3. Frequency analysis
-                freq_result = analyze_frequency_domain(img)
-                frame_results['frequency_scores'].append(freq_result.get('score', 0.5))
+        # Layers that always run after the frames - their time is kept in reserve
+        essential_layers = ['analyze_temporal_consistency', 'analyze_physiological_signals',
+                            'analyze_region_compression']
+        if has_audio:
+            essential_layers.append('analyze_audio_stream')
+        
+        # Under a deadline, visit frames coarse-to-fine so stopping early still spans the video
+        frame_order = spread_order(len(frame_paths)) if deadline.enabled else range(len(frame_paths))
+        analyzed = []
+        # Frames the loop got to (analyzed or failed), and whether the deadline stopped it
+        visited = []
+        failed_frames = 0
+        out_of_time = False
+        
+        with layer_section("frame_analysis", frames=len(frame_paths)) as frame_span:
+            loop_start = time.perf_counter()
+            for count, idx in enumerate(frame_order):
+                if deadline.enabled and count >= MIN_DEADLINE_FRAMES:
+                    per_frame = (time.perf_counter() - loop_start) / count
+                    if deadline.remaining() < per_frame + deadline.estimate(essential_layers):
+                        out_of_time = True
+                        break
                 
-                if (idx + 1) % 10 == 0:
-                    print(f"  ✓ Processed {idx + 1}/{len(frame_paths)} frames")
-                    tracker.update(f"Processed {idx + 1}/{len(frame_paths)} frames")
+                check_cancelled()
+                visited.append(idx)
+                try:
+                    img = Image.open(frame_paths[idx]).convert('RGB')
                     
-            except Exception:
-                continue
-        
-        # Calculate averages
-        if frame_results['ensemble_scores']:
-            frame_results['avg_ensemble'] = np.mean(frame_results['ensemble_scores'])
-            frame_results['max_ensemble'] = np.max(frame_results['ensemble_scores'])
-        
-        if frame_results['face_scores']:
-            frame_results['avg_face'] = np.mean(frame_results['face_scores'])
-        
-        if frame_results['frequency_scores']:
-            frame_results['avg_frequency'] = np.mean(frame_results['frequency_scores'])
+                    # 1. Ensemble detector (silent mode to avoid progress spam)
+                    ensemble_result = predict_ensemble(img, silent=True)
+                    ensemble_score = ensemble_result.get('score', 0.5)
+                    
+                    # 2. Face analysis (if face present)
+                    face_result = analyze_face(img)
+                    face_score = None
+                    if face_result.get('face_detected', False):
+                        face_score = face_result.get('score', 0.5)
+                    
+                    # 3. Frequency analysis
+                    freq_result = analyze_frequency_domain(img)
+                    analyzed.append((idx, ensemble_score, face_score, freq_result.get('score', 0.5)))
+                    
+                    if (count + 1) % 10 == 0:
+                        print(f"  ✓ Processed {count + 1}/{len(frame_paths)} frames")
+                        tracker.update(f"Processed {count + 1}/{len(frame_paths)} frames")
+                        
+                except Exception:
+                    failed_frames += 1
+                    continue
+            
+            if frame_span is not None:
+                frame_span.attrs['analyzed'] = len(analyzed)
+                frame_span.attrs['failed'] = failed_frames
+        
+        if failed_frames:
+            print(f"  ⚠ {failed_frames} frames could not be analyzed")
+        
+        # Scores in frame order, as boundary weighting expects
+        analyzed.sort(key=lambda item: item[0])
+        for idx, ensemble_score, face_score, freq_score in analyzed:
+            frame_results.add(ensemble_score, face_score, freq_score)
+        
+        # Out of time: the later layers only look at the frames the loop got to.
+        # Frames that failed are not a deadline cut - the result stays complete
+        if out_of_time and analyzed:
+            degraded['frame_based'] = f"{len(analyzed)}/{len(frame_paths)} frames"
+            kept = sorted(visited)
+            frame_paths = [frame_paths[idx] for idx in kept]
+            timestamps = [timestamps[idx] for idx in kept]
+            print(f"  ⚠ Deadline: analyzed {len(analyzed)}/{len(frame_data['frames'])} frames")
+            tracker.update(f"Deadline: analyzed {len(analyzed)} of {len(frame_data['frames'])} frames")
         
         results['layer2a_frame_based'] = frame_results
         
-        print(f"  ✓ Avg: {frame_results['avg_ensemble']:.2f}, Max: {frame_results.get('max_ensemble', 0):.2f}")
-        tracker.update(f"Average score: {frame_results['avg_ensemble']:.2f}")
-        tracker.update(f"Highest frame score: {frame_results.get('max_ensemble', 0):.2f}")
+        print(f"  ✓ Avg: {frame_results.avg_ensemble:.2f}, Max: {frame_results.max_ensemble or 0:.2f}")
+        tracker.update(f"Average score: {frame_results.avg_ensemble:.2f}")
+        tracker.update(f"Highest frame score: {frame_results.max_ensemble or 0:.2f}")
         
         # =====================================================
         # LAYER 2A: VISUAL STREAM - Temporal Analysis
         # =====================================================
+        check_cancelled()
         print(f"\nLAYER 2A: Temporal Consistency")
         tracker.update("Temporal: Analyzing consistency...")
         temporal_result = analyze_temporal_consistency(frame_paths, timestamps)
@@ -191,17 +231,25 @@ def analyze_video_comprehensive(video_path, output_dir="temp_frames"):
         # =====================================================
         # LAYER 2A: VISUAL STREAM - 3D Video Model
         # =====================================================
+        check_cancelled()
         print(f"\nLAYER 2A: 3D Video Model")
-        tracker.update("3D Model: Running video analysis...")
-        video_3d_result = analyze_with_3d_model(video_path, clip_duration=2.0)
-        results['layer2a_3d_video'] = video_3d_result
-        
-        print(f"  ✓ Score: {video_3d_result.get('score', 0):.2f}")
-        tracker.update(f"3D Model: Score {video_3d_result.get('score', 0):.2f}")
+        remaining_layers = [layer for layer in essential_layers if layer != 'analyze_temporal_consistency']
+        if deadline.fits('analyze_with_3d_model', then=remaining_layers):
+            tracker.update("3D Model: Running video analysis...")
+            video_3d_result = analyze_with_3d_model(video_path, clip_duration=2.0)
+            results['layer2a_3d_video'] = video_3d_result
+            
+            print(f"  ✓ Score: {video_3d_result.get('score', 0):.2f}")
+            tracker.update(f"3D Model: Score {video_3d_result.get('score', 0):.2f}")
+        else:
+            degraded['3d_video'] = 'skipped'
+            print(f"  ⚠ Skipped (deadline)")
+            tracker.update("3D Model: Skipped to meet deadline")
         
         # =====================================================
         # LAYER 2B: AUDIO STREAM
         # =====================================================
+        check_cancelled()
         if has_audio:
             print(f"\nLAYER 2B: Audio Analysis")
             tracker.update("LAYER 2B: Analyzing audio...")
@@ -218,6 +266,7 @@ def analyze_video_comprehensive(video_path, output_dir="temp_frames"):
         # =====================================================
         # LAYER 2C: PHYSIOLOGICAL SIGNALS
         # =====================================================
+        check_cancelled()
         print(f"\nLAYER 2C: Physiological Analysis")
         tracker.update("LAYER 2C: Analyzing physiological signals...")
         
@@ -232,38 +281,50 @@ def analyze_video_comprehensive(video_path, output_dir="temp_frames"):
         # =====================================================
         # LAYER 2D: PHYSICS & CONSISTENCY
         # =====================================================
+        check_cancelled()
         print(f"\nLAYER 2D: Physics Consistency")
-        tracker.update("LAYER 2D: Checking physics...")
-        physics_result = analyze_physics_consistency(frame_paths)
-        results['layer2d_physics'] = physics_result
-        
-        print(f"  ✓ Score: {physics_result.get('score', 0):.2f}")
-        tracker.update(f"Physics: Score {physics_result.get('score', 0):.2f}")
+        if deadline.fits('analyze_physics_consistency', then=['analyze_region_compression']):
+            tracker.update("LAYER 2D: Checking physics...")
+            physics_result = analyze_physics_consistency(frame_paths)
+            results['layer2d_physics'] = physics_result
+            
+            print(f"  ✓ Score: {physics_result.get('score', 0):.2f}")
+            tracker.update(f"Physics: Score {physics_result.get('score', 0):.2f}")
+        else:
+            degraded['physics'] = 'skipped'
+            print(f"  ⚠ Skipped (deadline)")
+            tracker.update("LAYER 2D: Physics skipped to meet deadline")
         
         # =====================================================
         # LAYER 3: SPECIALIZED DETECTION METHODS
         # =====================================================
         
         # 3A: Enhanced Boundary Analysis
+        check_cancelled()
         print(f"\nLAYER 3: Boundary Analysis")
-        tracker.update("LAYER 3: Analyzing boundaries...")
-        scene_boundaries = frame_data.get('scene_boundaries', [])
-        boundary_result = analyze_boundaries(frame_paths, scene_boundaries, timestamps)
-        results['layer3_boundary'] = boundary_result
-        
-        print(f"  ✓ Suspicious transitions: {len(boundary_result.get('suspicious_transitions', []))}")
-        tracker.update(f"Suspicious transitions: {len(boundary_result.get('suspicious_transitions', []))}")
-        
-        # Apply boundary weighting to frame scores
-        if frame_results['ensemble_scores'] and scene_boundaries:
-            weighted_ensemble = get_boundary_weighted_scores(
-                frame_results['ensemble_scores'],
-                scene_boundaries,
-                weight_multiplier=2.0
-            )
-            frame_results['weighted_ensemble'] = weighted_ensemble
+        if deadline.fits('analyze_boundaries', then=['analyze_region_compression']):
+            tracker.update("LAYER 3: Analyzing boundaries...")
+            scene_boundaries = frame_data.get('scene_boundaries', [])
+            boundary_result = analyze_boundaries(frame_paths, scene_boundaries, timestamps)
+            results['layer3_boundary'] = boundary_result
+            
+            print(f"  ✓ Suspicious transitions: {len(boundary_result.get('suspicious_transitions', []))}")
+            tracker.update(f"Suspicious transitions: {len(boundary_result.get('suspicious_transitions', []))}")
+            
+            # Apply boundary weighting to frame scores
+            if frame_results.ensemble_scores and scene_boundaries:
+                frame_results.weighted_ensemble = get_boundary_weighted_scores(
+                    frame_results.ensemble_scores,
+                    scene_boundaries,
+                    weight_multiplier=2.0
+                )
+        else:
+            degraded['boundary'] = 'skipped'
+            print(f"  ⚠ Skipped (deadline)")
+            tracker.update("LAYER 3: Boundary analysis skipped to meet deadline")
         
         # 3B: Per-Region Compression Analysis
+        check_cancelled()
         print(f"\nLAYER 3: Compression Analysis")
         tracker.update("LAYER 3: Analyzing compression...")
         compression_result = analyze_region_compression(frame_paths)
@@ -275,10 +336,13 @@ def analyze_video_comprehensive(video_path, output_dir="temp_frames"):
         # =====================================================
         # INTELLIGENT SCORE FUSION
         # =====================================================
+        check_cancelled()
         print(f"\nFINAL FUSION")
         tracker.update("Combining all analysis results...")
         
-        final_score, confidence, breakdown = intelligent_fusion(results)
+        final_score, confidence, breakdown = intelligent_fusion(results, skipped_layers=[
+            layer for layer, reason in degraded.items() if reason == 'skipped'
+        ])
         
         results['final_score'] = final_score
         results['confidence'] = confidence
@@ -290,9 +354,6 @@ def analyze_video_comprehensive(video_path, output_dir="temp_frames"):
         tracker.update("Analysis complete!")
         tracker.update(f"Final Score: {final_score:.2f}")
         
-        # Convert all numpy types to Python native types for JSON serialization
-        results = convert_numpy_types(results)
-        
         return results
         
     except Exception as e:
@@ -307,10 +368,15 @@ def analyze_video_comprehensive(video_path, output_dir="temp_frames"):
         }
 
 
-def intelligent_fusion(results):
+@traced()
+def intelligent_fusion(results, skipped_layers=()):
     """
     Intelligent multi-modal score fusion with dynamic weighting
     AGGRESSIVE MODE: Catches obvious fakes
+    
+    Weights are normalized over the layers that produced a result; layers
+    skipped for a deadline (skipped_layers) also lower the confidence in
+    proportion to the weight they would have carried.
     """
     scores = []
     weights = []
@@ -326,21 +392,21 @@ def intelligent_fusion(results):
     physio = results.get('layer2c_physiological')
     
     # RULE 1: If ANY frame is >95% fake → AUTO HIGH RISK
-    if frame_based and frame_based.get('max_ensemble', 0) > 0.95:
-        return 0.95, 0.99, {'override': 'single_frame_very_fake', 'max_frame': frame_based['max_ensemble']}
+    max_frame = frame_based.max_ensemble if frame_based else None
+    if max_frame is not None and max_frame > 0.95:
+        return 0.95, 0.99, {'override': 'single_frame_very_fake', 'max_frame': max_frame}
     
     # RULE 2: No heartbeat + high identity shifts → AUTO HIGH RISK
     if physio and not physio.get('heartbeat_detected', True):
         identity_shifts = temporal.get('identity_shifts', 0) if temporal else 0
         if identity_shifts > 20:
-            return 0.90, 0.98, {'override': 'no_heartbeat_identity_shifts', 'shifts': identity_shifts}
+            return 0.90, 0.98, {'override': 'no_heartbeat_identity_shifts', 'shifts': native(identity_shifts)}
     
     # RULE 3: Max frame >0.90 + temporal issues → HIGH RISK
-    if frame_based and temporal:
-        max_frame = frame_based.get('max_ensemble', 0)
+    if max_frame is not None and temporal:
         if max_frame > 0.90 and temporal.get('score', 0) > 0.5:
             combined_score = (max_frame * 0.6) + (temporal['score'] * 0.4)
-            return combined_score, 0.97, {'override': 'frame_temporal_combo', 'max_frame': max_frame}
+            return float(combined_score), 0.97, {'override': 'frame_temporal_combo', 'max_frame': max_frame}
     
     # =====================================================
     # NORMAL FUSION (if no overrides triggered)
@@ -357,11 +423,11 @@ def intelligent_fusion(results):
     # Layer 2A: Frame-Based - USE MAX FRAME HEAVILY
     if frame_based:
         avg_score = (
-            frame_based.get('avg_ensemble', 0.5) * 0.5 +
-            frame_based.get('avg_face', 0.5) * 0.25 +
-            frame_based.get('avg_frequency', 0.5) * 0.25
+            frame_based.avg_ensemble * 0.5 +
+            frame_based.avg_face * 0.25 +
+            frame_based.avg_frequency * 0.25
         )
-        max_score = frame_based.get('max_ensemble', 0.5)
+        max_score = max_frame if max_frame is not None else 0.5
         
         # AGGRESSIVE: Weight max frame heavily (60%)
         frame_score = (avg_score * 0.4) + (max_score * 0.6)
@@ -429,8 +495,8 @@ def intelligent_fusion(results):
     boundary = results.get('layer3_boundary')
     if boundary and 'score' in boundary:
         # Use boundary-weighted ensemble if available
-        if frame_based and frame_based.get('weighted_ensemble'):
-            weighted_score = frame_based['weighted_ensemble']
+        if frame_based and frame_based.weighted_ensemble:
+            weighted_score = frame_based.weighted_ensemble
             # Boost frame_based score if boundaries are suspicious
             if 'frame_based' in breakdown and boundary['score'] > 0.4:
                 idx = list(breakdown.keys()).index('frame_based')
@@ -479,13 +545,17 @@ def intelligent_fusion(results):
         elif score_variance < 0.1:  # Moderate agreement
             avg_confidence = min(avg_confidence * 1.15, 1.0)
     
+    # Missing layers: less evidence, less confidence
+    skipped_weight = sum(SKIPPABLE_LAYER_WEIGHTS.get(layer, 0.0) for layer in skipped_layers)
+    if skipped_weight > 0:
+        avg_confidence *= total_weight / (total_weight + skipped_weight)
+    
     # AGGRESSIVE BOOST: If multiple methods show high scores
     high_score_count = sum(1 for s in scores if s > 0.6)
     if high_score_count >= 3:
         final_score = min(final_score * 1.2, 1.0)
     
-    # Convert breakdown to ensure all values are Python native types
-    breakdown = convert_numpy_types(breakdown)
+    breakdown = {method: float(score) for method, score in breakdown.items()}
     
     return float(final_score), float(avg_confidence), breakdown
 
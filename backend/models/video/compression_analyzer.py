@@ -5,8 +5,10 @@ Detects face-swap artifacts by comparing compression levels between regions
 import cv2
 import numpy as np
 from scipy import fftpack
+from utils.metrics import timed_layer
 
 
+@timed_layer()
 def analyze_region_compression(frame_paths):
     """
     Compare compression artifacts between face and background regions
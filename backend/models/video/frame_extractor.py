@@ -10,8 +10,11 @@ import cv2
 import numpy as np
 import os
 from scenedetect import detect, ContentDetector, AdaptiveDetector
+from utils.cancellation import check_cancelled
+from utils.metrics import timed_layer
 
 
+@timed_layer()
 def smart_frame_extraction(video_path, output_dir="temp_frames", target_frames=50):
     """
     Extract frames intelligently from video
@@ -187,6 +190,7 @@ def detect_face_frames_opencv(frame_paths):
         face_frames = []
         
         for frame_path in frame_paths:
+            check_cancelled()
             image = cv2.imread(frame_path)
             if image is None:
                 continue
@@ -7,8 +7,10 @@ import json
 import subprocess
 import os
 from datetime import datetime
+from utils.metrics import timed_layer
 
 
+@timed_layer()
 def analyze_video_metadata(video_path):
     """
     Comprehensive video metadata analysis
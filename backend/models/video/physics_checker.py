@@ -7,37 +7,45 @@ import numpy as np
 import torch
 from PIL import Image
 import os
+from models.model_bundle import load_bundled_midas
+from models.model_registry import get_model, register_model
+from utils.cancellation import check_cancelled
+from utils.metrics import timed_layer, time_model_load
+from utils.tracing import span
 
 
-_midas_model = None
-_midas_transform = None
-_midas_device = None
-
-
-def get_midas_model():
-    """Get cached MiDaS model (load once, reuse for all frames)"""
-    global _midas_model, _midas_transform, _midas_device
+def _load_midas_model():
+    print("Loading MiDaS model (one-time initialization)...")
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
     
-    if _midas_model is None:
-        try:
-            print("Loading MiDaS model (one-time initialization)...")
-            _midas_device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-            
-            _midas_model = torch.hub.load("intel-isl/MiDaS", "MiDaS_small", verbose=False)
-            _midas_model.to(_midas_device)
-            _midas_model.eval()
-            
+    with time_model_load('midas'):
+        bundled = load_bundled_midas()
+        if bundled is not None:
+            model, transform = bundled
+        else:
+            model = torch.hub.load("intel-isl/MiDaS", "MiDaS_small", verbose=False)
             midas_transforms = torch.hub.load("intel-isl/MiDaS", "transforms", verbose=False)
-            _midas_transform = midas_transforms.small_transform
-            
-            print(f"MiDaS model loaded on {_midas_device}")
-        except Exception as e:
-            print(f"Failed to load MiDaS model: {e}")
-            return None, None, None
+            transform = midas_transforms.small_transform
+        model.to(device)
+        model.eval()
     
-    return _midas_model, _midas_transform, _midas_device
+    print(f"MiDaS model loaded on {device}")
+    return model, transform, device
+
+
+register_model('midas', _load_midas_model)
+
+
+def get_midas_model():
+    """Get cached MiDaS model (loaded once via the model registry)"""
+    try:
+        return get_model('midas')
+    except Exception as e:
+        print(f"Failed to load MiDaS model: {e}")
+        return None, None, None
 
 
+@timed_layer()
 def analyze_physics_consistency(frame_paths):
     """
     Check physical consistency and plausibility
@@ -66,6 +74,7 @@ def analyze_physics_consistency(frame_paths):
             results['anomalies'].append('Inconsistent lighting detected')
             results['score'] += 0.4
         
+        check_cancelled()
         depth_result = analyze_depth_consistency(frame_paths)
         results['depth_plausible'] = depth_result['plausible']
         
@@ -73,6 +82,7 @@ def analyze_physics_consistency(frame_paths):
             results['anomalies'].append('Implausible depth map')
             results['score'] += 0.3
         
+        check_cancelled()
         shadow_result = analyze_shadows(frame_paths)
         
         if shadow_result.get('inconsistent', False):
@@ -100,6 +110,7 @@ def analyze_lighting_consistency(frame_paths):
         lighting_values = []
         
         for frame_path in frame_paths:
+            check_cancelled()
             if not os.path.exists(frame_path):
                 continue
             
@@ -146,6 +157,7 @@ def analyze_depth_consistency(frame_paths):
         depth_maps = []
         
         for frame_path in frame_paths[:10]:
+            check_cancelled()
             if not os.path.exists(frame_path):
                 continue
             
@@ -209,7 +221,7 @@ def estimate_depth_midas(frame_path):
         
         input_batch = transform(img_rgb).to(device)
         
-        with torch.no_grad():
+        with span("forward:midas"), torch.no_grad():
             prediction = midas(input_batch)
             prediction = torch.nn.functional.interpolate(
                 prediction.unsqueeze(1),
@@ -238,6 +250,7 @@ def analyze_shadows(frame_paths):
         shadow_directions = []
         
         for frame_path in frame_paths:
+            check_cancelled()
             if not os.path.exists(frame_path):
                 continue
             
@@ -10,8 +10,13 @@ import cv2
 import numpy as np
 from scipy import signal, fftpack
 from PIL import Image
+from models.face_analyzer import get_video_face_landmarker
+from utils.cancellation import check_cancelled
+from utils.metrics import timed_layer
+from utils.tracing import span
 
 
+@timed_layer()
 def analyze_physiological_signals(frame_paths, fps=30):
     """
     Analyze physiological signals from video frames
@@ -50,6 +55,7 @@ def analyze_physiological_signals(frame_paths, fps=30):
             results['score'] += 0.25
         
         # 2. Blink Pattern Analysis
+        check_cancelled()
         blink_result = analyze_blink_pattern(frame_paths, fps)
         results['blink_pattern_natural'] = blink_result['natural']
         results['blink_count'] = blink_result.get('count', 0)
@@ -59,6 +65,7 @@ def analyze_physiological_signals(frame_paths, fps=30):
             results['score'] += 0.3
         
         # 3. Breathing Detection (if torso visible)
+        check_cancelled()
         breathing_result = detect_breathing(frame_paths)
         results['breathing_detected'] = breathing_result['detected']
         
@@ -193,6 +200,7 @@ def extract_face_regions_opencv(frame_paths):
         face_regions = []
         
         for frame_path in frame_paths:
+            check_cancelled()
             image = cv2.imread(frame_path)
             if image is None:
                 face_regions.append(None)
@@ -223,41 +231,16 @@ def analyze_blink_pattern(frame_paths, fps):
     try:
         # Try MediaPipe Tasks API with proper initialization
         try:
-            from mediapipe.tasks import python
-            from mediapipe.tasks.python import vision
             import mediapipe as mp
-            import os
             
-            # Path to face landmarker model
-            model_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'models_cache')
-            face_landmarker_model = os.path.join(model_dir, 'face_landmarker.task')
-            
-            if not os.path.exists(face_landmarker_model):
-                raise Exception("Face landmarker model not found")
-            
-            # Proper initialization matching face_analyzer.py
-            base_options = python.BaseOptions(
-                model_asset_path=face_landmarker_model,
-                delegate=python.BaseOptions.Delegate.CPU
-            )
-            
-            options = vision.FaceLandmarkerOptions(
-                base_options=base_options,
-                running_mode=vision.RunningMode.IMAGE,
-                output_face_blendshapes=False,
-                output_facial_transformation_matrixes=False,
-                num_faces=1,
-                min_face_detection_confidence=0.5,
-                min_face_presence_confidence=0.5,
-                min_tracking_confidence=0.5
-            )
-            
-            landmarker = vision.FaceLandmarker.create_from_options(options)
+            # Shared landmarker from the model registry (raises if unavailable)
+            landmarker = get_video_face_landmarker()
             
             # Track Eye Aspect Ratio (EAR) across frames
             ear_values = []
             
             for frame_path in frame_paths:
+                check_cancelled()
                 image = cv2.imread(frame_path)
                 if image is None:
                     ear_values.append(None)
@@ -267,7 +250,8 @@ def analyze_blink_pattern(frame_paths, fps):
                 mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_image)
                 
                 try:
-                    detection_result = landmarker.detect(mp_image)
+                    with span("forward:face_landmarker"):
+                        detection_result = landmarker.detect(mp_image)
                     
                     if detection_result.face_landmarks:
                         landmarks = detection_result.face_landmarks[0]
@@ -278,8 +262,6 @@ def analyze_blink_pattern(frame_paths, fps):
                 except Exception:
                     ear_values.append(None)
             
-            landmarker.close()
-            
             if len([e for e in ear_values if e is not None]) < 10:
                 return {'natural': True, 'reason': 'Insufficient data'}
             
@@ -430,6 +412,7 @@ def detect_breathing(frame_paths):
         motion_values = []
         
         for frame_path in frame_paths:
+            check_cancelled()
             frame = cv2.imread(frame_path)
             if frame is None:
                 continue
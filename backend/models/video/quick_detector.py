@@ -4,8 +4,10 @@ Runs only Layer 1, 2A, and 2B for faster analysis
 """
 import os
 from PIL import Image
-import numpy as np
 from models.progress_tracker import get_progress_tracker
+from utils.cancellation import check_cancelled
+from utils.tracing import span, traced
+from models.video.results import FrameScores
 
 # Layer 1
 from models.video.metadata_analyzer import analyze_video_metadata
@@ -22,26 +24,6 @@ from models.video.video_3d_model import analyze_with_3d_model
 from models.video.audio_analyzer import analyze_audio_stream
 
 
-def convert_numpy_types(obj):
-    """
-    Recursively convert numpy types to Python native types for JSON serialization
-    """
-    if isinstance(obj, dict):
-        return {key: convert_numpy_types(value) for key, value in obj.items()}
-    elif isinstance(obj, list):
-        return [convert_numpy_types(item) for item in obj]
-    elif isinstance(obj, np.integer):
-        return int(obj)
-    elif isinstance(obj, np.floating):
-        return float(obj)
-    elif isinstance(obj, np.bool_):
-        return bool(obj)
-    elif isinstance(obj, np.ndarray):
-        return obj.tolist()
-    else:
-        return obj
-
-
 def analyze_video_quick(video_path, output_dir="temp_frames"):
     """
     Quick video deepfake detection - Layers 1, 2A, 2B only
@@ -88,6 +70,7 @@ def analyze_video_quick(video_path, output_dir="temp_frames"):
         # =====================================================
         # LAYER 2A: Smart Frame Extraction
         # =====================================================
+        check_cancelled()
         print(f"\nLAYER 2A: Smart Frame Extraction")
         tracker.update("LAYER 2A: Extracting key frames...")
         frame_data = smart_frame_extraction(video_path, output_dir, target_frames=50)
@@ -111,59 +94,45 @@ def analyze_video_quick(video_path, output_dir="temp_frames"):
         print(f"\nLAYER 2A: Frame-Based Analysis")
         tracker.update("Analyzing frames with AI models...")
         
-        frame_results = {
-            'ensemble_scores': [],
-            'face_scores': [],
-            'frequency_scores': [],
-            'avg_ensemble': 0.0,
-            'avg_face': 0.0,
-            'avg_frequency': 0.0
-        }
+        frame_results = FrameScores()
         
-        for idx, frame_path in enumerate(frame_paths):
-            try:
-                img = Image.open(frame_path).convert('RGB')
-                
-                # 1. Ensemble detector (silent mode to avoid progress spam)
-                ensemble_result = predict_ensemble(img, silent=True)
-                frame_results['ensemble_scores'].append(ensemble_result.get('score', 0.5))
-                
-                # 2. Face analysis (if face present)
-                face_result = analyze_face(img)
-                if face_result.get('face_detected', False):
-                    frame_results['face_scores'].append(face_result.get('score', 0.5))
-                
-                # 3. Frequency analysis
-                freq_result = analyze_frequency_domain(img)
-                frame_results['frequency_scores'].append(freq_result.get('score', 0.5))
-                
-                if (idx + 1) % 10 == 0:
-                    print(f"  ✓ Processed {idx + 1}/{len(frame_paths)} frames")
-                    tracker.update(f"Processed {idx + 1}/{len(frame_paths)} frames")
+        with span("frame_analysis", frames=len(frame_paths)):
+            for idx, frame_path in enumerate(frame_paths):
+                check_cancelled()
+                try:
+                    img = Image.open(frame_path).convert('RGB')
                     
-            except Exception:
-                continue
-        
-        # Calculate averages
-        if frame_results['ensemble_scores']:
-            frame_results['avg_ensemble'] = np.mean(frame_results['ensemble_scores'])
-            frame_results['max_ensemble'] = np.max(frame_results['ensemble_scores'])
-        
-        if frame_results['face_scores']:
-            frame_results['avg_face'] = np.mean(frame_results['face_scores'])
-        
-        if frame_results['frequency_scores']:
-            frame_results['avg_frequency'] = np.mean(frame_results['frequency_scores'])
+                    # 1. Ensemble detector (silent mode to avoid progress spam)
+                    ensemble_result = predict_ensemble(img, silent=True)
+                    
+                    # 2. Face analysis (if face present)
+                    face_result = analyze_face(img)
+                    face_score = None
+                    if face_result.get('face_detected', False):
+                        face_score = face_result.get('score', 0.5)
+                    
+                    # 3. Frequency analysis
+                    freq_result = analyze_frequency_domain(img)
+                    frame_results.add(ensemble_result.get('score', 0.5), face_score,
+                                      freq_result.get('score', 0.5))
+                    
+                    if (idx + 1) % 10 == 0:
+                        print(f"  ✓ Processed {idx + 1}/{len(frame_paths)} frames")
+                        tracker.update(f"Processed {idx + 1}/{len(frame_paths)} frames")
+                        
+                except Exception:
+                    continue
         
         results['layer2a_frame_based'] = frame_results
         
-        print(f"  ✓ Avg: {frame_results['avg_ensemble']:.2f}, Max: {frame_results.get('max_ensemble', 0):.2f}")
-        tracker.update(f"Average score: {frame_results['avg_ensemble']:.2f}")
-        tracker.update(f"Highest frame score: {frame_results.get('max_ensemble', 0):.2f}")
+        print(f"  ✓ Avg: {frame_results.avg_ensemble:.2f}, Max: {frame_results.max_ensemble or 0:.2f}")
+        tracker.update(f"Average score: {frame_results.avg_ensemble:.2f}")
+        tracker.update(f"Highest frame score: {frame_results.max_ensemble or 0:.2f}")
         
         # =====================================================
         # LAYER 2A: VISUAL STREAM - Temporal Analysis
         # =====================================================
+        check_cancelled()
         print(f"\nLAYER 2A: Temporal Consistency")
         tracker.update("Temporal: Analyzing consistency...")
         temporal_result = analyze_temporal_consistency(frame_paths, timestamps)
@@ -176,6 +145,7 @@ def analyze_video_quick(video_path, output_dir="temp_frames"):
         # =====================================================
         # LAYER 2A: VISUAL STREAM - 3D Video Model
         # =====================================================
+        check_cancelled()
         print(f"\nLAYER 2A: 3D Video Model")
         tracker.update("3D Model: Running video analysis...")
         video_3d_result = analyze_with_3d_model(video_path, clip_duration=2.0)
@@ -187,6 +157,7 @@ def analyze_video_quick(video_path, output_dir="temp_frames"):
         # =====================================================
         # LAYER 2B: AUDIO STREAM
         # =====================================================
+        check_cancelled()
         if has_audio:
             print(f"\nLAYER 2B: Audio Analysis")
             tracker.update("LAYER 2B: Analyzing audio...")
@@ -203,6 +174,7 @@ def analyze_video_quick(video_path, output_dir="temp_frames"):
         # =====================================================
         # QUICK SCORE FUSION (Only Layers 1, 2A, 2B)
         # =====================================================
+        check_cancelled()
         print(f"\nFINAL FUSION (Quick Mode)")
         tracker.update("Combining quick analysis results...")
         
@@ -219,9 +191,6 @@ def analyze_video_quick(video_path, output_dir="temp_frames"):
         tracker.update("Quick analysis complete!")
         tracker.update(f"Final Score: {final_score:.2f}")
         
-        # Convert all numpy types to Python native types for JSON serialization
-        results = convert_numpy_types(results)
-        
         return results
         
     except Exception as e:
@@ -236,6 +205,7 @@ def analyze_video_quick(video_path, output_dir="temp_frames"):
         }
 
 
+@traced()
 def quick_fusion(results):
     """
     Quick score fusion using only Layers 1, 2A, and 2B
@@ -257,11 +227,11 @@ def quick_fusion(results):
     frame_based = results.get('layer2a_frame_based')
     if frame_based:
         avg_score = (
-            frame_based.get('avg_ensemble', 0.5) * 0.5 +
-            frame_based.get('avg_face', 0.5) * 0.25 +
-            frame_based.get('avg_frequency', 0.5) * 0.25
+            frame_based.avg_ensemble * 0.5 +
+            frame_based.avg_face * 0.25 +
+            frame_based.avg_frequency * 0.25
         )
-        max_score = frame_based.get('max_ensemble', 0.5)
+        max_score = frame_based.max_ensemble if frame_based.max_ensemble is not None else 0.5
         
         # Weight max frame more heavily
         frame_score = (avg_score * 0.4) + (max_score * 0.6)
@@ -318,8 +288,7 @@ def quick_fusion(results):
     # Reduce confidence since we're not using all layers
     avg_confidence = avg_confidence * 0.8  # 20% penalty for quick mode
     
-    # Convert breakdown
-    breakdown = convert_numpy_types(breakdown)
+    breakdown = {method: float(score) for method, score in breakdown.items()}
     
     return float(final_score), float(avg_confidence), breakdown
 
@@ -0,0 +1,259 @@
+"""
+Typed video analysis results.
+
+The layer analyzers return free-form dicts that stay inside the detectors.
+What leaves them is built here, once: slotted objects holding native
+floats and ints (per-frame scores in compact arrays), which
+utils.fast_json encodes directly - no numpy conversion pass over the
+whole result, no copying into response dicts.
+
+Summary fields are the response's JSON keys, in order. Fields set to
+OMITTED are left out (a layer that did not run, a field the quick analysis
+doesn't have), so quick and comprehensive analyses share the classes; a
+None from a layer is written as null, as before.
+"""
+from array import array
+from typing import Optional
+
+
+class _Omitted:
+    __slots__ = ()
+    
+    def __repr__(self):
+        return 'OMITTED'
+
+
+# Value of a field this result does not have - left out of the JSON
+OMITTED = _Omitted()
+
+
+def native(value):
+    """numpy scalar -> the Python number it holds (anything else unchanged)"""
+    item = getattr(value, 'item', None)
+    return item() if callable(item) else value
+
+
+def rounded(value, digits: int = 3) -> float:
+    return round(float(value), digits)
+
+
+class Result:
+    """Base for result objects: __slots__ are the JSON fields"""
+    __slots__ = ()
+    # Slot name -> JSON key, where the key is not an identifier
+    json_names: dict = {}
+    
+    def to_json(self) -> dict:
+        data = {}
+        for name in self.__slots__:
+            value = getattr(self, name)
+            if value is not OMITTED:
+                data[self.json_names.get(name, name)] = value
+        return data
+    
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_json() == other.to_json()
+    
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_json()})"
+
+
+class FrameScores:
+    """Per-frame scores of the frame-based layer, as compact float arrays"""
+    __slots__ = ('ensemble_scores', 'face_scores', 'frequency_scores', 'weighted_ensemble')
+    
+    def __init__(self):
+        self.ensemble_scores = array('d')
+        self.face_scores = array('d')  # only frames with a face
+        self.frequency_scores = array('d')
+        # Boundary-weighted ensemble average (comprehensive analysis only)
+        self.weighted_ensemble: Optional[float] = None
+    
+    def add(self, ensemble_score, face_score, frequency_score):
+        self.ensemble_scores.append(ensemble_score)
+        if face_score is not None:
+            self.face_scores.append(face_score)
+        self.frequency_scores.append(frequency_score)
+    
+    @staticmethod
+    def _mean(values: array) -> float:
+        return sum(values) / len(values) if values else 0.0
+    
+    @property
+    def avg_ensemble(self) -> float:
+        return self._mean(self.ensemble_scores)
+    
+    @property
+    def max_ensemble(self) -> Optional[float]:
+        """None when no frame was analyzed"""
+        return max(self.ensemble_scores) if self.ensemble_scores else None
+    
+    @property
+    def avg_face(self) -> float:
+        return self._mean(self.face_scores)
+    
+    @property
+    def avg_frequency(self) -> float:
+        return self._mean(self.frequency_scores)
+
+
+# Layer summaries - built from a layer's result dict; detailed=False is the quick analysis
+
+class MetadataSummary(Result):
+    __slots__ = ('score', 'has_audio', 'suspicious_indicators')
+    
+    def __init__(self, layer: dict, detailed: bool):
+        self.score = rounded(layer.get('score', 0))
+        self.has_audio = native(layer.get('has_audio', False))
+        self.suspicious_indicators = layer.get('suspicious_indicators', []) if detailed else OMITTED
+
+
+class FrameSummary(Result):
+    __slots__ = ('ensemble_avg', 'ensemble_max', 'face_avg', 'frequency_avg')
+    
+    def __init__(self, frames: FrameScores, detailed: bool):
+        self.ensemble_avg = rounded(frames.avg_ensemble)
+        self.ensemble_max = rounded(frames.max_ensemble or 0)
+        self.face_avg = rounded(frames.avg_face)
+        self.frequency_avg = rounded(frames.avg_frequency) if detailed else OMITTED
+
+
+class TemporalSummary(Result):
+    __slots__ = ('score', 'identity_shifts', 'motion_smoothness', 'anomalies')
+    
+    def __init__(self, layer: dict, detailed: bool):
+        self.score = rounded(layer.get('score', 0))
+        self.identity_shifts = native(layer.get('identity_shifts', 0))
+        self.motion_smoothness = rounded(layer.get('motion_smoothness', 0)) if detailed else OMITTED
+        self.anomalies = layer.get('inconsistencies', []) if detailed else OMITTED
+
+
+class Model3DSummary(Result):
+    __slots__ = ('score', 'method')
+    
+    def __init__(self, layer: dict, detailed: bool):
+        self.score = rounded(layer.get('score', 0))
+        self.method = layer.get('method', 'unknown') if detailed else OMITTED
+
+
+class AudioSummary(Result):
+    __slots__ = ('present', 'score', 'voice_deepfake', 'lip_sync', 'anomalies')
+    
+    def __init__(self, layer: dict, detailed: bool):
+        self.present = self.score = self.voice_deepfake = self.lip_sync = self.anomalies = OMITTED
+        if not layer.get('has_audio'):
+            self.present = False
+            return
+        self.score = rounded(layer.get('score', 0))
+        if detailed:
+            self.voice_deepfake = rounded(layer.get('voice_deepfake_score', 0))
+            self.lip_sync = rounded(layer.get('lip_sync_score', 0))
+            self.anomalies = layer.get('anomalies', [])
+
+
+class PhysiologicalSummary(Result):
+    __slots__ = ('score', 'heartbeat_detected', 'heartbeat_bpm', 'natural_blink_pattern',
+                 'blink_count', 'anomalies')
+    
+    def __init__(self, layer: dict):
+        self.score = rounded(layer.get('score', 0))
+        self.heartbeat_detected = native(layer.get('heartbeat_detected', False))
+        self.heartbeat_bpm = native(layer.get('heartbeat_bpm', 0))
+        self.natural_blink_pattern = native(layer.get('blink_pattern_natural', False))
+        self.blink_count = native(layer.get('blink_count', 0))
+        self.anomalies = layer.get('anomalies', [])
+
+
+class PhysicsSummary(Result):
+    __slots__ = ('score', 'lighting_consistent', 'depth_plausible', 'anomalies')
+    
+    def __init__(self, layer: dict):
+        self.score = rounded(layer.get('score', 0))
+        self.lighting_consistent = native(layer.get('lighting_consistent', True))
+        self.depth_plausible = native(layer.get('depth_plausible', True))
+        self.anomalies = layer.get('anomalies', [])
+
+
+class BoundarySummary(Result):
+    __slots__ = ('score', 'suspicious_transitions', 'quality_drops')
+    
+    def __init__(self, layer: dict):
+        self.score = rounded(layer.get('score', 0))
+        self.suspicious_transitions = len(layer.get('suspicious_transitions', []))
+        self.quality_drops = native(layer.get('quality_drops', 0))
+
+
+class CompressionSummary(Result):
+    __slots__ = ('score', 'mismatches', 'face_compression', 'background_compression')
+    
+    def __init__(self, layer: dict):
+        self.score = rounded(layer.get('score', 0))
+        self.mismatches = native(layer.get('compression_mismatches', 0))
+        self.face_compression = rounded(layer.get('avg_face_compression', 0))
+        self.background_compression = rounded(layer.get('avg_background_compression', 0))
+
+
+class VisualSummaries(Result):
+    __slots__ = ('frame_based', 'temporal', 'model_3d')
+    json_names = {'model_3d': '3d_model'}
+    
+    def __init__(self, frame_based=OMITTED, temporal=OMITTED, model_3d=OMITTED):
+        self.frame_based = frame_based
+        self.temporal = temporal
+        self.model_3d = model_3d
+
+
+class SpecializedSummaries(Result):
+    __slots__ = ('boundary', 'compression')
+    
+    def __init__(self, boundary=OMITTED, compression=OMITTED):
+        self.boundary = boundary
+        self.compression = compression
+
+
+class LayerSummaries(Result):
+    """The response's layer_summaries"""
+    __slots__ = ('metadata', 'visual', 'audio', 'physiological', 'physics', 'specialized')
+    
+    def __init__(self, visual: VisualSummaries, metadata=OMITTED, audio=OMITTED, physiological=OMITTED,
+                 physics=OMITTED, specialized=OMITTED):
+        self.metadata = metadata
+        self.visual = visual
+        self.audio = audio
+        self.physiological = physiological
+        self.physics = physics
+        self.specialized = specialized
+
+
+def summarize_layers(results: dict, detailed: bool) -> LayerSummaries:
+    """
+    Layer summaries of a detector's results. Layers that did not run are
+    left out; the quick analysis (detailed=False) has fewer fields and no
+    physiological, physics or specialized layers.
+    """
+    visual = VisualSummaries()
+    if results.get('layer2a_frame_based'):
+        visual.frame_based = FrameSummary(results['layer2a_frame_based'], detailed)
+    if results.get('layer2a_temporal'):
+        visual.temporal = TemporalSummary(results['layer2a_temporal'], detailed)
+    if results.get('layer2a_3d_video'):
+        visual.model_3d = Model3DSummary(results['layer2a_3d_video'], detailed)
+    
+    summaries = LayerSummaries(visual)
+    if results.get('layer1_metadata'):
+        summaries.metadata = MetadataSummary(results['layer1_metadata'], detailed)
+    if results.get('layer2b_audio'):
+        summaries.audio = AudioSummary(results['layer2b_audio'], detailed)
+    if not detailed:
+        return summaries
+    
+    if results.get('layer2c_physiological'):
+        summaries.physiological = PhysiologicalSummary(results['layer2c_physiological'])
+    if results.get('layer2d_physics'):
+        summaries.physics = PhysicsSummary(results['layer2d_physics'])
+    summaries.specialized = specialized = SpecializedSummaries()
+    if results.get('layer3_boundary'):
+        specialized.boundary = BoundarySummary(results['layer3_boundary'])
+    if results.get('layer3_compression'):
+        specialized.compression = CompressionSummary(results['layer3_compression'])
+    return summaries
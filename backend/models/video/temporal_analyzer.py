@@ -9,8 +9,48 @@ import cv2
 import numpy as np
 from PIL import Image
 import torch
+from models.face_analyzer import get_video_face_landmarker
+from models.model_bundle import FACENET_UNUSED_PREFIXES, FACENET_WEIGHTS, bundled_path, assign_bundled_weights
+from models.model_registry import get_model, register_model
+from utils.cancellation import check_cancelled
+from utils.metrics import timed_layer, time_model_load
+from utils.tracing import span
 
 
+def _load_facenet_models():
+    from facenet_pytorch import InceptionResnetV1, MTCNN
+    
+    print("Loading FaceNet models (one-time initialization)...")
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    
+    with time_model_load('facenet'):
+        # MTCNN weights ship with facenet_pytorch; the VGGFace2 ones may be bundled
+        mtcnn = MTCNN(keep_all=False, device=device)
+        weights = bundled_path(FACENET_WEIGHTS)
+        if weights is not None:
+            resnet = InceptionResnetV1(pretrained=None)
+            assign_bundled_weights(resnet, weights, ignore_prefixes=FACENET_UNUSED_PREFIXES)
+        else:
+            resnet = InceptionResnetV1(pretrained='vggface2')
+        resnet = resnet.eval().to(device)
+    
+    print(f"FaceNet models loaded on {device}")
+    return mtcnn, resnet, device
+
+
+register_model('facenet', _load_facenet_models)
+
+
+def get_facenet_models():
+    """Get cached FaceNet detector + embedder (loaded once via the model registry)"""
+    try:
+        return get_model('facenet')
+    except Exception as e:
+        print(f"Failed to load FaceNet models: {e}")
+        return None, None, None
+
+
+@timed_layer()
 def analyze_temporal_consistency(frame_paths, timestamps):
     """
     Analyze temporal consistency across frames
@@ -45,6 +85,7 @@ def analyze_temporal_consistency(frame_paths, timestamps):
             results['inconsistencies'].append('High facial landmark jitter detected')
         
         # 2. Identity persistence check
+        check_cancelled()
         identity_check = check_identity_persistence(frame_paths)
         results['identity_shifts'] = identity_check['num_shifts']
         
@@ -52,6 +93,7 @@ def analyze_temporal_consistency(frame_paths, timestamps):
             results['inconsistencies'].append(f'{identity_check["num_shifts"]} identity shifts detected')
         
         # 3. Optical flow analysis
+        check_cancelled()
         flow_analysis = analyze_optical_flow(frame_paths)
         results['motion_smoothness'] = flow_analysis['smoothness']
         results['optical_flow_anomalies'] = flow_analysis['anomalies']
@@ -82,40 +124,15 @@ def analyze_landmark_stability(frame_paths):
     try:
         # Try MediaPipe Tasks API (new way)
         try:
-            from mediapipe.tasks import python
-            from mediapipe.tasks.python import vision
             import mediapipe as mp
-            import os
-            
-            # Path to face landmarker model
-            model_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'models_cache')
-            face_landmarker_model = os.path.join(model_dir, 'face_landmarker.task')
-            
-            if not os.path.exists(face_landmarker_model):
-                raise Exception("Face landmarker model not found")
-            
-            # Proper initialization matching face_analyzer.py
-            base_options = python.BaseOptions(
-                model_asset_path=face_landmarker_model,
-                delegate=python.BaseOptions.Delegate.CPU
-            )
             
-            options = vision.FaceLandmarkerOptions(
-                base_options=base_options,
-                running_mode=vision.RunningMode.IMAGE,
-                output_face_blendshapes=False,
-                output_facial_transformation_matrixes=False,
-                num_faces=1,
-                min_face_detection_confidence=0.5,
-                min_face_presence_confidence=0.5,
-                min_tracking_confidence=0.5
-            )
-            
-            landmarker = vision.FaceLandmarker.create_from_options(options)
+            # Shared landmarker from the model registry (raises if unavailable)
+            landmarker = get_video_face_landmarker()
             
             landmarks_sequence = []
             
             for frame_path in frame_paths:
+                check_cancelled()
                 image = cv2.imread(frame_path)
                 if image is None:
                     continue
@@ -124,7 +141,8 @@ def analyze_landmark_stability(frame_paths):
                 mp_image = mp.Image(image_format=mp.ImageFormat.SRGB, data=rgb_image)
                 
                 try:
-                    detection_result = landmarker.detect(mp_image)
+                    with span("forward:face_landmarker"):
+                        detection_result = landmarker.detect(mp_image)
                 except Exception:
                     continue
                 
@@ -143,8 +161,6 @@ def analyze_landmark_stability(frame_paths):
                     if key_landmarks:
                         landmarks_sequence.append(np.array(key_landmarks))
             
-            landmarker.close()
-            
             if len(landmarks_sequence) < 2:
                 return {'jitter_score': 0.5, 'has_faces': False}
             
@@ -185,6 +201,7 @@ def analyze_landmark_stability_opencv(frame_paths):
         prev_frame = None
         
         for frame_path in frame_paths:
+            check_cancelled()
             image = cv2.imread(frame_path)
             if image is None:
                 continue
@@ -227,26 +244,26 @@ def check_identity_persistence(frame_paths):
     """Check if face identity remains consistent"""
     try:
         # Use FaceNet for face embeddings
-        from facenet_pytorch import InceptionResnetV1, MTCNN
+        mtcnn, resnet, device = get_facenet_models()
         
-        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        
-        mtcnn = MTCNN(keep_all=False, device=device)
-        resnet = InceptionResnetV1(pretrained='vggface2').eval().to(device)
+        if resnet is None:
+            return check_identity_persistence_fallback(frame_paths)
         
         embeddings = []
         
         for frame_path in frame_paths:
+            check_cancelled()
             img = Image.open(frame_path).convert('RGB')
             
             # Detect face
-            face = mtcnn(img)
+            with span("forward:mtcnn"):
+                face = mtcnn(img)
             
             if face is not None:
                 face = face.unsqueeze(0).to(device)
                 
                 # Get embedding
-                with torch.no_grad():
+                with span("forward:facenet"), torch.no_grad():
                     embedding = resnet(face)
                 
                 embeddings.append(embedding.cpu().numpy().flatten())
@@ -292,6 +309,7 @@ def check_identity_persistence_fallback(frame_paths):
         prev_hist = None
         
         for frame_path in frame_paths:
+            check_cancelled()
             img = cv2.imread(frame_path)
             if img is None:
                 continue
@@ -329,6 +347,7 @@ def analyze_optical_flow(frame_paths):
         prev_frame = None
         
         for frame_path in frame_paths:
+            check_cancelled()
             frame = cv2.imread(frame_path)
             if frame is None:
                 continue
@@ -6,8 +6,39 @@ import torch
 import numpy as np
 import cv2
 from PIL import Image
+from models.model_bundle import load_hf_model
+from models.model_registry import get_model, register_model
+from utils.cancellation import check_cancelled
+from utils.metrics import timed_layer, time_model_load
+from utils.tracing import span
 
 
+def _load_videomae_model():
+    print("Loading VideoMAE model (one-time initialization)...")
+    device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
+    
+    with time_model_load('videomae'):
+        processor, model = load_hf_model("MCG-NJU/videomae-base")
+        model.to(device)
+        model.eval()
+    
+    print(f"VideoMAE model loaded on {device}")
+    return model, processor, device
+
+
+register_model('videomae', _load_videomae_model)
+
+
+def get_videomae_model():
+    """Get cached VideoMAE model + processor (loaded once via the model registry)"""
+    try:
+        return get_model('videomae')
+    except Exception as e:
+        print(f"Failed to load VideoMAE model: {e}")
+        return None, None, None
+
+
+@timed_layer()
 def analyze_with_3d_model(video_path, clip_duration=2.0):
     """
     Analyze video using 3D video model (VideoMAE)
@@ -46,15 +77,11 @@ def analyze_with_3d_model(video_path, clip_duration=2.0):
 def analyze_with_videomae(video_path, clip_duration):
     """Analyze using VideoMAE model"""
     try:
-        from transformers import VideoMAEImageProcessor, VideoMAEForVideoClassification
+        # Pre-trained VideoMAE, loaded once per process
+        model, processor, device = get_videomae_model()
         
-        device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-        
-        # Load pre-trained VideoMAE
-        processor = VideoMAEImageProcessor.from_pretrained("MCG-NJU/videomae-base")
-        model = VideoMAEForVideoClassification.from_pretrained("MCG-NJU/videomae-base")
-        model.to(device)
-        model.eval()
+        if model is None:
+            return None
         
         # Extract video clips
         clips = extract_video_clips(video_path, clip_duration, num_frames=16)
@@ -65,11 +92,12 @@ def analyze_with_videomae(video_path, clip_duration):
         clip_scores = []
         
         for clip_frames in clips:
+            check_cancelled()
             # Process clip
             inputs = processor(clip_frames, return_tensors="pt")
             inputs = {k: v.to(device) for k, v in inputs.items()}
             
-            with torch.no_grad():
+            with span("forward:videomae"), torch.no_grad():
                 outputs = model(**inputs)
                 logits = outputs.logits
                 
@@ -123,6 +151,7 @@ def analyze_with_temporal_features(video_path, clip_duration):
         clip_scores = []
         
         for clip_frames in clips:
+            check_cancelled()
             # Convert to tensor
             clip_array = np.stack([np.array(f.resize((224, 224))) for f in clip_frames])
             clip_array = clip_array.astype(np.float32) / 255.0
@@ -0,0 +1,288 @@
+"""
+Analysis tasks - one entry point per analysis type.
+
+Each task takes the path of an uploaded file (or, for small images, its
+raw bytes), runs the detectors and returns the response: a dict, whose
+video layer summaries are typed result objects (models.video.results) -
+encode it with utils.fast_json. The same tasks back the synchronous
+/analyze/* endpoints and the asynchronous /jobs API.
+
+The comprehensive tasks also take deadline_at, the absolute time
+(time.time()) by which the request wants an answer - see utils.deadline.
+"""
+import os
+import shutil
+
+import config
+from models.progress_tracker import get_progress_tracker
+from services.report_generator import generate_report, generate_comprehensive_report
+from services.comprehensive_analyzer import analyze_image_comprehensive
+from utils.deadline import Deadline
+from utils.image_utils import preprocess_image
+from models.deepfake_detector import predict_image
+from models.video.results import summarize_layers
+from services.video_analyzer import analyze_video
+
+
+class AnalysisError(Exception):
+    """Analysis failed - carries the HTTP status the API should answer with"""
+    def __init__(self, detail: str, status_code: int = 500):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+    
+    def __reduce__(self):
+        # Keep status_code when raised in a worker process
+        return (AnalysisError, (self.detail, self.status_code))
+
+
+def remove_file(path):
+    """Best-effort removal of an uploaded file (no-op for in-memory uploads)"""
+    if not isinstance(path, str):
+        return
+    try:
+        os.remove(path)
+    except:
+        pass
+
+
+def remove_dir(path):
+    """Best-effort removal of a per-job working directory"""
+    try:
+        if path and os.path.exists(path):
+            shutil.rmtree(path)
+    except:
+        pass
+
+
+def run_image_quick(path, frames_dir=None):
+    """Quick image analysis using single neural network"""
+    tracker = get_progress_tracker()
+    
+    try:
+        image = preprocess_image(path)
+        fake_prob = predict_image(image)
+        
+        if fake_prob > config.RISK_THRESHOLDS['high']:
+            risk = "High"
+        elif fake_prob > config.RISK_THRESHOLDS['medium']:
+            risk = "Medium"
+        else:
+            risk = "Low"
+        
+        report = generate_report(
+            media_type="image",
+            fake_probability=fake_prob,
+            risk_level=risk
+        )
+        
+        tracker.update("Complete!")
+        
+        return {
+            "fake_probability": round(fake_prob, 2),
+            "risk_level": risk,
+            "report": report,
+            "analysis_type": "quick"
+        }
+    
+    except AnalysisError:
+        raise
+    except Exception as e:
+        raise AnalysisError(f"Analysis failed: {str(e)}")
+    finally:
+        remove_file(path)
+
+
+# Response keys that only concern the request that set a deadline
+DEADLINE_REPORT_KEYS = ("degraded_layers", "deadline_met")
+
+
+def add_deadline_report(response, results, deadline):
+    """Tell the client what was cut to meet its deadline"""
+    if deadline.enabled:
+        response["degraded_layers"] = results.get('degraded_layers', {})
+        response["deadline_met"] = not deadline.expired()
+
+
+def without_deadline_report(response):
+    """A full response as it is shared with other requests (cache, result history)"""
+    return {key: value for key, value in response.items() if key not in DEADLINE_REPORT_KEYS}
+
+
+def run_image_comprehensive(path, frames_dir=None, deadline_at=None):
+    """Comprehensive image analysis using all detection methods"""
+    tracker = get_progress_tracker()
+    deadline = Deadline(deadline_at)
+    
+    try:
+        results = analyze_image_comprehensive(path, deadline=deadline)
+        
+        # Check for errors
+        if results is None or 'error' in results:
+            error_msg = results.get('error', 'Analysis failed') if results else 'Analysis returned no results'
+            raise AnalysisError(error_msg)
+        
+        # Generate detailed report
+        report = generate_comprehensive_report(results)
+        
+        # Build response with safe defaults
+        response = {
+            "final_score": round(results.get('final_score', 0.5), 3),
+            "risk_level": results.get('risk_level', 'Unknown'),
+            "confidence": round(results.get('confidence', 0.0), 3),
+            "analysis_type": "comprehensive",
+            "report": report
+        }
+        
+        # Add detailed breakdown if enabled
+        if config.ENABLE_DETAILED_BREAKDOWN:
+            response["analysis_breakdown"] = {
+                "neural_network": results.get('neural_network'),
+                "frequency_domain": results.get('frequency_domain'),
+                "facial_analysis": results.get('facial_analysis'),
+                "metadata_forensics": results.get('metadata_forensics')
+            }
+        
+        add_deadline_report(response, results, deadline)
+        tracker.update("Complete!")
+        
+        return response
+    
+    except AnalysisError:
+        raise
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise AnalysisError(f"Comprehensive analysis failed: {str(e)}")
+    finally:
+        remove_file(path)
+
+
+def run_video_quick(video_path, frames_dir):
+    """Quick video deepfake detection (Layers 1, 2A, 2B only)"""
+    tracker = get_progress_tracker()
+    
+    try:
+        # Import quick detector
+        from models.video.quick_detector import analyze_video_quick
+        
+        results = analyze_video_quick(video_path, frames_dir)
+        
+        # Check for errors
+        if results is None:
+            raise AnalysisError("Analysis returned no results")
+        
+        if 'error' in results:
+            raise AnalysisError(results['error'])
+        
+        # Build response
+        response = {
+            "final_score": round(results.get('final_score', 0.5), 3),
+            "risk_level": results.get('risk_level', 'Unknown'),
+            "confidence": round(results.get('confidence', 0.0), 3),
+            "analysis_type": "quick",
+            "method_breakdown": results.get('method_breakdown', {}),
+            "warning": "Quick analysis - some detection layers were skipped for speed",
+            "layer_summaries": summarize_layers(results, detailed=False)
+        }
+        
+        tracker.update("Quick analysis complete!")
+        
+        return response
+    
+    except AnalysisError:
+        raise
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise AnalysisError(f"Quick video analysis failed: {str(e)}")
+    finally:
+        # Cleanup uploaded file and temp frames
+        remove_file(video_path)
+        remove_dir(frames_dir)
+
+
+def run_video_comprehensive(video_path, frames_dir, deadline_at=None):
+    """Comprehensive HYBRID video deepfake detection (all layers)"""
+    tracker = get_progress_tracker()
+    deadline = Deadline(deadline_at)
+    
+    try:
+        # Import comprehensive detector
+        from models.video.comprehensive_detector import analyze_video_comprehensive
+        
+        results = analyze_video_comprehensive(video_path, frames_dir, deadline=deadline)
+        
+        # Check for errors
+        if results is None:
+            raise AnalysisError("Analysis returned no results")
+        
+        if 'error' in results:
+            raise AnalysisError(results['error'])
+        
+        # Build response with safe defaults
+        response = {
+            "final_score": round(results.get('final_score', 0.5), 3),
+            "risk_level": results.get('risk_level', 'Unknown'),
+            "confidence": round(results.get('confidence', 0.0), 3),
+            "analysis_type": "comprehensive_hybrid",
+            "method_breakdown": results.get('method_breakdown', {}),
+            "layer_summaries": summarize_layers(results, detailed=True)
+        }
+        
+        add_deadline_report(response, results, deadline)
+        tracker.update("Analysis complete!")
+        
+        return response
+    
+    except AnalysisError:
+        raise
+    except Exception as e:
+        import traceback
+        traceback.print_exc()
+        raise AnalysisError(f"Comprehensive video analysis failed: {str(e)}")
+    finally:
+        # Cleanup uploaded file and temp frames
+        remove_file(video_path)
+        remove_dir(frames_dir)
+
+
+def run_video_legacy(video_path, frames_dir):
+    """OLD simple video analysis - quick model on one frame per second"""
+    tracker = get_progress_tracker()
+    
+    try:
+        result = analyze_video(video_path, frames_dir=frames_dir)
+        
+        if result is None:
+            raise AnalysisError("No frames could be analyzed", status_code=400)
+        
+        tracker.update("Complete!")
+        
+        return result
+    
+    except AnalysisError:
+        raise
+    except Exception as e:
+        raise AnalysisError(f"Video analysis failed: {str(e)}")
+    finally:
+        remove_file(video_path)
+        remove_dir(frames_dir)
+
+
+# Analysis types whose task accepts deadline_at
+DEADLINE_ANALYSIS_TYPES = {'image_comprehensive', 'video_comprehensive'}
+
+# Scheduling lane (config.JOB_LANES) of types that don't have their own
+ANALYSIS_LANES = {
+    'video_legacy': 'video_quick',
+}
+
+# analysis_type -> (task, allowed extensions)
+ANALYSIS_TASKS = {
+    'image_quick': (run_image_quick, config.ALLOWED_IMAGE_EXTENSIONS),
+    'image_comprehensive': (run_image_comprehensive, config.ALLOWED_IMAGE_EXTENSIONS),
+    'video_quick': (run_video_quick, config.ALLOWED_VIDEO_EXTENSIONS),
+    'video_comprehensive': (run_video_comprehensive, config.ALLOWED_VIDEO_EXTENSIONS),
+    'video_legacy': (run_video_legacy, config.ALLOWED_VIDEO_EXTENSIONS),
+}
@@ -0,0 +1,216 @@
+"""
+Batch scanning of a directory tree (`python -m veritas scan <dir>`).
+
+Files are analyzed in place by a pool of worker processes - no upload, no
+copy - with the same tasks that back the API, and every finished file is
+appended to a JSONL output as one line:
+
+    {"path": ..., "size": ..., "mtime": ..., "analysis_type": ..., "content_hash": ...,
+     "status": "ok" | "error", "seconds": ..., "result": {...} | "error": "..."}
+
+The output doubles as the checkpoint: a rerun with the same output skips
+every file already in it (unless its size or mtime changed since), so an
+interrupted backfill resumes where it stopped. Lines are flushed as they
+are written, and a half-written last line from a crash is dropped. An
+output of '-' streams the lines to stdout instead (no resuming).
+"""
+import contextlib
+import hashlib
+import json
+import multiprocessing
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, Iterator, Optional, Tuple
+
+import config
+from utils import fast_json
+
+# analysis type per media type, by scan mode
+SCAN_MODES = {
+    'quick': {'image': 'image_quick', 'video': 'video_quick'},
+    'comprehensive': {'image': 'image_comprehensive', 'video': 'video_comprehensive'},
+}
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Files submitted per worker ahead of the results (keeps memory flat on huge trees)
+PREFETCH_PER_WORKER = 2
+
+
+def media_type(path: str) -> Optional[str]:
+    extension = os.path.splitext(path)[1].lower()
+    if extension in config.ALLOWED_IMAGE_EXTENSIONS:
+        return 'image'
+    if extension in config.ALLOWED_VIDEO_EXTENSIONS:
+        return 'video'
+    return None
+
+
+def walk_media(root: str) -> Iterator[str]:
+    """Every image and video under root, in a stable order"""
+    for directory, subdirs, files in os.walk(root):
+        subdirs.sort()
+        for name in sorted(files):
+            path = os.path.join(directory, name)
+            if media_type(path) is not None:
+                yield path
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def load_checkpoint(output: str, retry_errors: bool = False) -> Dict[str, Tuple[int, float]]:
+    """
+    Files already in the output: path -> (size, mtime).
+    Truncates a partial last line left by an interrupted run.
+    """
+    done = {}
+    if output == '-' or not os.path.exists(output):
+        return done
+    
+    valid_bytes = 0
+    with open(output, 'rb') as f:
+        for line in f:
+            if not line.endswith(b'\n'):
+                break
+            valid_bytes += len(line)
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if retry_errors and record.get('status') != 'ok':
+                continue
+            done[record['path']] = (record['size'], record['mtime'])
+    
+    if valid_bytes != os.path.getsize(output):
+        with open(output, 'r+b') as f:
+            f.truncate(valid_bytes)
+    return done
+
+
+# Worker process side
+
+def _init_worker(include_video: bool):
+    from services.model_warmup import ModelWarmup
+    # Failed models load lazily on first use instead
+    ModelWarmup(include_video=include_video).run()
+
+
+def _scan_file(path: str, analysis_type: str) -> dict:
+    """Runs inside a worker process: analyze one file and return its output record"""
+    from services.analysis_tasks import ANALYSIS_TASKS
+    
+    task = ANALYSIS_TASKS[analysis_type][0]
+    record = {'path': path, 'analysis_type': analysis_type}
+    start = time.perf_counter()
+    
+    # The tasks delete their input when done: hand them a link, never the archived file
+    work_dir = tempfile.mkdtemp(prefix='veritas-scan-')
+    try:
+        link = os.path.join(work_dir, f"media{os.path.splitext(path)[1].lower()}")
+        try:
+            os.symlink(os.path.abspath(path), link)
+        except OSError:
+            shutil.copyfile(path, link)
+        
+        record['content_hash'] = file_hash(path)
+        record['result'] = task(link, os.path.join(work_dir, 'frames'))
+        record['status'] = 'ok'
+    except Exception as e:
+        record['status'] = 'error'
+        record['error'] = getattr(e, 'detail', str(e))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    
+    record['seconds'] = round(time.perf_counter() - start, 3)
+    return record
+
+
+# Driver
+
+def scan(root: str, output: str, mode: str = 'comprehensive', workers: Optional[int] = None,
+         retry_errors: bool = False, include_video: bool = True) -> dict:
+    """Scan root into output (JSONL), resuming from what output already holds"""
+    analysis_types = SCAN_MODES[mode]
+    workers = workers or config.ANALYSIS_WORKERS
+    done = load_checkpoint(output, retry_errors)
+    counts = {'ok': 0, 'error': 0, 'skipped': 0}
+    
+    def pending() -> Iterator[Tuple[str, str, int, float]]:
+        for path in walk_media(root):
+            kind = media_type(path)
+            if kind == 'video' and not include_video:
+                continue
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            if done.get(path) == (stat.st_size, stat.st_mtime):
+                counts['skipped'] += 1
+                continue
+            yield path, analysis_types[kind], stat.st_size, stat.st_mtime
+    
+    def new_executor() -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=_init_worker,
+            initargs=(include_video,)
+        )
+    
+    executor = new_executor()
+    start = time.time()
+    inflight = {}
+    files = pending()
+    
+    stream = contextlib.nullcontext(sys.stdout) if output == '-' else open(output, 'a', encoding='utf-8')
+    with stream as out:
+        def submit_more():
+            while len(inflight) < workers * PREFETCH_PER_WORKER:
+                item = next(files, None)
+                if item is None:
+                    return
+                path, analysis_type, size, mtime = item
+                future = executor.submit(_scan_file, path, analysis_type)
+                inflight[future] = (executor, path, analysis_type, size, mtime)
+        
+        try:
+            submit_more()
+            while inflight:
+                finished, _ = wait(inflight, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    pool, path, analysis_type, size, mtime = inflight.pop(future)
+                    try:
+                        record = future.result()
+                    except BrokenProcessPool:
+                        # Can't tell which file killed the worker: every file in flight
+                        # is recorded as failed (rerun with --retry-errors) and the pool restarts
+                        record = {'path': path, 'analysis_type': analysis_type, 'status': 'error',
+                                  'error': 'Analysis worker crashed', 'seconds': 0.0}
+                        if pool is executor:
+                            executor.shutdown(wait=False, cancel_futures=True)
+                            executor = new_executor()
+                    record['size'], record['mtime'] = size, mtime
+                    out.write(fast_json.dumps_str(record) + '\n')
+                    out.flush()
+                    counts[record['status']] += 1
+                    
+                    total = counts['ok'] + counts['error']
+                    print(f"[{total}] {record['status']:5} {record['seconds']:7.1f}s  {record['path']}",
+                          file=sys.stderr)
+                submit_more()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+    
+    counts['seconds'] = round(time.time() - start, 1)
+    return counts
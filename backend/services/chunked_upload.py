@@ -0,0 +1,288 @@
+"""
+Resumable chunked uploads.
+
+Large videos over unreliable connections can be sent in chunks instead of
+one multipart POST:
+
+    POST   /uploads                       filename, size[, sha256] -> upload_id, chunk_size, chunks
+    PUT    /uploads/{id}/chunks/{index}   raw chunk bytes, X-Chunk-SHA256: <hex digest of the chunk>
+    GET    /uploads/{id}                  which chunks are still missing (to resume)
+    POST   /uploads/{id}/complete         analysis_type -> queued job, as POST /jobs
+    DELETE /uploads/{id}                  abandon the upload
+
+Each chunk is checked against its SHA-256 and written straight to its
+offset in one preallocated spool file, in any order and as often as a
+client retries. The SHA-256 of the whole file is computed as chunks arrive:
+the next chunk in order is hashed from the request body already in memory,
+so an in-order upload is never read back - only chunks that arrived early
+are re-read when the hash catches up with them. On complete the spool file
+is hard-linked to the job's upload path, so the bytes are never copied, and
+it is analyzed like any other upload.
+
+Sessions live in the API process and expire after
+CHUNKED_UPLOAD_TTL_SECONDS without activity.
+"""
+import hashlib
+import math
+import os
+import re
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional
+
+import config
+from services.upload_spool import SpooledUpload, UploadTooLargeError, max_upload_bytes
+
+SHA256_PATTERN = re.compile(r'^[0-9a-f]{64}$')
+
+# Spool files of sessions, next to the per-job uploads (hard links need the same filesystem)
+SPOOL_PREFIX = 'upload-'
+SPOOL_SUFFIX = '.part'
+
+
+class UploadSessionError(Exception):
+    """A chunked upload request that can't be served - carries the HTTP status"""
+    def __init__(self, detail: str, status_code: int = 400):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+class UploadSession:
+    def __init__(self, upload_id: str, filename: str, size: int, chunk_size: int, path: str,
+                 sha256: Optional[str] = None):
+        self.upload_id = upload_id
+        self.filename = filename
+        self.size = size
+        self.chunk_size = chunk_size
+        self.chunks = math.ceil(size / chunk_size)
+        self.path = path
+        # Whole-file SHA-256 announced by the client, checked on complete
+        self.sha256 = sha256
+        # Received chunk -> its SHA-256
+        self.checksums: Dict[int, str] = {}
+        # SHA-256 of chunks [0, hashed_chunks)
+        self.digest = hashlib.sha256()
+        self.hashed_chunks = 0
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.lock = threading.Lock()
+    
+    def chunk_length(self, index: int) -> int:
+        return min(self.chunk_size, self.size - index * self.chunk_size)
+    
+    def expected_length(self, index: int) -> int:
+        """Length chunk index must have; raises for an index out of range"""
+        if not 0 <= index < self.chunks:
+            raise UploadSessionError(f"Chunk index must be between 0 and {self.chunks - 1}")
+        return self.chunk_length(index)
+    
+    @property
+    def missing(self) -> List[int]:
+        return [index for index in range(self.chunks) if index not in self.checksums]
+    
+    def to_dict(self) -> dict:
+        """Status view returned by the /uploads endpoints"""
+        with self.lock:
+            received = sum(self.chunk_length(index) for index in self.checksums)
+            missing = self.missing
+        return {
+            'upload_id': self.upload_id,
+            'filename': self.filename,
+            'size': self.size,
+            'chunk_size': self.chunk_size,
+            'chunks': self.chunks,
+            'bytes_received': received,
+            'missing_chunks': missing,
+            'expires_at': self.updated_at + config.CHUNKED_UPLOAD_TTL_SECONDS,
+            'upload_url': f"/uploads/{self.upload_id}",
+        }
+
+
+class ChunkedUploadManager:
+    def __init__(self, upload_dir: str, chunk_size: int, ttl_seconds: float, max_sessions: int):
+        self.upload_dir = upload_dir
+        self.chunk_size = chunk_size
+        self.ttl_seconds = ttl_seconds
+        self.max_sessions = max_sessions
+        self._sessions: Dict[str, UploadSession] = {}
+        self._lock = threading.Lock()
+        os.makedirs(upload_dir, exist_ok=True)
+        self._remove_stale_spool_files()
+    
+    def create(self, filename: str, size: int, sha256: Optional[str] = None) -> UploadSession:
+        """Start an upload: validates it and preallocates its spool file"""
+        extension = os.path.splitext(filename)[1].lower()
+        allowed = config.ALLOWED_IMAGE_EXTENSIONS | config.ALLOWED_VIDEO_EXTENSIONS
+        if extension not in allowed:
+            raise UploadSessionError(f"Invalid file type. Allowed: {', '.join(sorted(allowed))}")
+        if size <= 0:
+            raise UploadSessionError("size must be positive")
+        if size > max_upload_bytes():
+            raise UploadSessionError(str(UploadTooLargeError(max_upload_bytes())), status_code=413)
+        if sha256 is not None:
+            sha256 = sha256.lower()
+            if not SHA256_PATTERN.match(sha256):
+                raise UploadSessionError("sha256 must be a SHA-256 hex digest")
+        
+        with self._lock:
+            self._prune_locked()
+            if len(self._sessions) >= self.max_sessions:
+                raise UploadSessionError("Too many uploads in progress, try again later", status_code=429)
+            
+            upload_id = uuid.uuid4().hex
+            path = os.path.join(self.upload_dir, f"{SPOOL_PREFIX}{upload_id}{SPOOL_SUFFIX}")
+            # Sparse: chunks fill it in place, in any order
+            with open(path, 'xb') as f:
+                f.truncate(size)
+            session = UploadSession(upload_id, filename, size, self.chunk_size, path, sha256)
+            self._sessions[upload_id] = session
+            return session
+    
+    def get(self, upload_id: str) -> UploadSession:
+        with self._lock:
+            self._prune_locked()
+            session = self._sessions.get(upload_id)
+        if session is None:
+            raise UploadSessionError(f"Unknown or expired upload {upload_id}", status_code=404)
+        return session
+    
+    def write_chunk(self, upload_id: str, index: int, data: bytes, checksum: str) -> UploadSession:
+        """
+        Verify a chunk against its SHA-256 and write it at its offset.
+        Blocking (disk I/O and hashing) - run it off the event loop.
+        Re-sending a chunk that was already received is a no-op.
+        """
+        session = self.get(upload_id)
+        expected = session.expected_length(index)
+        if len(data) != expected:
+            raise UploadSessionError(f"Chunk {index} must be {expected} bytes, got {len(data)}")
+        actual = hashlib.sha256(data).hexdigest()
+        if actual != checksum.lower():
+            raise UploadSessionError(f"Chunk {index} does not match its checksum - send it again")
+        
+        with session.lock:
+            session.updated_at = time.time()
+            previous = session.checksums.get(index)
+            if previous is not None:
+                if previous != actual:
+                    raise UploadSessionError(f"Chunk {index} was already received with different content",
+                                             status_code=409)
+                return session
+            
+            try:
+                f = open(session.path, 'r+b')
+            except FileNotFoundError:
+                raise UploadSessionError(f"Unknown or expired upload {upload_id}", status_code=404)
+            with f:
+                f.seek(index * session.chunk_size)
+                f.write(data)
+            session.checksums[index] = actual
+            self._advance_hash_locked(session, index, data)
+        return session
+    
+    def _advance_hash_locked(self, session: UploadSession, index: int, data: bytes):
+        if index != session.hashed_chunks:
+            return
+        session.digest.update(data)
+        session.hashed_chunks += 1
+        if session.hashed_chunks not in session.checksums:
+            return
+        # Chunks that arrived early are read back now that the hash has reached them
+        with open(session.path, 'rb') as f:
+            while session.hashed_chunks in session.checksums:
+                f.seek(session.hashed_chunks * session.chunk_size)
+                session.digest.update(f.read(session.chunk_length(session.hashed_chunks)))
+                session.hashed_chunks += 1
+    
+    def check_complete(self, upload_id: str) -> UploadSession:
+        session = self.get(upload_id)
+        with session.lock:
+            missing = session.missing
+        if missing:
+            raise UploadSessionError(
+                f"{len(missing)} of {session.chunks} chunks are missing: {missing[:20]}", status_code=409
+            )
+        return session
+    
+    def assemble(self, upload_id: str, dest_path: str) -> SpooledUpload:
+        """
+        The finished upload at dest_path (a hard link to the spool file, so
+        no copy), with its SHA-256. The session stays until close(), so a
+        job that could not be queued can be completed again - except where
+        hard links aren't available and the spool file itself was moved.
+        """
+        session = self.check_complete(upload_id)
+        with session.lock:
+            content_hash = session.digest.copy().hexdigest()
+            if session.sha256 is not None and content_hash != session.sha256:
+                self.close(upload_id)
+                raise UploadSessionError(
+                    f"Upload does not match the sha256 given when it was started (got {content_hash})",
+                    status_code=422
+                )
+            try:
+                os.link(session.path, dest_path)
+            except FileNotFoundError:
+                raise UploadSessionError(f"Unknown or expired upload {upload_id}", status_code=404)
+            except OSError:
+                # No hard links here: hand the spool file over instead. That
+                # leaves the session without a file, so it ends here
+                os.replace(session.path, dest_path)
+                with self._lock:
+                    self._sessions.pop(upload_id, None)
+        return SpooledUpload(dest_path, None, session.size, content_hash)
+    
+    def close(self, upload_id: str) -> bool:
+        """Forget an upload and remove its spool file; False if it did not exist"""
+        with self._lock:
+            session = self._sessions.pop(upload_id, None)
+        if session is None:
+            return False
+        self._remove(session.path)
+        return True
+    
+    def _prune_locked(self):
+        now = time.time()
+        expired = [upload_id for upload_id, session in self._sessions.items()
+                   if now - session.updated_at > self.ttl_seconds]
+        for upload_id in expired:
+            self._remove(self._sessions.pop(upload_id).path)
+    
+    def _remove_stale_spool_files(self):
+        """Spool files of sessions from a previous run can't be resumed"""
+        cutoff = time.time() - self.ttl_seconds
+        for name in os.listdir(self.upload_dir):
+            if not (name.startswith(SPOOL_PREFIX) and name.endswith(SPOOL_SUFFIX)):
+                continue
+            path = os.path.join(self.upload_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                pass
+    
+    @staticmethod
+    def _remove(path: str):
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+_upload_manager: Optional[ChunkedUploadManager] = None
+_upload_manager_lock = threading.Lock()
+
+
+def get_upload_manager() -> ChunkedUploadManager:
+    global _upload_manager
+    with _upload_manager_lock:
+        if _upload_manager is None:
+            _upload_manager = ChunkedUploadManager(
+                config.UPLOAD_DIR,
+                chunk_size=int(config.CHUNKED_UPLOAD_CHUNK_MB * 1024 * 1024),
+                ttl_seconds=config.CHUNKED_UPLOAD_TTL_SECONDS,
+                max_sessions=config.CHUNKED_UPLOAD_MAX_SESSIONS,
+            )
+        return _upload_manager
@@ -6,21 +6,34 @@ from models.ensemble_detector import predict_ensemble
 from models.frequency_analyzer import analyze_frequency_domain
 from models.face_analyzer import analyze_face
 from models.metadata_analyzer import analyze_metadata
+from utils.cancellation import check_cancelled
+from utils.deadline import Deadline
+from utils.image_utils import open_image
+from utils.metrics import timed_layer
+from utils.tracing import traced
 
 
-def analyze_image_comprehensive(image_path):
+# Whole-job span and memory high-water mark, around the per-analyzer ones
+@timed_layer()
+def analyze_image_comprehensive(image_path, deadline=None):
     """
     Comprehensive image analysis using all detection methods.
     
     Args:
-        image_path: Path to the image file
+        image_path: Path to the image file, or its raw bytes
+        deadline: Optional utils.deadline.Deadline - the neural ensemble
+            always runs, the other methods only while they still fit
+            (metadata goes first, then face, then frequency)
     
     Returns:
         dict: Complete analysis results with scores and breakdown
     """
+    if deadline is None:
+        deadline = Deadline()
+    
     try:
         # Load image once for reuse
-        image = Image.open(image_path).convert('RGB')
+        image = open_image(image_path).convert('RGB')
         
         results = {
             'neural_network': None,
@@ -29,8 +42,10 @@ def analyze_image_comprehensive(image_path):
             'metadata_forensics': None,
             'final_score': 0.0,
             'risk_level': 'Unknown',
-            'confidence': 0.0
+            'confidence': 0.0,
+            'degraded_layers': {}
         }
+        degraded = results['degraded_layers']
         
         # 1. Neural Network Ensemble
         if config.NEURAL_ENSEMBLE_ENABLED:
@@ -42,7 +57,10 @@ def analyze_image_comprehensive(image_path):
                 results['neural_network'] = {'score': 0.5, 'error': str(e)}
         
         # 2. Frequency Domain Analysis
-        if config.FREQUENCY_ANALYSIS_ENABLED:
+        check_cancelled()
+        if config.FREQUENCY_ANALYSIS_ENABLED and not deadline.fits('analyze_frequency_domain'):
+            degraded['frequency'] = 'skipped'
+        elif config.FREQUENCY_ANALYSIS_ENABLED:
             try:
                 freq_result = analyze_frequency_domain(image)
                 results['frequency_domain'] = freq_result
@@ -51,7 +69,10 @@ def analyze_image_comprehensive(image_path):
                 results['frequency_domain'] = {'score': 0.5, 'error': str(e)}
         
         # 3. Facial Analysis
-        if config.FACE_ANALYSIS_ENABLED:
+        check_cancelled()
+        if config.FACE_ANALYSIS_ENABLED and not deadline.fits('analyze_face'):
+            degraded['face'] = 'skipped'
+        elif config.FACE_ANALYSIS_ENABLED:
             try:
                 face_result = analyze_face(image)
                 results['facial_analysis'] = face_result
@@ -60,7 +81,10 @@ def analyze_image_comprehensive(image_path):
                 results['facial_analysis'] = {'score': 0.5, 'error': str(e)}
         
         # 4. Metadata Forensics
-        if config.METADATA_ANALYSIS_ENABLED:
+        check_cancelled()
+        if config.METADATA_ANALYSIS_ENABLED and not deadline.fits('analyze_metadata'):
+            degraded['metadata'] = 'skipped'
+        elif config.METADATA_ANALYSIS_ENABLED:
             try:
                 metadata_result = analyze_metadata(image_path)
                 results['metadata_forensics'] = metadata_result
@@ -69,7 +93,7 @@ def analyze_image_comprehensive(image_path):
                 results['metadata_forensics'] = {'score': 0.5, 'error': str(e)}
         
         # Combine all scores with AGGRESSIVE DYNAMIC WEIGHTING
-        final_score, confidence = combine_scores_aggressive(results)
+        final_score, confidence = combine_scores_aggressive(results, skipped_layers=list(degraded))
         results['final_score'] = final_score
         results['confidence'] = confidence
         results['risk_level'] = determine_risk_level(final_score)
@@ -85,9 +109,12 @@ def analyze_image_comprehensive(image_path):
         }
 
 
-def combine_scores_aggressive(results):
+@traced()
+def combine_scores_aggressive(results, skipped_layers=()):
     """
     AGGRESSIVE dynamic weighting - heavily trusts neural networks when confident.
+    Methods skipped for a deadline (skipped_layers) lower the confidence by
+    their share of ENSEMBLE_WEIGHTS.
     
     Returns:
         tuple: (final_score, confidence)
@@ -229,6 +256,10 @@ def combine_scores_aggressive(results):
         elif score_variance < 0.08:  # Low variance
             avg_confidence = min(avg_confidence * 1.15, 1.0)
     
+    if skipped_layers:
+        skipped_weight = sum(weights.get(layer, 0.0) for layer in skipped_layers)
+        avg_confidence *= 1.0 - skipped_weight
+    
     return final_score, avg_confidence
 
 
@@ -0,0 +1,744 @@
+"""
+Job brokers - the queue between API nodes and analysis workers
+(ANALYSIS_WORKER_MODE=broker).
+
+The API enqueues each job with its media (or, with shared storage, just the
+path of the file); a worker (`python -m veritas worker`, on this host or any
+other) claims it, streams progress back as events and finishes with a
+result, error or cancelled event. API nodes never load a model, and workers
+can be added horizontally.
+
+Media travels in chunks of MEDIA_CHUNK_SIZE, so neither side holds a whole
+video in memory and no single broker value grows with the file.
+
+A claim is a lease: the job and its media stay in the broker until the
+worker finishes it, and the claim only holds while the worker's heartbeat
+is younger than BROKER_LEASE_SECONDS. Jobs of a worker that died go back to
+the head of their queue for the next worker; a job that keeps taking its
+workers down fails once it has been claimed BROKER_MAX_DELIVERIES times.
+
+Implementations, picked by JOB_BROKER_URL:
+- memory://            in-process; workers run as threads of the API (development)
+- sqlite:///path.db    processes on one host sharing a database file
+- redis://host:6379/0  any number of hosts, over the Redis protocol (RESP, Redis >= 6.2)
+
+Every broker implements the JobBroker interface below. Jobs are claimed
+highest lane priority first, FIFO within a priority.
+"""
+import json
+import math
+import os
+import socket
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
+
+import config
+from utils import fast_json
+
+# Event kinds
+PROGRESS = 'progress'
+RESULT = 'result'
+ERROR = 'error'
+CANCELLED = 'cancelled'
+
+# A worker counts as alive this long after its last heartbeat
+WORKER_STALE_SECONDS = 30
+
+# Keys and event lists of finished or abandoned jobs expire after this (Redis)
+JOB_KEY_TTL_SECONDS = 24 * 3600
+
+# Media is enqueued and read back in chunks of this size
+MEDIA_CHUNK_SIZE = 1024 * 1024
+
+# Progress message of a job put back in the queue after its worker was lost
+REQUEUED_MESSAGE = "Analysis worker lost - job requeued"
+
+
+class BrokerError(Exception):
+    """The broker could not be reached or answered with an error"""
+
+
+def file_chunks(path: str, chunk_size: int = MEDIA_CHUNK_SIZE) -> Iterator[bytes]:
+    """A file's content for enqueue(), read one chunk at a time"""
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            yield chunk
+
+
+class JobBroker(ABC):
+    """
+    Interface shared by every broker.
+    
+    job (enqueue/claim) is a JSON-serializable dict with at least job_id,
+    analysis_type and priority; media is the uploaded file as an iterable of
+    byte chunks, or None when the job names a file on shared storage.
+    worker_id is the claiming worker, whose heartbeats hold its leases.
+    """
+    def __init__(self, lease_seconds: Optional[float] = None, max_deliveries: Optional[int] = None):
+        self.lease_seconds = config.BROKER_LEASE_SECONDS if lease_seconds is None else lease_seconds
+        self.max_deliveries = config.BROKER_MAX_DELIVERIES if max_deliveries is None else max_deliveries
+    
+    @abstractmethod
+    def enqueue(self, job: dict, media: Optional[Iterable[bytes]]):
+        """Queue a job; it becomes claimable once all of its media is stored"""
+    
+    @abstractmethod
+    def claim(self, worker_id: str, analysis_types: Iterable[str], timeout: float) -> Optional[dict]:
+        """Lease the next job of one of analysis_types, waiting up to timeout seconds"""
+    
+    @abstractmethod
+    def read_media(self, job_id: str) -> Iterator[bytes]:
+        """A claimed job's media, chunk by chunk"""
+    
+    @abstractmethod
+    def publish(self, job_id: str, kind: str, payload=None):
+        """Append an event to a job's stream"""
+    
+    @abstractmethod
+    def next_events(self, job_id: str, timeout: float) -> List[Tuple[str, object]]:
+        """Consume a job's pending events, waiting up to timeout seconds for one"""
+    
+    @abstractmethod
+    def cancel(self, job_id: str):
+        """Drop a queued job (publishing its cancelled event) or flag a claimed one"""
+    
+    @abstractmethod
+    def is_cancelled(self, job_id: str) -> bool:
+        pass
+    
+    @abstractmethod
+    def finish(self, worker_id: str, job: dict):
+        """
+        Release a claimed job once its outcome is published: drops the job,
+        its media and its cancellation flag - unless the lease was lost and
+        the job already belongs to another worker.
+        """
+    
+    @abstractmethod
+    def heartbeat(self, worker_id: str, report: dict):
+        """Record that a worker is alive, with its model warmup report (this renews its leases)"""
+    
+    @abstractmethod
+    def workers(self) -> Dict[str, dict]:
+        """Workers seen within WORKER_STALE_SECONDS -> their last report"""
+    
+    def close(self):
+        pass
+    
+    def _accept(self, worker_id: str, job: dict, deliveries: int) -> bool:
+        """
+        Whether a job just claimed should run. One cancelled while its
+        worker was lost ends cancelled; one that already took
+        max_deliveries workers down fails rather than take the next.
+        """
+        job_id = job['job_id']
+        if self.is_cancelled(job_id):
+            self.publish(job_id, CANCELLED)
+        elif deliveries > self.max_deliveries:
+            self.publish(job_id, ERROR, {
+                'detail': f"Analysis worker lost {deliveries - 1} times on this job",
+                'status_code': 500,
+            })
+        else:
+            return True
+        self.finish(worker_id, job)
+        return False
+
+
+class MemoryBroker(JobBroker):
+    """In-process queue: its workers live and die with the API, so claims need no lease"""
+    def __init__(self, lease_seconds: Optional[float] = None, max_deliveries: Optional[int] = None):
+        super().__init__(lease_seconds, max_deliveries)
+        # priority -> queued jobs, oldest first
+        self._queues: Dict[float, deque] = {}
+        self._media: Dict[str, List[bytes]] = {}
+        self._events: Dict[str, deque] = {}
+        self._cancelled = set()
+        self._workers: Dict[str, Tuple[float, dict]] = {}
+        self._cond = threading.Condition()
+    
+    def enqueue(self, job: dict, media: Optional[Iterable[bytes]]):
+        chunks = list(media or ())
+        with self._cond:
+            self._media[job['job_id']] = chunks
+            self._queues.setdefault(job['priority'], deque()).append(job)
+            self._cond.notify_all()
+    
+    def claim(self, worker_id: str, analysis_types: Iterable[str], timeout: float) -> Optional[dict]:
+        analysis_types = set(analysis_types)
+        end = time.monotonic() + timeout
+        with self._cond:
+            while True:
+                for priority in sorted(self._queues, reverse=True):
+                    queue = self._queues[priority]
+                    for job in queue:
+                        if job['analysis_type'] in analysis_types:
+                            queue.remove(job)
+                            return job
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    return None
+                self._cond.wait(remaining)
+    
+    def read_media(self, job_id: str) -> Iterator[bytes]:
+        with self._cond:
+            chunks = list(self._media.get(job_id, ()))
+        return iter(chunks)
+    
+    def publish(self, job_id: str, kind: str, payload=None):
+        with self._cond:
+            self._events.setdefault(job_id, deque()).append((kind, payload))
+            self._cond.notify_all()
+    
+    def next_events(self, job_id: str, timeout: float) -> List[Tuple[str, object]]:
+        end = time.monotonic() + timeout
+        with self._cond:
+            while not self._events.get(job_id):
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self._cond.wait(remaining)
+            events = list(self._events.pop(job_id))
+        return events
+    
+    def cancel(self, job_id: str):
+        with self._cond:
+            for queue in self._queues.values():
+                for job in queue:
+                    if job['job_id'] == job_id:
+                        queue.remove(job)
+                        self._media.pop(job_id, None)
+                        self._events.setdefault(job_id, deque()).append((CANCELLED, None))
+                        self._cond.notify_all()
+                        return
+            self._cancelled.add(job_id)
+    
+    def is_cancelled(self, job_id: str) -> bool:
+        with self._cond:
+            return job_id in self._cancelled
+    
+    def finish(self, worker_id: str, job: dict):
+        with self._cond:
+            self._media.pop(job['job_id'], None)
+            self._cancelled.discard(job['job_id'])
+    
+    def heartbeat(self, worker_id: str, report: dict):
+        with self._cond:
+            self._workers[worker_id] = (time.time(), report)
+    
+    def workers(self) -> Dict[str, dict]:
+        cutoff = time.time() - WORKER_STALE_SECONDS
+        with self._cond:
+            return {worker_id: report for worker_id, (seen, report) in self._workers.items() if seen >= cutoff}
+
+
+class SQLiteBroker(JobBroker):
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        job_id TEXT NOT NULL UNIQUE,
+        analysis_type TEXT NOT NULL,
+        priority REAL NOT NULL,
+        job TEXT NOT NULL,
+        claimed_by TEXT,
+        claimed_at REAL,
+        deliveries INTEGER NOT NULL DEFAULT 0,
+        cancelled INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE INDEX IF NOT EXISTS idx_jobs_queue ON jobs (claimed_by, priority DESC, seq);
+    CREATE TABLE IF NOT EXISTS media (
+        job_id TEXT NOT NULL,
+        chunk INTEGER NOT NULL,
+        data BLOB NOT NULL,
+        PRIMARY KEY (job_id, chunk)
+    );
+    CREATE TABLE IF NOT EXISTS events (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        job_id TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        payload TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_events_job ON events (job_id, seq);
+    CREATE TABLE IF NOT EXISTS workers (
+        worker_id TEXT PRIMARY KEY,
+        report TEXT NOT NULL,
+        seen_at REAL NOT NULL
+    );
+    """
+    
+    # Columns added to jobs since the first schema (databases created before leases)
+    MIGRATIONS = (
+        ('claimed_at', 'REAL'),
+        ('deliveries', 'INTEGER NOT NULL DEFAULT 0'),
+    )
+    
+    # SQLite has no blocking reads - waiting callers poll at this interval
+    POLL_SECONDS = 0.1
+    
+    def __init__(self, path: str, lease_seconds: Optional[float] = None,
+                 max_deliveries: Optional[int] = None):
+        super().__init__(lease_seconds, max_deliveries)
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # One connection per thread: waiting callers poll concurrently
+        self._local = threading.local()
+        conn = self._conn()
+        conn.executescript(self.SCHEMA)
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(jobs)')}
+        for column, definition in self.MIGRATIONS:
+            if column not in columns:
+                conn.execute(f'ALTER TABLE jobs ADD COLUMN {column} {definition}')
+    
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+    
+    def enqueue(self, job: dict, media: Optional[Iterable[bytes]]):
+        job_id = job['job_id']
+        conn = self._conn()
+        try:
+            # One chunk per write, so workers are never locked out for a whole upload;
+            # the job row goes in last and makes it claimable
+            for index, chunk in enumerate(media or ()):
+                conn.execute('INSERT INTO media (job_id, chunk, data) VALUES (?, ?, ?)',
+                             (job_id, index, chunk))
+            conn.execute(
+                'INSERT INTO jobs (job_id, analysis_type, priority, job) VALUES (?, ?, ?, ?)',
+                (job_id, job['analysis_type'], job['priority'], json.dumps(job))
+            )
+        except BaseException:
+            conn.execute('DELETE FROM media WHERE job_id = ?', (job_id,))
+            raise
+    
+    def claim(self, worker_id: str, analysis_types: Iterable[str], timeout: float) -> Optional[dict]:
+        analysis_types = list(analysis_types)
+        placeholders = ', '.join('?' * len(analysis_types))
+        conn = self._conn()
+        end = time.monotonic() + timeout
+        while True:
+            # IMMEDIATE: take the write lock first, so two workers never claim the same row
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                requeued = self._requeue_lost_locked(conn)
+                row = conn.execute(
+                    f'SELECT seq, job, deliveries FROM jobs WHERE claimed_by IS NULL '
+                    f'AND analysis_type IN ({placeholders}) ORDER BY priority DESC, seq LIMIT 1',
+                    analysis_types
+                ).fetchone()
+                if row is not None:
+                    conn.execute(
+                        'UPDATE jobs SET claimed_by = ?, claimed_at = ?, deliveries = deliveries + 1 '
+                        'WHERE seq = ?',
+                        (worker_id, time.time(), row[0])
+                    )
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            
+            for job_id in requeued:
+                self.publish(job_id, PROGRESS, REQUEUED_MESSAGE)
+            if row is not None:
+                job = json.loads(row[1])
+                if self._accept(worker_id, job, row[2] + 1):
+                    return job
+                continue
+            if time.monotonic() >= end:
+                return None
+            time.sleep(self.POLL_SECONDS)
+    
+    def _requeue_lost_locked(self, conn: sqlite3.Connection) -> List[str]:
+        """
+        Release the claims of workers whose heartbeat is older than the
+        lease. The jobs keep their place (seq), ahead of newer ones.
+        """
+        cutoff = time.time() - self.lease_seconds
+        rows = conn.execute(
+            'SELECT seq, job_id FROM jobs WHERE claimed_by IS NOT NULL AND claimed_at < ? '
+            'AND claimed_by NOT IN (SELECT worker_id FROM workers WHERE seen_at >= ?)',
+            (cutoff, cutoff)
+        ).fetchall()
+        for seq, _ in rows:
+            conn.execute('UPDATE jobs SET claimed_by = NULL, claimed_at = NULL WHERE seq = ?', (seq,))
+        return [job_id for _, job_id in rows]
+    
+    def read_media(self, job_id: str) -> Iterator[bytes]:
+        conn = self._conn()
+        index = 0
+        while True:
+            row = conn.execute('SELECT data FROM media WHERE job_id = ? AND chunk = ?',
+                               (job_id, index)).fetchone()
+            if row is None:
+                return
+            yield row[0]
+            index += 1
+    
+    def publish(self, job_id: str, kind: str, payload=None):
+        self._conn().execute(
+            'INSERT INTO events (job_id, kind, payload) VALUES (?, ?, ?)',
+            (job_id, kind, fast_json.dumps_str(payload))
+        )
+    
+    def next_events(self, job_id: str, timeout: float) -> List[Tuple[str, object]]:
+        conn = self._conn()
+        end = time.monotonic() + timeout
+        while True:
+            rows = conn.execute(
+                'SELECT seq, kind, payload FROM events WHERE job_id = ? ORDER BY seq', (job_id,)
+            ).fetchall()
+            if rows:
+                conn.execute('DELETE FROM events WHERE job_id = ? AND seq <= ?', (job_id, rows[-1][0]))
+                return [(kind, json.loads(payload)) for _, kind, payload in rows]
+            if time.monotonic() >= end:
+                return []
+            time.sleep(self.POLL_SECONDS)
+    
+    def cancel(self, job_id: str):
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            dropped = conn.execute(
+                'DELETE FROM jobs WHERE job_id = ? AND claimed_by IS NULL', (job_id,)
+            ).rowcount
+            if dropped:
+                conn.execute('DELETE FROM media WHERE job_id = ?', (job_id,))
+                conn.execute('INSERT INTO events (job_id, kind, payload) VALUES (?, ?, ?)',
+                             (job_id, CANCELLED, 'null'))
+            else:
+                conn.execute('UPDATE jobs SET cancelled = 1 WHERE job_id = ?', (job_id,))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+    
+    def is_cancelled(self, job_id: str) -> bool:
+        row = self._conn().execute('SELECT cancelled FROM jobs WHERE job_id = ?', (job_id,)).fetchone()
+        return bool(row and row[0])
+    
+    def finish(self, worker_id: str, job: dict):
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            released = conn.execute(
+                'DELETE FROM jobs WHERE job_id = ? AND claimed_by = ?', (job['job_id'], worker_id)
+            ).rowcount
+            if released:
+                conn.execute('DELETE FROM media WHERE job_id = ?', (job['job_id'],))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+    
+    def heartbeat(self, worker_id: str, report: dict):
+        self._conn().execute(
+            'INSERT OR REPLACE INTO workers (worker_id, report, seen_at) VALUES (?, ?, ?)',
+            (worker_id, json.dumps(report), time.time())
+        )
+    
+    def workers(self) -> Dict[str, dict]:
+        rows = self._conn().execute(
+            'SELECT worker_id, report FROM workers WHERE seen_at >= ?',
+            (time.time() - WORKER_STALE_SECONDS,)
+        ).fetchall()
+        return {worker_id: json.loads(report) for worker_id, report in rows}
+    
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+class RespConnection:
+    """Minimal Redis protocol (RESP2) client - enough for the broker's commands"""
+    def __init__(self, host: str, port: int, db: int = 0, password: Optional[str] = None,
+                 username: Optional[str] = None, timeout: float = 10.0):
+        try:
+            self._sock = socket.create_connection((host, port), timeout=timeout)
+        except OSError as e:
+            raise BrokerError(f"Cannot connect to Redis at {host}:{port}: {e}")
+        self._sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._file = self._sock.makefile('rb')
+        self.timeout = timeout
+        if password:
+            self.execute('AUTH', *([username] if username else []), password)
+        if db:
+            self.execute('SELECT', db)
+    
+    def execute(self, *args, block: float = 0.0):
+        """Send one command and return its reply; block extends the socket timeout for blocking commands"""
+        parts = [b'*%d\r\n' % len(args)]
+        for arg in args:
+            if isinstance(arg, str):
+                arg = arg.encode('utf-8')
+            elif not isinstance(arg, (bytes, bytearray)):
+                arg = str(arg).encode('utf-8')
+            parts.append(b'$%d\r\n' % len(arg))
+            parts.append(arg)
+            parts.append(b'\r\n')
+        
+        self._sock.settimeout(self.timeout + block)
+        try:
+            self._sock.sendall(b''.join(parts))
+            return self._read_reply()
+        except OSError as e:
+            self.close()
+            raise BrokerError(f"Redis connection lost: {e}")
+    
+    def _read_reply(self):
+        line = self._file.readline()
+        if not line:
+            raise OSError("connection closed")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode('utf-8')
+        if kind == b'-':
+            raise BrokerError(rest.decode('utf-8'))
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            length = int(rest)
+            if length < 0:
+                return None
+            data = self._file.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            count = int(rest)
+            if count < 0:
+                return None
+            return [self._read_reply() for _ in range(count)]
+        raise BrokerError(f"Unexpected Redis reply: {line!r}")
+    
+    def close(self):
+        try:
+            self._file.close()
+            self._sock.close()
+        except OSError:
+            pass
+
+
+class RedisBroker(JobBroker):
+    """
+    Keys (prefix veritas:):
+        queue:<analysis_type>                  queued job IDs (LPUSH, claimed from the right)
+        processing:<worker>:<analysis_type>    job IDs leased to a worker (LMOVE from the queue)
+        job:<id>, media:<id>                   the job and its media chunks until finished
+        deliveries:<id>                        how often the job has been claimed
+        events:<id>                            list of JSON events (RPUSH / BLPOP)
+        cancel:<id>                            set while a claimed job should stop
+        workers                                hash of worker ID -> last heartbeat
+    """
+    PREFIX = 'veritas:'
+    
+    # With several queues, a claim blocks on the most important one for at
+    # most this long before checking the others again
+    CLAIM_BLOCK_SECONDS = 0.5
+    
+    def __init__(self, url: str, priorities: Optional[Dict[str, float]] = None,
+                 lease_seconds: Optional[float] = None, max_deliveries: Optional[int] = None):
+        super().__init__(lease_seconds, max_deliveries)
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.username = unquote(parsed.username) if parsed.username else None
+        self.password = unquote(parsed.password) if parsed.password else None
+        # analysis_type -> priority: queues are checked in this order
+        self.priorities = priorities or {}
+        # Blocking commands hold their connection - one per thread
+        self._local = threading.local()
+        self._next_reclaim = 0.0
+    
+    def _execute(self, *args, block: float = 0.0):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = RespConnection(self.host, self.port, self.db,
+                                                     self.password, self.username)
+        try:
+            return conn.execute(*args, block=block)
+        except BrokerError:
+            if conn._sock.fileno() == -1:
+                self._local.conn = None
+            raise
+    
+    def _key(self, *parts) -> str:
+        return self.PREFIX + ':'.join(parts)
+    
+    def enqueue(self, job: dict, media: Optional[Iterable[bytes]]):
+        job_id = job['job_id']
+        media_key = self._key('media', job_id)
+        try:
+            for index, chunk in enumerate(media or ()):
+                self._execute('RPUSH', media_key, chunk)
+                if index == 0:
+                    self._execute('EXPIRE', media_key, JOB_KEY_TTL_SECONDS)
+            self._execute('SET', self._key('job', job_id), json.dumps(job), 'EX', JOB_KEY_TTL_SECONDS)
+        except BaseException:
+            try:
+                self._execute('DEL', media_key)
+            except BrokerError:
+                pass
+            raise
+        self._execute('LPUSH', self._key('queue', job['analysis_type']), job_id)
+    
+    def claim(self, worker_id: str, analysis_types: Iterable[str], timeout: float) -> Optional[dict]:
+        analysis_types = sorted(analysis_types, key=lambda t: -self.priorities.get(t, 0))
+        end = time.monotonic() + timeout
+        while True:
+            self._reclaim_lost()
+            claimed = None
+            for analysis_type in analysis_types:
+                job_id = self._execute('LMOVE', self._key('queue', analysis_type),
+                                       self._key('processing', worker_id, analysis_type), 'RIGHT', 'LEFT')
+                if job_id is not None:
+                    claimed = job_id, analysis_type
+                    break
+            
+            if claimed is None:
+                remaining = end - time.monotonic()
+                if remaining <= 0:
+                    return None
+                analysis_type = analysis_types[0]
+                wait = remaining if len(analysis_types) == 1 else min(remaining, self.CLAIM_BLOCK_SECONDS)
+                # A zero timeout would block forever
+                wait = max(0.01, round(wait, 2))
+                job_id = self._execute('BLMOVE', self._key('queue', analysis_type),
+                                       self._key('processing', worker_id, analysis_type),
+                                       'RIGHT', 'LEFT', wait, block=wait)
+                if job_id is None:
+                    continue
+                claimed = job_id, analysis_type
+            
+            job_id, analysis_type = claimed[0].decode('utf-8'), claimed[1]
+            job = self._execute('GET', self._key('job', job_id))
+            if job is None:
+                # Cancelled (or expired) while queued - take the next one
+                self._execute('LREM', self._key('processing', worker_id, analysis_type), 0, job_id)
+                continue
+            deliveries = self._execute('INCR', self._key('deliveries', job_id))
+            self._execute('EXPIRE', self._key('deliveries', job_id), JOB_KEY_TTL_SECONDS)
+            job = json.loads(job)
+            if self._accept(worker_id, job, deliveries):
+                return job
+    
+    def _reclaim_lost(self):
+        """
+        Move the jobs leased to workers whose heartbeat is older than the
+        lease back to the claiming end of their queues. Checked at most
+        twice per lease period by each broker instance.
+        """
+        now = time.monotonic()
+        if now < self._next_reclaim:
+            return
+        self._next_reclaim = now + min(5.0, self.lease_seconds / 2)
+        
+        reply = self._execute('HGETALL', self._key('workers')) or []
+        cutoff = time.time() - self.lease_seconds
+        for field, value in zip(reply[::2], reply[1::2]):
+            entry = json.loads(value)
+            if entry['seen_at'] >= cutoff:
+                continue
+            worker_id = field.decode('utf-8')
+            analysis_types = entry['report'].get('analysis_types') or list(self.priorities)
+            for analysis_type in analysis_types:
+                while True:
+                    job_id = self._execute('LMOVE', self._key('processing', worker_id, analysis_type),
+                                           self._key('queue', analysis_type), 'LEFT', 'RIGHT')
+                    if job_id is None:
+                        break
+                    self.publish(job_id.decode('utf-8'), PROGRESS, REQUEUED_MESSAGE)
+            self._execute('HDEL', self._key('workers'), worker_id)
+    
+    def read_media(self, job_id: str) -> Iterator[bytes]:
+        key = self._key('media', job_id)
+        index = 0
+        while True:
+            chunk = self._execute('LINDEX', key, index)
+            if chunk is None:
+                return
+            yield chunk
+            index += 1
+    
+    def publish(self, job_id: str, kind: str, payload=None):
+        key = self._key('events', job_id)
+        self._execute('RPUSH', key, fast_json.dumps_str([kind, payload]))
+        self._execute('EXPIRE', key, JOB_KEY_TTL_SECONDS)
+    
+    def next_events(self, job_id: str, timeout: float) -> List[Tuple[str, object]]:
+        key = self._key('events', job_id)
+        wait = max(1, math.ceil(timeout))
+        reply = self._execute('BLPOP', key, wait, block=wait)
+        if reply is None:
+            return []
+        events = [json.loads(reply[1])]
+        # Drain whatever else is already there
+        rest = self._execute('LRANGE', key, 0, -1)
+        if rest:
+            self._execute('LTRIM', key, len(rest), -1)
+            events.extend(json.loads(item) for item in rest)
+        return [tuple(event) for event in events]
+    
+    def cancel(self, job_id: str):
+        job = self._execute('GET', self._key('job', job_id))
+        if job is not None:
+            analysis_type = json.loads(job)['analysis_type']
+            if self._execute('LREM', self._key('queue', analysis_type), 0, job_id):
+                self._execute('DEL', self._key('job', job_id), self._key('media', job_id),
+                              self._key('deliveries', job_id))
+                self.publish(job_id, CANCELLED)
+                return
+        self._execute('SET', self._key('cancel', job_id), 1, 'EX', JOB_KEY_TTL_SECONDS)
+    
+    def is_cancelled(self, job_id: str) -> bool:
+        return bool(self._execute('EXISTS', self._key('cancel', job_id)))
+    
+    def finish(self, worker_id: str, job: dict):
+        job_id = job['job_id']
+        if self._execute('LREM', self._key('processing', worker_id, job['analysis_type']), 0, job_id):
+            self._execute('DEL', self._key('job', job_id), self._key('media', job_id),
+                          self._key('deliveries', job_id), self._key('cancel', job_id))
+    
+    def heartbeat(self, worker_id: str, report: dict):
+        self._execute('HSET', self._key('workers'), worker_id,
+                      json.dumps({'seen_at': time.time(), 'report': report}))
+    
+    def workers(self) -> Dict[str, dict]:
+        reply = self._execute('HGETALL', self._key('workers')) or []
+        cutoff = time.time() - WORKER_STALE_SECONDS
+        workers = {}
+        for field, value in zip(reply[::2], reply[1::2]):
+            entry = json.loads(value)
+            if entry['seen_at'] >= cutoff:
+                workers[field.decode('utf-8')] = entry['report']
+        return workers
+    
+    def close(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+def create_broker(url: str, priorities: Optional[Dict[str, float]] = None) -> JobBroker:
+    """Broker for a JOB_BROKER_URL (memory://, sqlite:///path, redis://host:port/db)"""
+    scheme = urlparse(url).scheme
+    if scheme == 'memory':
+        return MemoryBroker()
+    if scheme == 'sqlite':
+        # sqlite:///relative.db or sqlite:////absolute/path.db
+        return SQLiteBroker(url[len('sqlite:///'):])
+    if scheme == 'redis':
+        return RedisBroker(url, priorities)
+    raise ValueError(f"Unsupported JOB_BROKER_URL {url!r} (use memory://, sqlite:///path or redis://host:port/db)")
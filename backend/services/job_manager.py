@@ -0,0 +1,477 @@
+"""
+Job manager - bounded in-process queue in front of the analysis executor.
+
+Every analysis (synchronous endpoint or /jobs submission) becomes a Job.
+At most ANALYSIS_WORKERS jobs run at once; up to JOB_QUEUE_SIZE more may
+wait. Beyond that, submit() raises QueueFullError with a Retry-After hint
+so the API can answer 429 instead of letting requests pile up.
+
+Waiting jobs are queued per lane (config.JOB_LANES - image quick, image
+comprehensive, video quick, video comprehensive). Each lane has its own
+concurrency limit, so long video analyses can never hold every worker, and
+a priority: a free worker takes the waiting job with the highest priority
+plus age / JOB_AGING_SECONDS. Cheap requests jump the queue, and the aging
+term keeps heavy ones from starving behind a steady stream of them.
+
+With ANALYSIS_WORKER_MODE=process the tasks themselves run in a pool of
+worker processes (services.worker_pool), and with ANALYSIS_WORKER_MODE=broker
+on worker nodes behind a job broker (services.remote_workers); the executor
+threads only wait on them, so queueing and coalescing work the same in
+every mode.
+
+Identical uploads are coalesced (single-flight): while a job for the same
+dedup key is queued or running, later submissions become followers that
+share its result and progress stream instead of taking a worker slot.
+
+Jobs can be cancelled (DELETE /jobs/{id}, or the client of a synchronous
+request disconnecting). A coalesced analysis is reference-counted: it is
+only stopped once its own requester and every follower have gone, and it
+stops at the detectors' next checkpoint (utils.cancellation).
+"""
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, Optional
+
+import config
+from models.progress_tracker import ProgressTracker, run_with_progress_tracker
+from services.worker_pool import WorkerPool
+from utils.cancellation import AnalysisCancelled, CancellationToken, use_cancellation_token
+from utils.metrics import Counter, Gauge, Histogram
+from utils.tracing import Span, finish_trace, span, use_span
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+
+JOBS_TOTAL = Counter(
+    'veritas_jobs_total',
+    'Analysis jobs by outcome (completed, failed, cancelled, cached, coalesced, rejected)',
+    ['analysis_type', 'outcome']
+)
+JOB_DURATION = Histogram(
+    'veritas_job_duration_seconds',
+    'Time from a job starting on a worker until it finished',
+    ['analysis_type']
+)
+JOB_QUEUE_WAIT = Histogram(
+    'veritas_job_queue_wait_seconds',
+    'Time a job waited in the queue before a worker picked it up',
+    ['analysis_type']
+)
+
+
+class QueueFullError(Exception):
+    """Raised when the analysis queue is full"""
+    def __init__(self, retry_after: int):
+        super().__init__(f"Analysis queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class Job:
+    def __init__(self, job_id: str, analysis_type: str, tracker: ProgressTracker,
+                 lane: Optional[str] = None):
+        self.job_id = job_id
+        self.analysis_type = analysis_type
+        self.lane = lane or analysis_type
+        self.tracker = tracker
+        self.status = QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self.error_status: Optional[int] = None
+        self.future: Future = Future()
+        # Set on followers of a coalesced (single-flight) analysis
+        self.leader: Optional['Job'] = None
+        # Root span when the request asked for ?trace=1
+        self.trace: Optional[Span] = None
+        self.dedup_key: Optional[str] = None
+        self.token = CancellationToken()
+        # Requesters still waiting on this analysis: its own plus each follower's
+        self.interested = 1
+        self.cancel_requested = False
+    
+    def to_dict(self) -> dict:
+        """Status view returned by GET /jobs/{id}"""
+        messages = self.tracker.get_messages()
+        status = self.status
+        started_at = self.started_at
+        if self.leader is not None and self.finished_at is None:
+            status = self.leader.status
+            started_at = self.leader.started_at
+        
+        data = {
+            'job_id': self.job_id,
+            'analysis_type': self.analysis_type,
+            'lane': self.lane,
+            'status': status,
+            'created_at': self.created_at,
+            'started_at': started_at,
+            'finished_at': self.finished_at,
+            'progress': messages[-1] if messages else None,
+        }
+        if self.leader is not None:
+            data['coalesced_with'] = self.leader.job_id
+        if self.status == COMPLETED:
+            data['result'] = self.result
+        elif self.status in (FAILED, CANCELLED):
+            data['error'] = self.error
+        return data
+
+
+class Lane:
+    """Waiting jobs of one kind, with their own concurrency limit and priority"""
+    def __init__(self, name: str, max_concurrency: int, priority: float = 0.0):
+        self.name = name
+        self.max_concurrency = max_concurrency
+        self.priority = priority
+        # (job, task, args), oldest first
+        self.waiting: deque = deque()
+        self.running = 0
+    
+    def stats(self) -> dict:
+        return {
+            'queued': len(self.waiting),
+            'running': self.running,
+            'max_concurrency': self.max_concurrency,
+            'priority': self.priority,
+        }
+
+
+class JobManager:
+    def __init__(self, max_workers: int, max_queue: int,
+                 worker_pool: Optional[WorkerPool] = None,
+                 lanes: Optional[Dict[str, dict]] = None,
+                 aging_seconds: float = 10.0):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.worker_pool = worker_pool
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analysis')
+        self.lanes: Dict[str, Lane] = {
+            name: Lane(name, min(max_workers, settings['max_concurrency']), settings['priority'])
+            for name, settings in (lanes or {}).items()
+        }
+        # Waiting time worth one priority level
+        self.aging_seconds = aging_seconds
+        self.jobs: Dict[str, Job] = {}
+        # dedup key -> leader job, while queued or running
+        self._inflight: Dict[str, Job] = {}
+        self.coalesced = 0
+        self.cancelled = 0
+        self._queued = 0
+        self._running = 0
+        # Moving average of job durations, used for the Retry-After hint
+        self._avg_duration = 30.0
+        self._lock = threading.Lock()
+    
+    def submit(self, job_id: str, analysis_type: str, tracker: ProgressTracker,
+               task: Callable, *args, dedup_key: Optional[str] = None,
+               trace: Optional[Span] = None, lane: Optional[str] = None) -> Job:
+        """
+        Queue a task for execution in a lane (analysis_type's own by default;
+        lanes not in JOB_LANES get the lowest priority and no extra limit).
+        
+        If a job with the same dedup_key is already queued or running, the new
+        job follows it instead (job.leader is set) and the task is not run -
+        the caller should discard its own copy of the input.
+        
+        Raises:
+            QueueFullError: if JOB_QUEUE_SIZE jobs are already waiting
+        """
+        job = Job(job_id, analysis_type, tracker, lane)
+        job.trace = trace
+        
+        with self._lock:
+            self._prune_locked()
+            
+            leader = self._inflight.get(dedup_key) if dedup_key else None
+            # A cancelled leader is only winding down - start a fresh run instead
+            if leader is not None and leader.token.cancelled:
+                leader = None
+            if leader is not None:
+                job.leader = leader
+                leader.interested += 1
+                self.coalesced += 1
+                self.jobs[job_id] = job
+            else:
+                if self._queued >= self.max_queue:
+                    JOBS_TOTAL.inc(analysis_type=analysis_type, outcome='rejected')
+                    raise QueueFullError(self._retry_after_locked())
+                self._queued += 1
+                self.jobs[job_id] = job
+                if dedup_key:
+                    job.dedup_key = dedup_key
+                    self._inflight[dedup_key] = job
+                self._lane_locked(job.lane).waiting.append((job, task, args))
+                self._dispatch_locked()
+        
+        if leader is not None:
+            JOBS_TOTAL.inc(analysis_type=analysis_type, outcome='coalesced')
+            tracker.follow(leader.tracker)
+            leader.future.add_done_callback(lambda future: self._finish_follower(job, future))
+        
+        return job
+    
+    def cancel(self, job_id: str, reason: str = "cancelled") -> Optional[Job]:
+        """
+        Withdraw a job's requester. A follower is released right away; the
+        analysis itself is cancelled once nobody is waiting on it any more.
+        Returns the job, or None if it is unknown.
+        """
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is None or job.finished_at is not None or job.cancel_requested:
+                return job
+            job.cancel_requested = True
+            
+            leader = job.leader or job
+            leader.interested -= 1
+            stop = leader.interested <= 0 and leader.finished_at is None
+            # Stopping: identical uploads from now on start a fresh run instead of following it
+            if stop and leader.dedup_key and self._inflight.get(leader.dedup_key) is leader:
+                del self._inflight[leader.dedup_key]
+            # Never started: free its queue slot now instead of when a worker reaches it
+            dequeue = stop and leader.status == QUEUED
+            if dequeue:
+                self._queued -= 1
+                leader.status = CANCELLED
+                lane = self.lanes[leader.lane]
+                lane.waiting = deque(entry for entry in lane.waiting if entry[0] is not leader)
+        
+        if job.leader is not None:
+            self._finish_cancelled(job, reason)
+        if stop:
+            print(f"Cancelling job {leader.job_id}: {reason}")
+            leader.token.cancel(reason)
+            if dequeue:
+                self._finish_cancelled(leader, reason)
+        return job
+    
+    def complete(self, job_id: str, analysis_type: str, tracker: ProgressTracker,
+                 result: dict, trace: Optional[Span] = None) -> Job:
+        """Register a job that is already finished (e.g. answered from cache)"""
+        job = Job(job_id, analysis_type, tracker)
+        job.started_at = job.finished_at = time.time()
+        result['job_id'] = job_id
+        if trace is not None:
+            result['trace'] = finish_trace(trace, job_id)
+        job.result = result
+        job.status = COMPLETED
+        job.future.set_result(result)
+        tracker.finish()
+        JOBS_TOTAL.inc(analysis_type=analysis_type, outcome='cached')
+        
+        with self._lock:
+            self._prune_locked()
+            self.jobs[job_id] = job
+        
+        return job
+    
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self.jobs.get(job_id)
+    
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                'mode': self.worker_pool.mode if self.worker_pool is not None else 'thread',
+                'queued': self._queued,
+                'running': self._running,
+                'max_workers': self.max_workers,
+                'max_queue': self.max_queue,
+                'inflight': len(self._inflight),
+                'coalesced': self.coalesced,
+                'cancelled': self.cancelled,
+                'avg_job_seconds': round(self._avg_duration, 2),
+                'lanes': {name: lane.stats() for name, lane in self.lanes.items()},
+            }
+    
+    def _lane_locked(self, name: str) -> Lane:
+        lane = self.lanes.get(name)
+        if lane is None:
+            lane = self.lanes[name] = Lane(name, self.max_workers)
+        return lane
+    
+    def _dispatch_locked(self):
+        """Start waiting jobs while workers are free, best (priority + age) first"""
+        while self._running < self.max_workers:
+            now = time.time()
+            best, best_score = None, None
+            for lane in self.lanes.values():
+                if not lane.waiting or lane.running >= lane.max_concurrency:
+                    continue
+                score = lane.priority + (now - lane.waiting[0][0].created_at) / self.aging_seconds
+                if best is None or score > best_score:
+                    best, best_score = lane, score
+            if best is None:
+                return
+            
+            job, task, args = best.waiting.popleft()
+            best.running += 1
+            self._queued -= 1
+            self._running += 1
+            job.status = RUNNING
+            self.executor.submit(self._run, job, task, args)
+    
+    def _run(self, job: Job, task: Callable, args: tuple):
+        job.started_at = time.time()
+        JOB_QUEUE_WAIT.observe(job.started_at - job.created_at, analysis_type=job.analysis_type)
+        
+        try:
+            with use_span(job.trace), span('analysis', analysis_type=job.analysis_type):
+                if self.worker_pool is not None:
+                    result = self.worker_pool.run(job.job_id, job.analysis_type, args, job.token)
+                else:
+                    with use_cancellation_token(job.token):
+                        result = run_with_progress_tracker(job.tracker, task, *args)
+            result['job_id'] = job.job_id
+            if job.trace is not None:
+                result['trace'] = finish_trace(job.trace, job.job_id)
+            job.result = result
+            job.status = COMPLETED
+            job.future.set_result(result)
+        except AnalysisCancelled as e:
+            job.error = e.detail
+            job.error_status = e.status_code
+            job.status = CANCELLED
+            job.future.set_exception(e)
+            job.tracker.update("Analysis cancelled")
+        except Exception as e:
+            job.error = getattr(e, 'detail', str(e))
+            job.error_status = getattr(e, 'status_code', 500)
+            job.status = FAILED
+            job.future.set_exception(e)
+        finally:
+            job.finished_at = time.time()
+            job.tracker.finish()
+            with self._lock:
+                if job.dedup_key and self._inflight.get(job.dedup_key) is job:
+                    del self._inflight[job.dedup_key]
+                if job.status == CANCELLED:
+                    self.cancelled += 1
+                self._running -= 1
+                self.lanes[job.lane].running -= 1
+                duration = job.finished_at - job.started_at
+                self._avg_duration = 0.8 * self._avg_duration + 0.2 * duration
+                self._dispatch_locked()
+            JOB_DURATION.observe(duration, analysis_type=job.analysis_type)
+            JOBS_TOTAL.inc(analysis_type=job.analysis_type, outcome=job.status)
+    
+    def _finish_follower(self, job: Job, leader_future: Future):
+        """Copy the leader's outcome to a coalesced follower"""
+        if job.future.done():
+            # Cancelled before the leader finished
+            return
+        if isinstance(leader_future.exception(), AnalysisCancelled):
+            # The shared analysis stopped without this follower asking (e.g. on its
+            # worker node): it ends cancelled, like a job cancelled directly
+            self._finish_cancelled(job, f"the analysis shared with job {job.leader.job_id} was cancelled")
+            return
+        job.started_at = job.leader.started_at
+        try:
+            result = dict(leader_future.result())
+            result.pop('trace', None)
+            result['job_id'] = job.job_id
+            result['coalesced_with'] = job.leader.job_id
+            if job.trace is not None:
+                job.trace.attrs['coalesced_with'] = job.leader.job_id
+                result['trace'] = finish_trace(job.trace, job.job_id)
+            job.result = result
+            job.status = COMPLETED
+            job.future.set_result(result)
+        except Exception as e:
+            job.error = job.leader.error
+            job.error_status = job.leader.error_status
+            job.status = FAILED
+            job.future.set_exception(e)
+        finally:
+            job.finished_at = time.time()
+            job.tracker.finish()
+    
+    def _finish_cancelled(self, job: Job, reason: str):
+        """Settle a job that will never run (or stopped waiting on its leader)"""
+        error = AnalysisCancelled(f"Analysis cancelled ({reason})")
+        job.error = error.detail
+        job.error_status = error.status_code
+        job.status = CANCELLED
+        job.finished_at = time.time()
+        if not job.future.done():
+            job.future.set_exception(error)
+        job.tracker.update("Analysis cancelled")
+        job.tracker.finish()
+        with self._lock:
+            self.cancelled += 1
+        JOBS_TOTAL.inc(analysis_type=job.analysis_type, outcome=CANCELLED)
+    
+    def _retry_after_locked(self) -> int:
+        """Rough time until a queue slot frees up"""
+        waiting = self._queued + 1
+        return max(1, math.ceil(self._avg_duration * waiting / self.max_workers))
+    
+    def _prune_locked(self):
+        """Forget finished jobs older than JOB_RESULT_TTL_SECONDS"""
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self.jobs.items()
+            if job.finished_at is not None and now - job.finished_at > config.JOB_RESULT_TTL_SECONDS
+        ]
+        for job_id in expired:
+            del self.jobs[job_id]
+
+
+_job_manager = None
+_job_manager_lock = threading.Lock()
+
+def get_job_manager() -> JobManager:
+    global _job_manager
+    with _job_manager_lock:
+        if _job_manager is None:
+            worker_pool = None
+            if config.ANALYSIS_WORKER_MODE == 'process':
+                worker_pool = WorkerPool(config.ANALYSIS_WORKERS)
+            elif config.ANALYSIS_WORKER_MODE == 'broker':
+                from services.remote_workers import create_remote_worker_pool
+                worker_pool = create_remote_worker_pool()
+            _job_manager = JobManager(
+                max_workers=config.ANALYSIS_WORKERS,
+                max_queue=config.JOB_QUEUE_SIZE,
+                worker_pool=worker_pool,
+                lanes=config.JOB_LANES,
+                aging_seconds=config.JOB_AGING_SECONDS
+            )
+        return _job_manager
+
+
+def _collect_stat(key: str):
+    """Scrape-time value from the job manager (nothing before it exists)"""
+    def collect():
+        if _job_manager is None:
+            return []
+        return [({}, _job_manager.stats()[key])]
+    return collect
+
+
+Gauge('veritas_queue_depth', 'Jobs waiting for an analysis worker', collect=_collect_stat('queued'))
+Gauge('veritas_workers_busy', 'Analysis workers currently running a job', collect=_collect_stat('running'))
+Gauge('veritas_workers_max', 'Configured analysis workers', collect=_collect_stat('max_workers'))
+Gauge('veritas_jobs_inflight', 'Distinct analyses queued or running (coalescing keys)', collect=_collect_stat('inflight'))
+
+
+def _collect_lane_stat(key: str):
+    def collect():
+        if _job_manager is None:
+            return []
+        return [({'lane': name}, lane[key]) for name, lane in _job_manager.stats()['lanes'].items()]
+    return collect
+
+
+Gauge('veritas_lane_queue_depth', 'Jobs waiting per scheduling lane', ['lane'], collect=_collect_lane_stat('queued'))
+Gauge('veritas_lane_workers_busy', 'Jobs running per scheduling lane', ['lane'], collect=_collect_lane_stat('running'))
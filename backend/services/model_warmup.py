@@ -0,0 +1,300 @@
+"""
+Background model warmup and readiness.
+
+At startup every model is loaded on its own thread and then run once on a
+blank input, so weight loading, lazy kernel initialization and allocator
+growth all happen before the first request instead of during it. Requests
+that arrive early simply wait on the model getters' locks.
+
+GET /ready reports each model's state plus load and warm-up times, and
+answers 503 until the node is warm, so load balancers can hold traffic back.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+import config
+
+# Model states
+PENDING = 'pending'
+LOADING = 'loading'
+WARMING = 'warming'
+READY = 'ready'
+FAILED = 'failed'
+
+
+def _blank_image(size: int = 224):
+    from PIL import Image
+    return Image.new('RGB', (size, size), (128, 128, 128))
+
+
+def _load_ensemble():
+    from models.ensemble_detector import get_ensemble_detector
+    return get_ensemble_detector()
+
+
+def _warm_ensemble(detector):
+    detector.predict_ensemble(_blank_image(), silent=True)
+
+
+def _load_face_analyzer():
+    from models.face_analyzer import get_face_analyzer
+    return get_face_analyzer()
+
+
+def _warm_face_analyzer(analyzer):
+    analyzer.analyze_face(_blank_image())
+
+
+def _load_video_face_landmarker():
+    from models.face_analyzer import get_video_face_landmarker
+    return get_video_face_landmarker()
+
+
+def _warm_video_face_landmarker(landmarker):
+    import mediapipe as mp
+    import numpy as np
+    landmarker.detect(mp.Image(image_format=mp.ImageFormat.SRGB, data=np.zeros((224, 224, 3), dtype=np.uint8)))
+
+
+def _load_facenet():
+    from models.video.temporal_analyzer import get_facenet_models
+    mtcnn, resnet, device = get_facenet_models()
+    if resnet is None:
+        raise RuntimeError("FaceNet models unavailable")
+    return mtcnn, resnet, device
+
+
+def _warm_facenet(models):
+    import torch
+    mtcnn, resnet, device = models
+    mtcnn(_blank_image(160))
+    with torch.no_grad():
+        resnet(torch.zeros(1, 3, 160, 160, device=device))
+
+
+def _load_videomae():
+    from models.video.video_3d_model import get_videomae_model
+    model, processor, device = get_videomae_model()
+    if model is None:
+        raise RuntimeError("VideoMAE model unavailable")
+    return model, processor, device
+
+
+def _warm_videomae(models):
+    import numpy as np
+    import torch
+    model, processor, device = models
+    clip = [np.zeros((224, 224, 3), dtype=np.uint8)] * 16
+    inputs = processor(clip, return_tensors="pt")
+    inputs = {k: v.to(device) for k, v in inputs.items()}
+    with torch.no_grad():
+        model(**inputs)
+
+
+def _load_midas():
+    from models.video.physics_checker import get_midas_model
+    model, transform, device = get_midas_model()
+    if model is None:
+        raise RuntimeError("MiDaS model unavailable")
+    return model, transform, device
+
+
+def _warm_midas(models):
+    import numpy as np
+    import torch
+    model, transform, device = models
+    with torch.no_grad():
+        model(transform(np.zeros((256, 256, 3), dtype=np.uint8)).to(device))
+
+
+class ModelSpec:
+    def __init__(self, name: str, load: Callable, warm: Callable,
+                 required: bool = False, video: bool = False,
+                 enabled: Callable[[], bool] = lambda: True):
+        self.name = name
+        self.load = load
+        self.warm = warm
+        # A failed required model keeps the node unready; others only degrade a layer
+        self.required = required
+        self.video = video
+        self.enabled = enabled
+
+
+MODEL_SPECS: List[ModelSpec] = [
+    # Also serves quick scans, so it is loaded even with the ensemble layer disabled
+    ModelSpec('ensemble', _load_ensemble, _warm_ensemble, required=True),
+    ModelSpec('face_analyzer', _load_face_analyzer, _warm_face_analyzer,
+              enabled=lambda: config.FACE_ANALYSIS_ENABLED),
+    ModelSpec('video_face_landmarker', _load_video_face_landmarker, _warm_video_face_landmarker, video=True),
+    ModelSpec('facenet', _load_facenet, _warm_facenet, video=True),
+    ModelSpec('videomae', _load_videomae, _warm_videomae, video=True),
+    ModelSpec('midas', _load_midas, _warm_midas, video=True),
+]
+
+
+class ModelStatus:
+    def __init__(self, name: str, required: bool):
+        self.name = name
+        self.required = required
+        self.state = PENDING
+        self.load_seconds: Optional[float] = None
+        self.warmup_ms: Optional[float] = None
+        self.error: Optional[str] = None
+    
+    def to_dict(self) -> dict:
+        data = {
+            'state': self.state,
+            'required': self.required,
+            'load_seconds': self.load_seconds,
+            'warmup_ms': self.warmup_ms,
+        }
+        if self.error is not None:
+            data['error'] = self.error
+        return data
+
+
+class ModelWarmup:
+    """Loads and warms a set of models in parallel, tracking each one's state"""
+    def __init__(self, include_video: bool = True):
+        self.specs = [
+            spec for spec in MODEL_SPECS
+            if spec.enabled() and (include_video or not spec.video)
+        ]
+        self.statuses: Dict[str, ModelStatus] = {
+            spec.name: ModelStatus(spec.name, spec.required) for spec in self.specs
+        }
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+    
+    def start(self) -> 'ModelWarmup':
+        """Warm every model in background threads and return immediately"""
+        self.started_at = time.time()
+        if not self.specs:
+            self._finish()
+            return self
+        
+        executor = ThreadPoolExecutor(max_workers=len(self.specs), thread_name_prefix='warmup')
+        remaining = [len(self.specs)]
+        
+        def run(spec):
+            try:
+                self._warm(spec)
+            finally:
+                with self._lock:
+                    remaining[0] -= 1
+                    last = remaining[0] == 0
+                if last:
+                    self._finish()
+        
+        for spec in self.specs:
+            executor.submit(run, spec)
+        executor.shutdown(wait=False)
+        return self
+    
+    def run(self) -> 'ModelWarmup':
+        """Warm every model (in parallel) and wait for all of them"""
+        self.start()
+        self.wait()
+        return self
+    
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+    
+    def is_ready(self) -> bool:
+        """Every model finished and no required model failed"""
+        with self._lock:
+            return all(
+                status.state == READY or (status.state == FAILED and not status.required)
+                for status in self.statuses.values()
+            )
+    
+    def report(self) -> dict:
+        with self._lock:
+            models = {name: status.to_dict() for name, status in self.statuses.items()}
+        elapsed = None
+        if self.started_at is not None:
+            elapsed = round((self.finished_at or time.time()) - self.started_at, 2)
+        return {
+            'ready': self.is_ready(),
+            'finished': self._done.is_set(),
+            'elapsed_seconds': elapsed,
+            'models': models,
+        }
+    
+    def _warm(self, spec: ModelSpec):
+        status = self.statuses[spec.name]
+        try:
+            self._set_state(status, LOADING)
+            start = time.perf_counter()
+            loaded = spec.load()
+            status.load_seconds = round(time.perf_counter() - start, 2)
+            
+            self._set_state(status, WARMING)
+            start = time.perf_counter()
+            spec.warm(loaded)
+            status.warmup_ms = round((time.perf_counter() - start) * 1000, 1)
+            
+            self._set_state(status, READY)
+            print(f"Model {spec.name} ready (load {status.load_seconds}s, warm-up {status.warmup_ms}ms)")
+        except Exception as e:
+            status.error = str(e)
+            self._set_state(status, FAILED)
+            print(f"Model {spec.name} warmup failed: {e}")
+    
+    def _set_state(self, status: ModelStatus, state: str):
+        with self._lock:
+            status.state = state
+    
+    def _finish(self):
+        self.finished_at = time.time()
+        self._done.set()
+
+
+def merge_reports(reports: List[dict], expected: int) -> dict:
+    """
+    Combine the warmup reports of several worker processes: a model is only
+    as ready as its slowest worker, and the pool is ready once every
+    expected worker has reported ready.
+    """
+    rank = {FAILED: 0, PENDING: 1, LOADING: 2, WARMING: 3, READY: 4}
+    models: Dict[str, dict] = {}
+    for report in reports:
+        for name, status in report['models'].items():
+            merged = models.get(name)
+            if merged is None:
+                models[name] = dict(status)
+                continue
+            if rank[status['state']] < rank[merged['state']]:
+                merged['state'] = status['state']
+                if 'error' in status:
+                    merged['error'] = status['error']
+            for key in ('load_seconds', 'warmup_ms'):
+                if status[key] is not None and (merged[key] is None or status[key] > merged[key]):
+                    merged[key] = status[key]
+    
+    return {
+        'ready': len(reports) >= expected and all(report['ready'] for report in reports),
+        'workers_ready': sum(1 for report in reports if report['ready']),
+        'workers_expected': expected,
+        'models': models,
+    }
+
+
+_model_warmup: Optional[ModelWarmup] = None
+_model_warmup_lock = threading.Lock()
+
+def start_model_warmup(include_video: bool = True) -> ModelWarmup:
+    """Start the API process's background warmup (once)"""
+    global _model_warmup
+    with _model_warmup_lock:
+        if _model_warmup is None:
+            _model_warmup = ModelWarmup(include_video).start()
+        return _model_warmup
+
+
+def get_model_warmup() -> Optional[ModelWarmup]:
+    return _model_warmup
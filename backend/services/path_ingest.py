@@ -0,0 +1,110 @@
+"""
+Server-side path ingestion (POST /analyze/path).
+
+When the media already sits on a volume the API can read, uploading it only
+copies it into UPLOAD_DIR again. With ANALYZE_PATH_ROOTS set, a client names
+the file instead. The path is resolved (symlinks included) and must lie
+under one of the roots; the job then gets a symlink to it at its upload
+path, so the analysis reads the original in place and cleaning up the
+job's input removes only the link.
+
+The file is still hashed once, for the result cache and history. Hashes are
+remembered per file (device, inode, size, mtime), so analyzing the same
+file again doesn't read it twice.
+"""
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+import config
+from services.batch_scan import SCAN_MODES, file_hash, media_type
+from services.upload_spool import SpooledUpload
+
+# Files whose content hash is remembered
+HASH_MEMO_SIZE = 4096
+
+
+class PathNotAllowedError(Exception):
+    """A path that can't be ingested - carries the HTTP status"""
+    def __init__(self, detail: str, status_code: int = 403):
+        super().__init__(detail)
+        self.detail = detail
+        self.status_code = status_code
+
+
+_hash_memo: "OrderedDict[tuple, str]" = OrderedDict()
+_hash_memo_lock = threading.Lock()
+
+
+def _under_root(path: str, roots: List[str]) -> bool:
+    return any(os.path.commonpath([path, root]) == root for root in roots)
+
+
+def resolve_ingest_path(path: str) -> str:
+    """
+    The real path of a file under ANALYZE_PATH_ROOTS. Relative paths are
+    looked up in each root in turn. Paths that resolve outside every root
+    are refused without saying whether they exist.
+    """
+    roots = config.ANALYZE_PATH_ROOTS
+    if not roots:
+        raise PathNotAllowedError("Path ingestion is disabled (ANALYZE_PATH_ROOTS)", status_code=404)
+    if not path or '\0' in path:
+        raise PathNotAllowedError("Invalid path", status_code=400)
+    
+    candidates = [path] if os.path.isabs(path) else [os.path.join(root, path) for root in roots]
+    inside = False
+    for candidate in candidates:
+        real = os.path.realpath(candidate)
+        if not _under_root(real, roots):
+            continue
+        inside = True
+        if os.path.isfile(real):
+            return real
+    
+    if not inside:
+        raise PathNotAllowedError("Path is outside the allowed roots (ANALYZE_PATH_ROOTS)")
+    raise PathNotAllowedError(f"No such file: {path}", status_code=404)
+
+
+def content_hash(path: str) -> str:
+    """SHA-256 of a file, read only the first time this version of it is seen"""
+    stat = os.stat(path)
+    key = (stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns)
+    with _hash_memo_lock:
+        cached = _hash_memo.get(key)
+        if cached is not None:
+            _hash_memo.move_to_end(key)
+            return cached
+    
+    digest = file_hash(path)
+    with _hash_memo_lock:
+        _hash_memo[key] = digest
+        while len(_hash_memo) > HASH_MEMO_SIZE:
+            _hash_memo.popitem(last=False)
+    return digest
+
+
+def link_ingest_path(real_path: str, dest_path: str) -> SpooledUpload:
+    """
+    Put real_path at the job's upload path without copying it. Blocking
+    (hashes the file on first sight) - run it off the event loop.
+    """
+    digest = content_hash(real_path)
+    try:
+        os.symlink(real_path, dest_path)
+    except OSError:
+        # No symlinks here (e.g. unprivileged Windows): same filesystem shares the inode, else copy
+        try:
+            os.link(real_path, dest_path)
+        except OSError:
+            shutil.copyfile(real_path, dest_path)
+    return SpooledUpload(dest_path, None, os.path.getsize(real_path), digest)
+
+
+def default_analysis_type(path: str) -> Optional[str]:
+    """Comprehensive analysis for the file's media type"""
+    kind = media_type(path)
+    return SCAN_MODES['comprehensive'][kind] if kind else None
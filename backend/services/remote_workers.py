@@ -0,0 +1,285 @@
+"""
+Broker-backed analysis workers (ANALYSIS_WORKER_MODE=broker).
+
+RemoteWorkerPool is the API side: it has the same run()/readiness()
+interface as the process WorkerPool, but instead of running a task it
+ships the upload through a job broker (services.job_broker) and relays the
+worker's events - progress into the job's tracker, then the result, the
+error or the cancellation. The API node loads no models. The upload is
+streamed to the broker in chunks, or - for in-process workers and with
+BROKER_SHARED_STORAGE - only its path is sent and the worker reads the
+file where it is.
+
+BrokerWorker is the other side, started with `python -m veritas worker`
+on any host that can reach the broker. It warms its models, claims jobs
+(highest lane priority first), runs the usual ANALYSIS_TASKS on a local
+copy of the media (or a link to the shared file) and publishes progress
+and the outcome back. Its heartbeats hold the leases on its claims: if it
+dies mid-job, the job is requeued for another worker. Workers
+can be added or removed at any time; the API sees them through their
+heartbeats.
+"""
+import os
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import uuid
+from typing import Iterable, List, Optional
+
+import config
+from models.progress_tracker import ProgressTracker, get_job_tracker, use_progress_tracker
+from services.job_broker import CANCELLED, ERROR, PROGRESS, RESULT, JobBroker, create_broker, file_chunks
+from services.model_warmup import ModelWarmup, merge_reports
+from utils.cancellation import AnalysisCancelled, CancellationToken, use_cancellation_token
+from utils.tracing import attach, current_span, start_trace, use_span
+
+# How long one broker read waits before the caller re-checks its own state
+POLL_SECONDS = 1.0
+# Workers report liveness (and their warmup state) this often
+HEARTBEAT_SECONDS = 5.0
+# Workers re-check a running job's cancellation flag at most this often
+CANCEL_CHECK_SECONDS = 1.0
+
+
+def lane_priorities() -> dict:
+    """analysis_type -> priority of its scheduling lane"""
+    from services.analysis_tasks import ANALYSIS_LANES, ANALYSIS_TASKS
+    
+    priorities = {}
+    for analysis_type in ANALYSIS_TASKS:
+        lane = config.JOB_LANES.get(ANALYSIS_LANES.get(analysis_type, analysis_type), {})
+        priorities[analysis_type] = lane.get('priority', 0)
+    return priorities
+
+
+class RemoteWorkerPool:
+    mode = 'broker'
+    
+    def __init__(self, broker: JobBroker, local_workers: int = 0):
+        self.broker = broker
+        # memory:// has no other process to serve it - run that many workers in-process
+        self.local_workers = local_workers
+        self._threads: List[threading.Thread] = []
+        self._stop = threading.Event()
+        self.restarts = 0
+    
+    def start(self):
+        if not self.local_workers or self._threads:
+            return
+        # One warmup shared by the in-process workers: the model getters are process-wide
+        warmup = ModelWarmup().start()
+        for index in range(self.local_workers):
+            worker = BrokerWorker(self.broker, worker_id=f"local-{index}", warmup=warmup)
+            thread = threading.Thread(target=worker.serve, args=(self._stop,),
+                                      name=f'broker-worker-{index}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+    
+    def readiness(self) -> dict:
+        """Model warmup state across the live workers (ready once there is one and all are warm)"""
+        workers = self.broker.workers()
+        report = merge_reports(list(workers.values()), max(1, len(workers)))
+        report['workers'] = sorted(workers)
+        return report
+    
+    def run(self, job_id: str, analysis_type: str, args: tuple,
+            token: Optional[CancellationToken] = None):
+        """Hand a task to the broker and wait for a worker's result"""
+        from services.analysis_tasks import remove_file
+        
+        source = args[0]
+        job = {
+            'job_id': job_id,
+            'analysis_type': analysis_type,
+            'priority': lane_priorities().get(analysis_type, 0),
+            'trace': current_span() is not None,
+            # Small images arrive as bytes, everything else as a file named after its type
+            'in_memory': not isinstance(source, str),
+            'extension': os.path.splitext(source)[1] if isinstance(source, str) else '',
+            # Whatever follows (source, frames_dir), e.g. deadline_at
+            'extra_args': list(args[2:]),
+        }
+        # Workers that see this filesystem read the file in place
+        shared = isinstance(source, str) and bool(self.local_workers or config.BROKER_SHARED_STORAGE)
+        if shared:
+            job['path'] = os.path.realpath(source)
+            media = None
+        elif isinstance(source, str):
+            media = file_chunks(source)
+        else:
+            media = [bytes(source)]
+        
+        self.broker.enqueue(job, media)
+        if isinstance(source, str) and not shared:
+            # The broker has its own copy now; the task would have removed it
+            remove_file(source)
+        if token is not None:
+            token.on_cancel(lambda: self.broker.cancel(job_id))
+        
+        try:
+            return self._wait(job_id)
+        finally:
+            if shared:
+                # Removes the upload (or, for a served path, only the job's link to it)
+                remove_file(source)
+    
+    def _wait(self, job_id: str):
+        """Relay a job's events until its outcome"""
+        from services.analysis_tasks import AnalysisError
+        
+        tracker = get_job_tracker(job_id)
+        deadline = time.monotonic() + config.BROKER_JOB_TIMEOUT_SECONDS
+        while True:
+            if time.monotonic() >= deadline:
+                self.broker.cancel(job_id)
+                raise AnalysisError("Timed out waiting for an analysis worker", 504)
+            
+            for kind, payload in self.broker.next_events(job_id, POLL_SECONDS):
+                if kind == PROGRESS:
+                    if tracker is not None:
+                        tracker.update(payload)
+                elif kind == RESULT:
+                    attach(payload['trace'])
+                    return payload['result']
+                elif kind == ERROR:
+                    raise AnalysisError(payload['detail'], payload['status_code'])
+                elif kind == CANCELLED:
+                    raise AnalysisCancelled(payload or "Analysis cancelled")
+    
+    def shutdown(self):
+        self._stop.set()
+        self.broker.close()
+
+
+class _BrokerCancelToken:
+    """Worker-side token: the job's cancellation flag in the broker, polled at most once a second"""
+    def __init__(self, broker: JobBroker, job_id: str):
+        self.broker = broker
+        self.job_id = job_id
+        self._cancelled = False
+        self._checked_at = 0.0
+    
+    @property
+    def cancelled(self) -> bool:
+        now = time.monotonic()
+        if not self._cancelled and now - self._checked_at >= CANCEL_CHECK_SECONDS:
+            self._checked_at = now
+            try:
+                self._cancelled = self.broker.is_cancelled(self.job_id)
+            except Exception as e:
+                print(f"Cancellation check failed: {e}")
+        return self._cancelled
+    
+    def raise_if_cancelled(self):
+        if self.cancelled:
+            raise AnalysisCancelled()
+
+
+class BrokerWorker:
+    def __init__(self, broker: JobBroker, analysis_types: Optional[Iterable[str]] = None,
+                 worker_id: Optional[str] = None, warmup: Optional[ModelWarmup] = None):
+        from services.analysis_tasks import ANALYSIS_TASKS
+        
+        self.broker = broker
+        self.analysis_types = list(analysis_types or ANALYSIS_TASKS)
+        unknown = [t for t in self.analysis_types if t not in ANALYSIS_TASKS]
+        if unknown:
+            raise ValueError(f"Unknown analysis types: {', '.join(unknown)}. Available: {', '.join(ANALYSIS_TASKS)}")
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        # Image-only workers skip the video models
+        include_video = any(t.startswith('video') for t in self.analysis_types)
+        self.warmup = warmup or ModelWarmup(include_video=include_video).start()
+        self.jobs_done = 0
+    
+    def serve(self, stop: Optional[threading.Event] = None):
+        """Claim and run jobs until stop is set"""
+        stop = stop or threading.Event()
+        # Registered before the first claim: the heartbeat is what holds its leases
+        self._send_heartbeat()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(stop,),
+                                     name='broker-heartbeat', daemon=True)
+        heartbeat.start()
+        
+        while not stop.is_set():
+            try:
+                job = self.broker.claim(self.worker_id, self.analysis_types, POLL_SECONDS)
+            except Exception as e:
+                print(f"Broker claim failed: {e}")
+                stop.wait(POLL_SECONDS)
+                continue
+            if job is not None:
+                self.process(job)
+    
+    def _fetch_media(self, job: dict, work_dir: str):
+        """The task's input: the media's bytes, a local copy, or a link to the shared file"""
+        if job['in_memory']:
+            return b''.join(self.broker.read_media(job['job_id']))
+        
+        source = os.path.join(work_dir, f"media{job['extension']}")
+        if job.get('path'):
+            # The task deletes its input: hand it a link, never the shared file
+            try:
+                os.symlink(job['path'], source)
+            except OSError:
+                shutil.copyfile(job['path'], source)
+        else:
+            with open(source, 'wb') as f:
+                for chunk in self.broker.read_media(job['job_id']):
+                    f.write(chunk)
+        return source
+    
+    def process(self, job: dict):
+        """Run one claimed job and publish its outcome"""
+        from services.analysis_tasks import ANALYSIS_TASKS
+        
+        job_id = job['job_id']
+        task = ANALYSIS_TASKS[job['analysis_type']][0]
+        work_dir = tempfile.mkdtemp(prefix=f'veritas-{job_id}-')
+        
+        tracker = ProgressTracker(job_id=job_id)
+        tracker.add_callback(lambda event_id, message: self.broker.publish(job_id, PROGRESS, message))
+        root = start_trace('broker_worker', worker=self.worker_id) if job['trace'] else None
+        token = _BrokerCancelToken(self.broker, job_id)
+        try:
+            args = (self._fetch_media(job, work_dir), os.path.join(work_dir, 'frames'), *job['extra_args'])
+            with use_progress_tracker(tracker), use_span(root), use_cancellation_token(token):
+                result = task(*args)
+            span_tree = None
+            if root is not None:
+                root.end()
+                span_tree = root.to_dict()
+            self.broker.publish(job_id, RESULT, {'result': result, 'trace': span_tree})
+        except AnalysisCancelled as e:
+            self.broker.publish(job_id, CANCELLED, e.detail)
+        except Exception as e:
+            print(f"Job {job_id} ({job['analysis_type']}) failed: {e}")
+            self.broker.publish(job_id, ERROR, {
+                'detail': getattr(e, 'detail', str(e)),
+                'status_code': getattr(e, 'status_code', 500),
+            })
+        finally:
+            self.broker.finish(self.worker_id, job)
+            shutil.rmtree(work_dir, ignore_errors=True)
+            self.jobs_done += 1
+    
+    def _send_heartbeat(self):
+        report = self.warmup.report()
+        # The broker requeues the jobs of these types if the heartbeats stop
+        report['analysis_types'] = self.analysis_types
+        report['jobs_done'] = self.jobs_done
+        try:
+            self.broker.heartbeat(self.worker_id, report)
+        except Exception as e:
+            print(f"Broker heartbeat failed: {e}")
+    
+    def _heartbeat(self, stop: threading.Event):
+        while not stop.wait(HEARTBEAT_SECONDS):
+            self._send_heartbeat()
+
+
+def create_remote_worker_pool() -> RemoteWorkerPool:
+    broker = create_broker(config.JOB_BROKER_URL, lane_priorities())
+    local_workers = config.ANALYSIS_WORKERS if config.JOB_BROKER_URL.startswith('memory:') else 0
+    return RemoteWorkerPool(broker, local_workers)
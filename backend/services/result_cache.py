@@ -0,0 +1,225 @@
+"""
+Content-addressed result cache.
+
+Responses are keyed by analysis type + SHA-256 of the uploaded bytes +
+a version hash of the model/config settings, so re-uploads of the same
+media are answered without running the models again. Changing any
+setting that affects scoring changes the version and misses the cache.
+
+Tiers:
+- in-memory LRU (RESULT_CACHE_MAX_ENTRIES)
+- optional on-disk JSON store (RESULT_CACHE_DIR), shared across restarts
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from utils import fast_json
+
+import config
+from models.model_bundle import HF_MODELS
+from utils.metrics import Counter, Gauge
+
+
+def get_config_version() -> str:
+    """Short hash of every setting that changes analysis output"""
+    settings = {
+        'api_version': config.API_VERSION,
+        'cache_version': config.RESULT_CACHE_VERSION,
+        'models': config.MODEL_CONFIG['huggingface'],
+        # Model and processor classes and processor options (e.g. use_fast) of each repo
+        'hf_models': HF_MODELS,
+        'ensemble_weights': config.ENSEMBLE_WEIGHTS,
+        'risk_thresholds': config.RISK_THRESHOLDS,
+        'neural_ensemble': config.NEURAL_ENSEMBLE_ENABLED,
+        'frequency_analysis': config.FREQUENCY_ANALYSIS_ENABLED,
+        'face_analysis': config.FACE_ANALYSIS_ENABLED,
+        'metadata_analysis': config.METADATA_ANALYSIS_ENABLED,
+        'dynamic_weighting': config.ENABLE_DYNAMIC_WEIGHTING,
+        'detailed_breakdown': config.ENABLE_DETAILED_BREAKDOWN,
+    }
+    encoded = json.dumps(settings, sort_keys=True).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+class ResultCache:
+    def __init__(self, max_entries: int, disk_dir: Optional[str] = None,
+                 max_disk_entries: int = 10000):
+        self.max_entries = max_entries
+        self.disk_dir = disk_dir or None
+        self.max_disk_entries = max_disk_entries
+        self.version = get_config_version()
+        self._memory: 'OrderedDict[str, dict]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_writes = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+    
+    def make_key(self, analysis_type: str, content_hash: str) -> str:
+        return f"{analysis_type}:{content_hash}:{self.version}"
+    
+    def get(self, key: str) -> Optional[dict]:
+        """Look up a response - memory first, then disk"""
+        with self._lock:
+            result = self._memory.get(key)
+            if result is not None:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return dict(result)
+        
+        result = self._read_disk(key)
+        
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1
+            self._put_memory_locked(key, result)
+        
+        return dict(result)
+    
+    def put(self, key: str, result: dict):
+        """Store a response in every tier"""
+        # Callers only add and remove top-level keys (job_id, trace, cached), so
+        # a shallow copy isolates entries; everything below is shared read-only
+        result = dict(result)
+        result.pop('job_id', None)
+        result.pop('trace', None)
+        
+        with self._lock:
+            self._put_memory_locked(key, result)
+        
+        self._write_disk(key, result)
+    
+    def stats(self) -> dict:
+        with self._lock:
+            hits = self.memory_hits + self.disk_hits
+            lookups = hits + self.misses
+            return {
+                'enabled': True,
+                'version': self.version,
+                'entries': len(self._memory),
+                'max_entries': self.max_entries,
+                'disk_enabled': self.disk_dir is not None,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'hit_ratio': round(hits / lookups, 4) if lookups else 0.0,
+            }
+    
+    def _put_memory_locked(self, key: str, result: dict):
+        self._memory[key] = result
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+    
+    def _disk_path(self, key: str) -> str:
+        name = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(self.disk_dir, f"{name}.json")
+    
+    def _read_disk(self, key: str) -> Optional[dict]:
+        if not self.disk_dir:
+            return None
+        
+        try:
+            with open(self._disk_path(key), 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+            # Guard against hash collisions on the file name
+            if entry.get('key') != key:
+                return None
+            return entry['result']
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"Result cache read error: {e}")
+            return None
+    
+    def _write_disk(self, key: str, result: dict):
+        if not self.disk_dir:
+            return
+        
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(fast_json.dumps({'key': key, 'result': result}))
+            os.replace(tmp_path, path)
+        except Exception as e:
+            print(f"Result cache write error: {e}")
+            try:
+                os.remove(tmp_path)
+            except:
+                pass
+            return
+        
+        with self._lock:
+            self._disk_writes += 1
+            prune = self._disk_writes % 100 == 0
+        if prune:
+            self._prune_disk()
+    
+    def _prune_disk(self):
+        """Keep at most max_disk_entries files, dropping the oldest"""
+        try:
+            entries = [
+                os.path.join(self.disk_dir, name)
+                for name in os.listdir(self.disk_dir)
+                if name.endswith('.json')
+            ]
+            if len(entries) <= self.max_disk_entries:
+                return
+            entries.sort(key=os.path.getmtime)
+            for path in entries[:len(entries) - self.max_disk_entries]:
+                os.remove(path)
+        except Exception as e:
+            print(f"Result cache prune error: {e}")
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+def get_result_cache() -> Optional[ResultCache]:
+    """Shared cache instance, or None when RESULT_CACHE_ENABLED is off"""
+    global _result_cache
+    if not config.RESULT_CACHE_ENABLED:
+        return None
+    with _result_cache_lock:
+        if _result_cache is None:
+            _result_cache = ResultCache(
+                max_entries=config.RESULT_CACHE_MAX_ENTRIES,
+                disk_dir=config.RESULT_CACHE_DIR,
+                max_disk_entries=config.RESULT_CACHE_DISK_MAX_ENTRIES
+            )
+        return _result_cache
+
+
+def _collect_cache_lookups():
+    cache = get_result_cache()
+    if cache is None:
+        return []
+    stats = cache.stats()
+    return [
+        ({'result': 'memory_hit'}, stats['memory_hits']),
+        ({'result': 'disk_hit'}, stats['disk_hits']),
+        ({'result': 'miss'}, stats['misses']),
+    ]
+
+
+def _collect_cache_ratio():
+    cache = get_result_cache()
+    if cache is None:
+        return []
+    return [({}, cache.stats()['hit_ratio'])]
+
+
+Counter('veritas_result_cache_lookups_total', 'Result cache lookups by outcome',
+        ['result'], collect=_collect_cache_lookups)
+Gauge('veritas_result_cache_hit_ratio', 'Result cache hits / lookups since start',
+      collect=_collect_cache_ratio)
@@ -0,0 +1,232 @@
+"""
+Result history store (SQLite).
+
+Every finished analysis is recorded with its content hash, media type,
+final score and risk level, per-layer scores, timings and the model/config
+versions that produced it, so results can be audited and queried later
+(GET /results, GET /results/{hash}).
+
+Media analyzed before with the same models/config is answered from the
+store instead of the models - it backs the in-memory result cache the
+same way RESULT_CACHE_DIR does, but survives restarts without a file per
+result. Results degraded to meet a deadline are recorded but never served.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import List, Optional
+
+import config
+from models.model_bundle import FACENET_WEIGHTS, HF_MODELS, MIDAS_WEIGHTS, get_manifest
+from services.result_cache import get_config_version
+from utils import fast_json
+from utils.metrics import Counter
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    job_id TEXT,
+    content_hash TEXT NOT NULL,
+    analysis_type TEXT NOT NULL,
+    media_type TEXT NOT NULL,
+    config_version TEXT NOT NULL,
+    final_score REAL,
+    risk_level TEXT,
+    confidence REAL,
+    degraded INTEGER NOT NULL DEFAULT 0,
+    layer_scores TEXT NOT NULL,
+    timings TEXT NOT NULL,
+    model_versions TEXT NOT NULL,
+    result TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_results_hash
+    ON results (content_hash, analysis_type, config_version, created_at);
+CREATE INDEX IF NOT EXISTS idx_results_created ON results (created_at);
+"""
+
+# Columns returned by listings (the full result JSON only comes with a hash lookup)
+SUMMARY_COLUMNS = ('id', 'job_id', 'content_hash', 'analysis_type', 'media_type', 'config_version',
+                   'final_score', 'risk_level', 'confidence', 'degraded', 'layer_scores',
+                   'timings', 'model_versions', 'created_at')
+JSON_COLUMNS = ('layer_scores', 'timings', 'model_versions', 'result')
+
+MAX_PAGE_SIZE = 200
+
+STORE_LOOKUPS = Counter(
+    'veritas_result_store_lookups_total',
+    'Result store lookups for previously analyzed media, by outcome',
+    ['result']
+)
+
+
+def layer_scores(result: dict) -> dict:
+    """
+    Flatten the per-layer scores of a response ({'visual.temporal': 0.42, ...}).
+    Works for every analysis type: any nested dict with a numeric 'score'
+    is a layer; frame-based video analysis reports its ensemble average.
+    """
+    scores = {}
+    
+    def walk(node, path):
+        if hasattr(node, 'to_json'):
+            node = node.to_json()
+        if not isinstance(node, dict):
+            return
+        score = node.get('score', node.get('ensemble_avg'))
+        if path and isinstance(score, (int, float)) and not isinstance(score, bool):
+            scores['.'.join(path)] = round(float(score), 4)
+        for key, value in node.items():
+            walk(value, path + [key])
+    
+    walk(result.get('analysis_breakdown'), [])
+    walk(result.get('layer_summaries'), [])
+    return scores
+
+
+def model_versions() -> dict:
+    """What produced a result: API and config version, and where each model came from"""
+    manifest = get_manifest()
+    bundled = manifest['models'] if manifest is not None else {}
+    names = list(HF_MODELS) + [FACENET_WEIGHTS, MIDAS_WEIGHTS]
+    return {
+        'api': config.API_VERSION,
+        'config': get_config_version(),
+        'models': {
+            name: f"bundle:{bundled[name].get('bundled_at')}" if name in bundled else 'hub'
+            for name in names
+        },
+    }
+
+
+class ResultStore:
+    def __init__(self, path: str):
+        self.path = path
+        self.version = get_config_version()
+        self.model_versions = model_versions()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        
+        # One connection shared by the API's threads, serialized by the lock
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            # WAL: readers (listings) don't block the writer recording results
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute('PRAGMA synchronous=NORMAL')
+            self._conn.executescript(SCHEMA)
+    
+    def record(self, job_id: str, analysis_type: str, content_hash: str, result: dict,
+               timings: Optional[dict] = None):
+        """Store a finished analysis"""
+        result = dict(result)
+        result.pop('job_id', None)
+        result.pop('trace', None)
+        result.pop('cached', None)
+        media_type = 'video' if analysis_type.startswith('video') else 'image'
+        score = result.get('final_score', result.get('fake_probability'))
+        
+        row = (
+            job_id, content_hash, analysis_type, media_type, self.version,
+            score, result.get('risk_level'), result.get('confidence'),
+            int(bool(result.get('degraded_layers'))),
+            json.dumps(layer_scores(result)),
+            json.dumps(timings or {}),
+            json.dumps(self.model_versions),
+            fast_json.dumps_str(result),
+            time.time(),
+        )
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT INTO results (job_id, content_hash, analysis_type, media_type, config_version, '
+                'final_score, risk_level, confidence, degraded, layer_scores, timings, model_versions, '
+                'result, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                row
+            )
+    
+    def find(self, analysis_type: str, content_hash: str) -> Optional[dict]:
+        """Latest full (not degraded) response for this media under the current models/config"""
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT result FROM results WHERE content_hash = ? AND analysis_type = ? '
+                'AND config_version = ? AND degraded = 0 ORDER BY created_at DESC LIMIT 1',
+                (content_hash, analysis_type, self.version)
+            ).fetchone()
+        
+        STORE_LOOKUPS.inc(result='hit' if row is not None else 'miss')
+        return json.loads(row['result']) if row is not None else None
+    
+    def history(self, content_hash: str) -> List[dict]:
+        """Every recorded analysis of a piece of media, newest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(SUMMARY_COLUMNS)}, result FROM results "
+                'WHERE content_hash = ? ORDER BY created_at DESC',
+                (content_hash,)
+            ).fetchall()
+        return [self._to_dict(row) for row in rows]
+    
+    def page(self, limit: int = 50, before: Optional[int] = None,
+             analysis_type: Optional[str] = None, media_type: Optional[str] = None,
+             since: Optional[float] = None, until: Optional[float] = None) -> dict:
+        """
+        One page of summaries, newest first. Pass the returned next_before
+        to get the following page (keyset pagination - no OFFSET scans).
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        clauses, params = [], []
+        for clause, value in (('id < ?', before), ('analysis_type = ?', analysis_type),
+                              ('media_type = ?', media_type), ('created_at >= ?', since),
+                              ('created_at < ?', until)):
+            if value is not None:
+                clauses.append(clause)
+                params.append(value)
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ''
+        
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM results {where} ORDER BY id DESC LIMIT ?",
+                (*params, limit + 1)
+            ).fetchall()
+        
+        items = [self._to_dict(row) for row in rows[:limit]]
+        return {
+            'results': items,
+            'next_before': items[-1]['id'] if len(rows) > limit else None,
+        }
+    
+    def stats(self) -> dict:
+        with self._lock:
+            count = self._conn.execute('SELECT COUNT(*) FROM results').fetchone()[0]
+        return {'enabled': True, 'path': self.path, 'results': count, 'version': self.version}
+    
+    def close(self):
+        with self._lock:
+            self._conn.close()
+    
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> dict:
+        data = dict(row)
+        for column in JSON_COLUMNS:
+            if column in data:
+                data[column] = json.loads(data[column])
+        data['degraded'] = bool(data['degraded'])
+        return data
+
+
+_result_store = None
+_result_store_lock = threading.Lock()
+
+def get_result_store() -> Optional[ResultStore]:
+    """Shared store instance, or None when RESULT_STORE_ENABLED is off"""
+    global _result_store
+    if not config.RESULT_STORE_ENABLED:
+        return None
+    with _result_store_lock:
+        if _result_store is None:
+            _result_store = ResultStore(config.RESULT_STORE_PATH)
+        return _result_store
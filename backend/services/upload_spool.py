@@ -0,0 +1,152 @@
+"""
+Upload spooling.
+
+Uploads are read in chunks straight into their per-job destination while
+the SHA-256 is computed on the fly, so the file is written once and never
+re-read for hashing. Small images stay entirely in memory and are handed
+to the analyzers as bytes. Anything over MAX_FILE_SIZE_MB is rejected as
+soon as the limit is crossed and the partial file is removed.
+"""
+import asyncio
+import hashlib
+import os
+from typing import Optional, Union
+
+from fastapi import UploadFile
+from fastapi.responses import JSONResponse
+
+import config
+
+SPOOL_CHUNK_SIZE = 1024 * 1024
+
+# Allowance for multipart boundaries and form fields on top of the file itself
+MULTIPART_OVERHEAD_BYTES = 1024 * 1024
+
+
+class UploadTooLargeError(Exception):
+    """Raised when an upload exceeds the configured size limit"""
+    def __init__(self, max_bytes: int):
+        super().__init__(f"File too large. Maximum size is {max_bytes // (1024 * 1024)} MB")
+        self.max_bytes = max_bytes
+
+
+class SpooledUpload:
+    """An upload held either in memory (data) or on disk (path)"""
+    def __init__(self, path: Optional[str], data: Optional[bytes], size: int, content_hash: str):
+        self.path = path
+        self.data = data
+        self.size = size
+        self.content_hash = content_hash
+    
+    @property
+    def in_memory(self) -> bool:
+        return self.data is not None
+    
+    @property
+    def source(self) -> Union[str, bytes]:
+        """What the analysis tasks receive: raw bytes or a file path"""
+        return self.data if self.data is not None else self.path
+    
+    def discard(self):
+        """Drop the spooled content"""
+        self.data = None
+        if self.path:
+            try:
+                os.remove(self.path)
+            except:
+                pass
+
+
+def max_upload_bytes() -> int:
+    return config.MAX_FILE_SIZE_MB * 1024 * 1024
+
+
+async def spool_upload(file: UploadFile, dest_path: str, memory_limit: int = 0,
+                       max_bytes: Optional[int] = None) -> SpooledUpload:
+    """
+    Stream an upload to dest_path, hashing as it goes.
+    
+    Uploads no larger than memory_limit are kept in memory and dest_path is
+    never created. dest_path is opened exclusively so two jobs can never
+    write to the same file.
+    
+    Raises:
+        UploadTooLargeError: once more than max_bytes have been read
+    """
+    if max_bytes is None:
+        max_bytes = max_upload_bytes()
+    
+    loop = asyncio.get_event_loop()
+    digest = hashlib.sha256()
+    buffer = bytearray()
+    out = None
+    size = 0
+    
+    try:
+        while True:
+            chunk = await file.read(SPOOL_CHUNK_SIZE)
+            if not chunk:
+                break
+            
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLargeError(max_bytes)
+            digest.update(chunk)
+            
+            if out is None and size <= memory_limit:
+                buffer += chunk
+                continue
+            
+            # Past the in-memory limit: move to disk and keep streaming
+            if out is None:
+                out = open(dest_path, 'xb')
+                if buffer:
+                    await loop.run_in_executor(None, out.write, bytes(buffer))
+                    buffer = bytearray()
+            await loop.run_in_executor(None, out.write, chunk)
+    except BaseException:
+        if out is not None:
+            out.close()
+            try:
+                os.remove(dest_path)
+            except:
+                pass
+        raise
+    
+    if out is not None:
+        out.close()
+        return SpooledUpload(dest_path, None, size, digest.hexdigest())
+    
+    return SpooledUpload(None, bytes(buffer), size, digest.hexdigest())
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Refuse uploads whose Content-Length already exceeds the limit,
+    before the multipart parser buffers the body.
+    Chunked uploads without a length are still caught by spool_upload().
+    """
+    def __init__(self, app, max_bytes: Optional[int] = None):
+        self.app = app
+        self.max_bytes = max_bytes
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'http' and scope['method'] in ('POST', 'PUT'):
+            max_bytes = self.max_bytes if self.max_bytes is not None else max_upload_bytes()
+            for name, value in scope['headers']:
+                if name != b'content-length':
+                    continue
+                try:
+                    length = int(value)
+                except ValueError:
+                    break
+                if length > max_bytes + MULTIPART_OVERHEAD_BYTES:
+                    response = JSONResponse(
+                        status_code=413,
+                        content={'detail': str(UploadTooLargeError(max_bytes))}
+                    )
+                    await response(scope, receive, send)
+                    return
+                break
+        
+        await self.app(scope, receive, send)
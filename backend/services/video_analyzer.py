@@ -3,16 +3,19 @@ from PIL import Image
 from utils.video_utils import extract_frames
 from models.deepfake_detector import predict_image
 from services.report_generator import generate_report
+from utils.cancellation import check_cancelled
+from utils.tracing import span
 
-def analyze_video(video_path):
-    frames_dir = "temp_frames"
-    extract_frames(video_path, frames_dir, fps=1)
+def analyze_video(video_path, frames_dir="temp_frames"):
+    with span("extract_frames"):
+        extract_frames(video_path, frames_dir, fps=1)
 
     frame_scores = []
 
     for frame in os.listdir(frames_dir):
         frame_path = os.path.join(frames_dir, frame)
 
+        check_cancelled()
         try:
             img = Image.open(frame_path).convert("RGB")
             prob = predict_image(img)
@@ -0,0 +1,219 @@
+"""
+Process-pool analysis workers (ANALYSIS_WORKER_MODE=process).
+
+Each worker process loads the models once when it is spawned and then runs
+tasks looked up by analysis type in ANALYSIS_TASKS, so torch/MediaPipe state
+is never shared between concurrent analyses and throughput scales with cores.
+Progress messages, metric updates and each worker's model warmup report
+are sent back over a multiprocessing queue and replayed in the API process
+by a listener thread.
+
+Cancellation goes the other way through shared memory: each running job
+holds one byte of a flag array, which the API process sets when the job's
+token is cancelled and the worker's checkpoints read without any IPC.
+"""
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional
+
+from models.progress_tracker import ProgressTracker, get_job_tracker, use_progress_tracker
+from services.model_warmup import ModelWarmup, merge_reports
+from utils.cancellation import CancellationToken, SharedFlagToken, use_cancellation_token
+from utils.metrics import apply_forwarded, set_forwarder
+from utils.tracing import attach, current_span, start_trace, use_span
+
+# Set in each worker process by _init_worker
+_progress_queue = None
+_cancel_flags = None
+
+# Max seconds to wait for a finished job's last progress messages
+PROGRESS_DRAIN_TIMEOUT = 5
+
+
+def _init_worker(progress_queue, cancel_flags):
+    global _progress_queue, _cancel_flags
+    _progress_queue = progress_queue
+    _cancel_flags = cancel_flags
+    set_forwarder(lambda kind, name, labels, value: progress_queue.put(
+        ('metric', kind, name, labels, value)
+    ))
+    
+    # Failed models load lazily on first use instead
+    warmup = ModelWarmup().run()
+    progress_queue.put(('warmup', os.getpid(), warmup.report()))
+
+
+def _ping():
+    return True
+
+
+def _run_task(job_id: str, analysis_type: str, args: tuple, trace: bool = False, slot: int = -1):
+    """
+    Runs inside a worker process.
+    slot is the job's byte in the cancellation flags (-1: not cancellable).
+    Returns (result, serialized span tree or None).
+    """
+    from services.analysis_tasks import ANALYSIS_TASKS
+    
+    task = ANALYSIS_TASKS[analysis_type][0]
+    
+    tracker = ProgressTracker(job_id=job_id)
+    tracker.add_callback(lambda event_id, message: _progress_queue.put(('progress', job_id, message)))
+    
+    root = start_trace('worker_process') if trace else None
+    token = SharedFlagToken(_cancel_flags, slot) if slot >= 0 else None
+    try:
+        with use_progress_tracker(tracker), use_span(root), use_cancellation_token(token):
+            result = task(*args)
+        if root is None:
+            return result, None
+        root.end()
+        return result, root.to_dict()
+    finally:
+        # Marks the end of this job's progress stream
+        _progress_queue.put(('progress', job_id, None))
+
+
+class WorkerPool:
+    mode = 'process'
+    
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._context = multiprocessing.get_context('spawn')
+        self._progress_queue = self._context.Queue()
+        # One cancellation byte per concurrently running job
+        self._cancel_flags = self._context.RawArray('b', max_workers)
+        self._free_slots: List[int] = list(range(max_workers))
+        self._lock = threading.Lock()
+        self._executor = self._new_executor()
+        # job_id -> set once all of the job's progress has been relayed
+        self._drained: Dict[str, threading.Event] = {}
+        # worker pid -> that worker's model warmup report
+        self._warmup_reports: Dict[int, dict] = {}
+        self.restarts = 0
+        
+        self._listener = threading.Thread(
+            target=self._relay_progress,
+            name='worker-progress',
+            daemon=True
+        )
+        self._listener.start()
+    
+    def start(self):
+        """Spawn every worker now so models load before the first request"""
+        with self._lock:
+            for _ in range(self.max_workers):
+                self._executor.submit(_ping)
+    
+    def readiness(self) -> dict:
+        """Model warmup state across the workers (ready once all have warmed up)"""
+        with self._lock:
+            reports = list(self._warmup_reports.values())
+        return merge_reports(reports, self.max_workers)
+    
+    def run(self, job_id: str, analysis_type: str, args: tuple,
+            token: Optional[CancellationToken] = None):
+        """Run a task in a worker process and wait for its result"""
+        from services.analysis_tasks import AnalysisError
+        
+        drained = threading.Event()
+        with self._lock:
+            executor = self._executor
+            self._drained[job_id] = drained
+            slot = self._free_slots.pop() if token is not None and self._free_slots else -1
+        
+        if slot >= 0:
+            self._cancel_flags[slot] = 0
+            active = [True]
+            
+            def set_flag():
+                # The slot may belong to another job once this one returned
+                with self._lock:
+                    if active[0]:
+                        self._cancel_flags[slot] = 1
+            
+            token.on_cancel(set_flag)
+        
+        try:
+            trace = current_span() is not None
+            result, span_tree = executor.submit(_run_task, job_id, analysis_type, args, trace, slot).result()
+            attach(span_tree)
+            drained.wait(PROGRESS_DRAIN_TIMEOUT)
+            return result
+        except BrokenProcessPool:
+            self._restart(executor)
+            raise AnalysisError("Analysis worker crashed")
+        except BaseException:
+            # Also AnalysisCancelled
+            drained.wait(PROGRESS_DRAIN_TIMEOUT)
+            raise
+        finally:
+            with self._lock:
+                self._drained.pop(job_id, None)
+                if slot >= 0:
+                    active[0] = False
+                    self._cancel_flags[slot] = 0
+                    self._free_slots.append(slot)
+    
+    def shutdown(self):
+        with self._lock:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._progress_queue.put(None)
+    
+    def _new_executor(self) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=self._context,
+            initializer=_init_worker,
+            initargs=(self._progress_queue, self._cancel_flags)
+        )
+    
+    def _restart(self, broken: ProcessPoolExecutor):
+        """Replace a pool whose worker died (only once per broken pool)"""
+        with self._lock:
+            if self._executor is not broken:
+                return
+            print("Analysis worker died, restarting worker pool")
+            broken.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._new_executor()
+            self._warmup_reports.clear()
+            self.restarts += 1
+            for _ in range(self.max_workers):
+                self._executor.submit(_ping)
+    
+    def _relay_progress(self):
+        while True:
+            try:
+                item = self._progress_queue.get()
+            except (EOFError, OSError):
+                return
+            if item is None:
+                return
+            
+            if item[0] == 'metric':
+                try:
+                    apply_forwarded(*item[1:])
+                except Exception as e:
+                    print(f"Metric relay error: {e}")
+                continue
+            
+            if item[0] == 'warmup':
+                _, pid, report = item
+                with self._lock:
+                    self._warmup_reports[pid] = report
+                continue
+            
+            _, job_id, message = item
+            if message is None:
+                with self._lock:
+                    drained = self._drained.get(job_id)
+                if drained is not None:
+                    drained.set()
+                continue
+            
+            tracker = get_job_tracker(job_id)
+            if tracker is not None:
+                tracker.update(message)
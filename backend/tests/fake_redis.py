@@ -0,0 +1,190 @@
+"""
+A local stand-in for Redis: a threaded TCP server speaking RESP2 with the
+commands RedisBroker uses, so the broker runs over a real socket in tests.
+Expiry is accepted and ignored.
+"""
+import socketserver
+import threading
+import time
+from collections import deque
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), _Handler)
+        self.data = {}
+        self.cond = threading.Condition()
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+    
+    @property
+    def url(self) -> str:
+        return f"redis://127.0.0.1:{self.server_address[1]}/0"
+    
+    def start(self) -> 'FakeRedisServer':
+        self._thread.start()
+        return self
+    
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+    
+    # Commands - called with the condition held; arguments are bytes
+    
+    def _list(self, key, create=False):
+        value = self.data.get(key)
+        if value is None and create:
+            value = self.data[key] = deque()
+        return value
+    
+    def _pop(self, key, side):
+        items = self._list(key)
+        if not items:
+            return None
+        item = items.pop() if side == b'RIGHT' else items.popleft()
+        if not items:
+            del self.data[key]
+        return item
+    
+    def _push(self, key, side, *items):
+        target = self._list(key, create=True)
+        for item in items:
+            if side == b'RIGHT':
+                target.append(item)
+            else:
+                target.appendleft(item)
+        self.cond.notify_all()
+        return len(target)
+    
+    def run(self, name, args):
+        if name == b'PING':
+            return 'PONG'
+        if name in (b'SELECT', b'AUTH'):
+            return 'OK'
+        if name == b'EXPIRE':
+            return int(args[0] in self.data)
+        if name == b'SET':
+            self.data[args[0]] = args[1]
+            return 'OK'
+        if name == b'GET':
+            return self.data.get(args[0])
+        if name == b'DEL':
+            return sum(self.data.pop(key, None) is not None for key in args)
+        if name == b'EXISTS':
+            return sum(key in self.data for key in args)
+        if name == b'INCR':
+            value = int(self.data.get(args[0], b'0')) + 1
+            self.data[args[0]] = str(value).encode()
+            return value
+        if name == b'LPUSH':
+            return self._push(args[0], b'LEFT', *args[1:])
+        if name == b'RPUSH':
+            return self._push(args[0], b'RIGHT', *args[1:])
+        if name == b'LMOVE':
+            item = self._pop(args[0], args[2])
+            if item is not None:
+                self._push(args[1], args[3], item)
+            return item
+        if name == b'LREM':
+            items = self._list(args[0]) or deque()
+            removed = 0
+            for item in list(items):
+                if item == args[2]:
+                    items.remove(item)
+                    removed += 1
+            if not items:
+                self.data.pop(args[0], None)
+            return removed
+        if name == b'LINDEX':
+            items = self._list(args[0]) or ()
+            index = int(args[1])
+            return items[index] if -len(items) <= index < len(items) else None
+        if name == b'LRANGE':
+            items = list(self._list(args[0]) or ())
+            stop = int(args[2])
+            return items[int(args[1]):None if stop == -1 else stop + 1]
+        if name == b'LTRIM':
+            items = list(self._list(args[0]) or ())
+            stop = int(args[2])
+            kept = items[int(args[1]):None if stop == -1 else stop + 1]
+            if kept:
+                self.data[args[0]] = deque(kept)
+            else:
+                self.data.pop(args[0], None)
+            return 'OK'
+        if name == b'HSET':
+            fields = self.data.setdefault(args[0], {})
+            added = 0
+            for field, value in zip(args[1::2], args[2::2]):
+                added += field not in fields
+                fields[field] = value
+            return added
+        if name == b'HGETALL':
+            return [part for item in self.data.get(args[0], {}).items() for part in item]
+        if name == b'HDEL':
+            fields = self.data.get(args[0], {})
+            return sum(fields.pop(field, None) is not None for field in args[1:])
+        raise ValueError(f"unsupported command {name.decode()}")
+    
+    def run_blocking(self, name, args):
+        """BLPOP / BLMOVE: wait on the condition until the list has an item"""
+        end = time.monotonic() + float(args[-1])
+        while True:
+            if name == b'BLPOP':
+                for key in args[:-1]:
+                    item = self._pop(key, b'LEFT')
+                    if item is not None:
+                        return [key, item]
+            else:
+                item = self.run(b'LMOVE', args[:-1])
+                if item is not None:
+                    return item
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                return None
+            self.cond.wait(remaining)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server = self.server
+        while True:
+            command = self._read_command()
+            if command is None:
+                return
+            name, args = command[0].upper(), command[1:]
+            try:
+                with server.cond:
+                    if name in (b'BLPOP', b'BLMOVE'):
+                        reply = server.run_blocking(name, args)
+                    else:
+                        reply = server.run(name, args)
+            except Exception as e:
+                self.wfile.write(f"-ERR {e}\r\n".encode())
+                continue
+            self.wfile.write(_encode(reply))
+    
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        count = int(line[1:-2])
+        parts = []
+        for _ in range(count):
+            length = int(self.rfile.readline()[1:-2])
+            parts.append(self.rfile.read(length + 2)[:-2])
+        return parts
+
+
+def _encode(reply) -> bytes:
+    if reply is None:
+        return b'$-1\r\n'
+    if isinstance(reply, str):
+        return f"+{reply}\r\n".encode()
+    if isinstance(reply, int):
+        return f":{reply}\r\n".encode()
+    if isinstance(reply, bytes):
+        return b'$%d\r\n%s\r\n' % (len(reply), reply)
+    return b'*%d\r\n' % len(reply) + b''.join(_encode(item) for item in reply)
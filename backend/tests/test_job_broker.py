@@ -0,0 +1,227 @@
+"""
+Job broker contract tests: every broker queues, leases, cancels and relays
+events the same way. The Redis broker runs against tests.fake_redis over a
+real socket. Run from backend/: python -m unittest discover tests
+"""
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+import unittest
+import uuid
+
+from services.job_broker import (
+    CANCELLED, ERROR, PROGRESS, REQUEUED_MESSAGE, RESULT, MemoryBroker, RedisBroker, SQLiteBroker
+)
+from tests.fake_redis import FakeRedisServer
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PRIORITIES = {'image_quick': 10, 'video_comprehensive': 0}
+
+
+def make_job(analysis_type: str = 'video_comprehensive') -> dict:
+    return {
+        'job_id': uuid.uuid4().hex,
+        'analysis_type': analysis_type,
+        'priority': PRIORITIES[analysis_type],
+        'in_memory': False,
+        'extension': '.mp4',
+        'extra_args': [],
+    }
+
+
+def drain_events(broker, job_id: str, timeout: float = 1.0) -> list:
+    events = []
+    end = time.monotonic() + timeout
+    while time.monotonic() < end:
+        batch = broker.next_events(job_id, 0.1)
+        if not batch and events:
+            break
+        events.extend(batch)
+    return events
+
+
+class BrokerContract:
+    """Mixed into one TestCase per broker"""
+    def make_broker(self, **kwargs):
+        raise NotImplementedError
+    
+    def setUp(self):
+        self.broker = self.make_broker()
+        self.broker.heartbeat('worker-a', {'analysis_types': list(PRIORITIES)})
+    
+    def tearDown(self):
+        self.broker.close()
+    
+    def test_claim_streams_media_and_relays_events(self):
+        job = make_job()
+        chunks = [os.urandom(1000), os.urandom(1000), os.urandom(10)]
+        self.broker.enqueue(job, iter(chunks))
+        
+        claimed = self.broker.claim('worker-a', PRIORITIES, 1.0)
+        self.assertEqual(claimed['job_id'], job['job_id'])
+        self.assertEqual(b''.join(self.broker.read_media(job['job_id'])), b''.join(chunks))
+        
+        self.broker.publish(job['job_id'], PROGRESS, "halfway")
+        self.broker.publish(job['job_id'], RESULT, {'result': {'score': 0.5}, 'trace': None})
+        events = drain_events(self.broker, job['job_id'])
+        self.assertEqual(events, [(PROGRESS, "halfway"), (RESULT, {'result': {'score': 0.5}, 'trace': None})])
+        
+        self.broker.finish('worker-a', claimed)
+        self.assertEqual(list(self.broker.read_media(job['job_id'])), [])
+        self.assertIsNone(self.broker.claim('worker-a', PRIORITIES, 0.2))
+    
+    def test_claims_highest_priority_first(self):
+        video, image = make_job('video_comprehensive'), make_job('image_quick')
+        self.broker.enqueue(video, [b'v'])
+        self.broker.enqueue(image, [b'i'])
+        
+        self.assertEqual(self.broker.claim('worker-a', PRIORITIES, 1.0)['job_id'], image['job_id'])
+        self.assertEqual(self.broker.claim('worker-a', PRIORITIES, 1.0)['job_id'], video['job_id'])
+    
+    def test_claim_only_takes_served_types(self):
+        self.broker.enqueue(make_job('video_comprehensive'), [b'v'])
+        self.assertIsNone(self.broker.claim('worker-a', ['image_quick'], 0.2))
+    
+    def test_shared_path_job_has_no_media(self):
+        job = dict(make_job(), path='/shared/uploads/clip.mp4')
+        self.broker.enqueue(job, None)
+        
+        claimed = self.broker.claim('worker-a', PRIORITIES, 1.0)
+        self.assertEqual(claimed['path'], '/shared/uploads/clip.mp4')
+        self.assertEqual(list(self.broker.read_media(job['job_id'])), [])
+    
+    def test_cancel_queued_job(self):
+        job = make_job()
+        self.broker.enqueue(job, [b'x'])
+        self.broker.cancel(job['job_id'])
+        
+        self.assertEqual(drain_events(self.broker, job['job_id']), [(CANCELLED, None)])
+        self.assertIsNone(self.broker.claim('worker-a', PRIORITIES, 0.2))
+    
+    def test_cancel_claimed_job_flags_it(self):
+        job = make_job()
+        self.broker.enqueue(job, [b'x'])
+        claimed = self.broker.claim('worker-a', PRIORITIES, 1.0)
+        self.assertFalse(self.broker.is_cancelled(job['job_id']))
+        
+        self.broker.cancel(job['job_id'])
+        self.assertTrue(self.broker.is_cancelled(job['job_id']))
+        self.broker.finish('worker-a', claimed)
+        self.assertFalse(self.broker.is_cancelled(job['job_id']))
+
+
+class LeaseContract(BrokerContract):
+    """Brokers shared between processes: a claim only lasts as long as its worker"""
+    def test_worker_killed_mid_job_is_requeued(self):
+        broker = self.make_broker(lease_seconds=1.0)
+        job = make_job()
+        media = os.urandom(3 * 1024 * 1024 + 17)
+        broker.enqueue(job, [media[i:i + 1024 * 1024] for i in range(0, len(media), 1024 * 1024)])
+        
+        # A worker process claims the job, starts on it, and is killed
+        script = textwrap.dedent(f"""
+            import time
+            from services.job_broker import create_broker
+            broker = create_broker({self.url!r})
+            broker.heartbeat('doomed', {{'analysis_types': {list(PRIORITIES)!r}}})
+            job = broker.claim('doomed', {list(PRIORITIES)!r}, 5)
+            next(iter(broker.read_media(job['job_id'])))
+            print(job['job_id'], flush=True)
+            time.sleep(60)
+        """)
+        worker = subprocess.Popen([sys.executable, '-c', script], cwd=BACKEND_DIR,
+                                  stdout=subprocess.PIPE, text=True)
+        try:
+            self.assertEqual(worker.stdout.readline().strip(), job['job_id'])
+            # Held while the lease is fresh
+            broker.heartbeat('survivor', {'analysis_types': list(PRIORITIES)})
+            self.assertIsNone(broker.claim('survivor', PRIORITIES, 0.3))
+            worker.send_signal(signal.SIGKILL)
+            worker.wait(5)
+        finally:
+            worker.kill()
+            worker.stdout.close()
+        
+        deadline = time.monotonic() + 5
+        claimed = None
+        while claimed is None and time.monotonic() < deadline:
+            broker.heartbeat('survivor', {'analysis_types': list(PRIORITIES)})
+            claimed = broker.claim('survivor', PRIORITIES, 0.5)
+        self.assertIsNotNone(claimed, "job of the killed worker was never requeued")
+        self.assertEqual(claimed['job_id'], job['job_id'])
+        self.assertEqual(b''.join(broker.read_media(job['job_id'])), media)
+        self.assertIn((PROGRESS, REQUEUED_MESSAGE), drain_events(broker, job['job_id']))
+        
+        broker.finish('survivor', claimed)
+        self.assertIsNone(broker.claim('survivor', PRIORITIES, 0.2))
+        broker.close()
+    
+    def test_job_fails_after_max_deliveries(self):
+        broker = self.make_broker(lease_seconds=0.3, max_deliveries=1)
+        job = make_job()
+        broker.enqueue(job, [b'x'])
+        broker.heartbeat('lost', {'analysis_types': list(PRIORITIES)})
+        self.assertIsNotNone(broker.claim('lost', PRIORITIES, 1.0))
+        
+        time.sleep(0.5)
+        broker.heartbeat('next', {'analysis_types': list(PRIORITIES)})
+        self.assertIsNone(broker.claim('next', PRIORITIES, 0.5))
+        kinds = [kind for kind, _ in drain_events(broker, job['job_id'])]
+        self.assertEqual(kinds, [PROGRESS, ERROR])
+        broker.close()
+    
+    def test_finish_after_lost_lease_keeps_new_claim(self):
+        broker = self.make_broker(lease_seconds=0.3)
+        job = make_job()
+        broker.enqueue(job, [b'x'])
+        broker.heartbeat('slow', {'analysis_types': list(PRIORITIES)})
+        stale = broker.claim('slow', PRIORITIES, 1.0)
+        
+        time.sleep(0.5)
+        broker.heartbeat('next', {'analysis_types': list(PRIORITIES)})
+        self.assertIsNotNone(broker.claim('next', PRIORITIES, 1.0))
+        broker.finish('slow', stale)
+        self.assertEqual(list(broker.read_media(job['job_id'])), [b'x'])
+        broker.close()
+
+
+class MemoryBrokerTest(BrokerContract, unittest.TestCase):
+    def make_broker(self, **kwargs):
+        return MemoryBroker(**kwargs)
+
+
+class SQLiteBrokerTest(LeaseContract, unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.url = f"sqlite:///{os.path.join(self.directory.name, 'jobs.db')}"
+        super().setUp()
+    
+    def tearDown(self):
+        super().tearDown()
+        self.directory.cleanup()
+    
+    def make_broker(self, **kwargs):
+        return SQLiteBroker(self.url[len('sqlite:///'):], **kwargs)
+
+
+class RedisBrokerTest(LeaseContract, unittest.TestCase):
+    def setUp(self):
+        self.server = FakeRedisServer().start()
+        self.url = self.server.url
+        super().setUp()
+    
+    def tearDown(self):
+        super().tearDown()
+        self.server.stop()
+    
+    def make_broker(self, **kwargs):
+        return RedisBroker(self.url, PRIORITIES, **kwargs)
+
+
+if __name__ == '__main__':
+    unittest.main()
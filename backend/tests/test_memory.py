@@ -0,0 +1,50 @@
+"""
+Memory accounting on platforms without resource (Windows) or /proc (macOS):
+the metrics module still imports and records what is known. Run from
+backend/: python -m unittest discover tests
+"""
+import os
+import subprocess
+import sys
+import textwrap
+import unittest
+from unittest import mock
+
+import utils.memory
+import utils.metrics
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class MissingResourceTest(unittest.TestCase):
+    def test_metrics_import_without_resource(self):
+        # A fresh interpreter where `import resource` fails, as on Windows
+        script = textwrap.dedent("""
+            import sys
+            sys.modules['resource'] = None
+            import utils.metrics
+            from utils.memory import peak_rss_bytes, track_memory
+            assert peak_rss_bytes() == 0
+            with track_memory() as usage:
+                pass
+        """)
+        subprocess.run([sys.executable, '-c', script], cwd=BACKEND_DIR, check=True)
+    
+    def test_layer_without_current_rss(self):
+        with mock.patch.object(utils.memory, 'CURRENT_RSS_AVAILABLE', False), \
+                mock.patch.object(utils.metrics.config, 'MEMORY_ACCOUNTING_ENABLED', True):
+            self.assertEqual(utils.memory.current_rss_bytes(), 0)
+            with utils.memory.track_memory() as usage:
+                pass
+            self.assertIsNone(usage.rss_growth)
+            self.assertEqual(usage.rss_peak, utils.memory.peak_rss_bytes())
+            self.assertNotIn('rss_growth_mb', usage.as_attrs())
+            
+            with utils.metrics.layer_section('test_layer_without_current_rss'):
+                pass
+        growth = utils.metrics.LAYER_RSS_GROWTH.render()
+        self.assertNotIn('test_layer_without_current_rss', growth)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+"""
+Model bundle round trips: weights written by the bundler load into the
+module the loader builds. Needs torch, safetensors and facenet_pytorch;
+skipped without them. Run from backend/: python -m unittest discover tests
+"""
+import os
+import tempfile
+import unittest
+
+try:
+    import torch
+    import safetensors  # noqa: F401
+    from facenet_pytorch import InceptionResnetV1
+except ImportError:
+    torch = None
+
+from models.model_bundle import FACENET_UNUSED_PREFIXES, _save_weights, assign_bundled_weights, load_safetensors_mmap
+
+# Identities of the VGGFace2 classifier, as InceptionResnetV1(pretrained='vggface2') builds it
+VGGFACE2_CLASSES = 8631
+
+
+@unittest.skipIf(torch is None, "needs torch, safetensors and facenet_pytorch")
+class FaceNetBundleTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'facenet.safetensors')
+        # The layers _bundle_facenet saves, without downloading the checkpoint
+        self.bundled = InceptionResnetV1(classify=True, num_classes=VGGFACE2_CLASSES).eval()
+        self.bundled.classify = False
+        self.assertIn('logits.weight', self.bundled.state_dict())
+    
+    def tearDown(self):
+        self.directory.cleanup()
+    
+    def test_bundle_holds_exactly_the_embedder_weights(self):
+        _save_weights(self.bundled, self.path, exclude_prefixes=FACENET_UNUSED_PREFIXES)
+        embedder = InceptionResnetV1(pretrained=None)
+        self.assertEqual(set(load_safetensors_mmap(self.path)), set(embedder.state_dict()))
+        
+        assign_bundled_weights(embedder, self.path, ignore_prefixes=FACENET_UNUSED_PREFIXES)
+        embedder.eval()
+        image = torch.rand(1, 3, 160, 160)
+        with torch.no_grad():
+            self.assertTrue(torch.equal(embedder(image), self.bundled(image)))
+    
+    def test_bundle_with_classifier_still_loads(self):
+        _save_weights(self.bundled, self.path)
+        embedder = InceptionResnetV1(pretrained=None)
+        with self.assertRaises(ValueError):
+            assign_bundled_weights(embedder, self.path)
+        assign_bundled_weights(embedder, self.path, ignore_prefixes=FACENET_UNUSED_PREFIXES)
+
+
+if __name__ == '__main__':
+    unittest.main()
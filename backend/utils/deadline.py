@@ -0,0 +1,95 @@
+"""
+Per-request latency budgets (deadline_ms).
+
+A Deadline is an absolute wall-clock time, so it keeps counting while the
+job waits in the queue and can be passed to worker processes as-is. The
+comprehensive analyzers ask it whether a layer still fits before running
+it, using the layer's typical duration in this process (see
+utils.metrics.layer_cost_estimate) or a conservative default before the
+layer has run once.
+"""
+import math
+import time
+from typing import Iterable, Optional
+
+from utils.metrics import layer_cost_estimate
+
+# Fallback layer durations (seconds, CPU) until a layer has been measured
+DEFAULT_LAYER_SECONDS = {
+    'analyze_temporal_consistency': 8.0,
+    'analyze_with_3d_model': 15.0,
+    'analyze_audio_stream': 5.0,
+    'analyze_physiological_signals': 4.0,
+    'analyze_physics_consistency': 10.0,
+    'analyze_boundaries': 3.0,
+    'analyze_region_compression': 3.0,
+    'predict_ensemble': 1.0,
+    'analyze_frequency_domain': 0.5,
+    'analyze_face': 1.0,
+    'analyze_metadata': 1.0,
+}
+
+# Frames always analyzed, however tight the budget
+MIN_DEADLINE_FRAMES = 8
+
+
+class Deadline:
+    def __init__(self, expires_at: Optional[float] = None):
+        self.expires_at = expires_at
+    
+    @classmethod
+    def from_budget_ms(cls, deadline_ms: Optional[float], start: Optional[float] = None) -> 'Deadline':
+        if not deadline_ms:
+            return cls(None)
+        return cls((start or time.time()) + deadline_ms / 1000.0)
+    
+    @property
+    def enabled(self) -> bool:
+        return self.expires_at is not None
+    
+    def remaining(self) -> float:
+        """Seconds left (infinite without a deadline, negative once missed)"""
+        if self.expires_at is None:
+            return math.inf
+        return self.expires_at - time.time()
+    
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+    
+    def fits(self, layer: str, then: Iterable[str] = ()) -> bool:
+        """
+        Whether layer can still run while leaving time for the layers
+        in `then`, which must run after it.
+        """
+        if self.expires_at is None:
+            return True
+        return self.remaining() >= self.estimate([layer, *then])
+    
+    @staticmethod
+    def estimate(layers: Iterable[str]) -> float:
+        """Expected seconds to run all of layers"""
+        return sum(estimate_layer_seconds(layer) for layer in layers)
+
+
+def estimate_layer_seconds(layer: str) -> float:
+    estimate = layer_cost_estimate(layer)
+    if estimate is None:
+        estimate = DEFAULT_LAYER_SECONDS.get(layer, 1.0)
+    return estimate
+
+
+def spread_order(count: int) -> list:
+    """
+    Indices 0..count-1 ordered coarse-to-fine (0, n/2, n/4, 3n/4, ...) so
+    that stopping after any prefix still covers the whole video evenly.
+    """
+    order = []
+    seen = set()
+    step = 1 << max(0, (count - 1).bit_length())
+    while step >= 1:
+        for i in range(0, count, step):
+            if i not in seen:
+                seen.add(i)
+                order.append(i)
+        step //= 2
+    return order
@@ -0,0 +1,66 @@
+"""
+JSON encoding of analysis results.
+
+Results are encoded as they are: typed result objects (anything with a
+to_json() returning its fields), numpy scalars and arrays and array.array
+are handled by the encoder's fallback hook, only when one is met - there is
+no conversion pass over the result first. orjson is used when installed
+(several times faster, numpy handled natively); otherwise the stdlib C
+encoder. Either way NaN and infinities are written as null, as orjson does.
+"""
+import json
+import math
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _default(obj):
+    to_json = getattr(obj, 'to_json', None)
+    if to_json is not None:
+        return to_json()
+    # numpy scalars and arrays, array.array
+    tolist = getattr(obj, 'tolist', None)
+    if tolist is not None:
+        return tolist()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def _finite(obj):
+    """obj with NaN and infinities replaced by None (stdlib encoder only)"""
+    if isinstance(obj, float):
+        return obj if math.isfinite(obj) else None
+    if isinstance(obj, (str, int, type(None))):
+        return obj
+    if isinstance(obj, dict):
+        return {key: _finite(value) for key, value in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return [_finite(item) for item in obj]
+    return _finite(_default(obj))
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj) -> bytes:
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+
+    loads = orjson.loads
+else:
+    _encoder = json.JSONEncoder(default=_default, separators=(',', ':'), ensure_ascii=False, allow_nan=False)
+
+    def dumps(obj) -> bytes:
+        try:
+            return _encoder.encode(obj).encode('utf-8')
+        except ValueError:
+            # Non-finite floats are rare: only then is the result walked to null them
+            return _encoder.encode(_finite(obj)).encode('utf-8')
+
+    loads = json.loads
+
+
+def dumps_str(obj) -> str:
+    """dumps() as text, for TEXT columns and JSONL lines"""
+    return dumps(obj).decode('utf-8')
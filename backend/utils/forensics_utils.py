@@ -45,8 +45,9 @@ def apply_ela(image_path, quality=95):
     """
     import io
     from PIL import Image
+    from utils.image_utils import open_image
     
-    original = Image.open(image_path).convert('RGB')
+    original = open_image(image_path).convert('RGB')
     
     # Resave at specified quality
     temp_buffer = io.BytesIO()
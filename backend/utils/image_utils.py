@@ -1,7 +1,15 @@
+import io
+
 from PIL import Image
 
+def open_image(source):
+    """Open an image from a file path or from raw bytes held in memory"""
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+    return Image.open(source)
+
 def preprocess_image(image_path):
-    img = Image.open(image_path).convert("RGB")
+    img = open_image(image_path).convert("RGB")
     img = img.resize((299, 299))
     return img
 
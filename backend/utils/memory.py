@@ -0,0 +1,196 @@
+"""
+Process memory helpers (stdlib only).
+
+track_memory() measures the memory high-water marks of a block: the RSS
+peak (sampled by a background thread while any tracked block is running)
+and, once start_tracemalloc() has been called, the Python heap peak from
+tracemalloc. Blocks may nest and run concurrently; RSS is per process, so
+concurrent blocks also see each other's allocations.
+
+Outside Linux the current RSS can't be read: a block's RSS peak is then the
+process's lifetime peak (0 on Windows) and its RSS growth is unknown.
+"""
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import types
+from contextlib import contextmanager
+from typing import List, Optional
+
+try:
+    import resource
+except ImportError:
+    # Windows: no RSS figures
+    resource = None
+
+# How often the RSS of a tracked block is sampled
+RSS_SAMPLE_SECONDS = 0.02
+
+# The current RSS is read from /proc, so it is only known on Linux
+CURRENT_RSS_AVAILABLE = os.path.exists('/proc/self/statm')
+
+
+def current_rss_bytes() -> int:
+    """
+    Resident set size of this process right now - 0 if unknown (outside
+    Linux; the peak RSS is not passed off as the current one there).
+    """
+    if not CURRENT_RSS_AVAILABLE:
+        return 0
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def peak_rss_bytes() -> int:
+    """Highest RSS this process has reached (0 if unknown, on Windows)"""
+    if resource is None:
+        return 0
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def torch_module_bytes(obj, _depth: int = 0) -> int:
+    """
+    Parameter + buffer bytes of every torch module reachable from obj
+    (directly, or through tuples/lists/dicts and object attributes).
+    """
+    if _depth > 3 or obj is None:
+        return 0
+    
+    # Duck-typed torch.nn.Module (avoids importing torch here)
+    if hasattr(obj, 'state_dict') and callable(getattr(obj, 'parameters', None)) \
+            and callable(getattr(obj, 'buffers', None)):
+        try:
+            tensors = list(obj.parameters()) + list(obj.buffers())
+            return sum(t.numel() * t.element_size() for t in tensors)
+        except Exception:
+            return 0
+    
+    if isinstance(obj, (list, tuple, set)):
+        return sum(torch_module_bytes(item, _depth + 1) for item in obj)
+    if isinstance(obj, dict):
+        return sum(torch_module_bytes(item, _depth + 1) for item in obj.values())
+    if hasattr(obj, '__dict__') and not isinstance(obj, (type, types.ModuleType)):
+        return sum(torch_module_bytes(item, _depth + 1) for item in vars(obj).values())
+    return 0
+
+
+class MemoryUsage:
+    """High-water marks of one tracked block, in bytes"""
+    def __init__(self, rss_start: int, python_start: Optional[int], rss_sampled: bool = True):
+        self.rss_start = rss_start
+        self.rss_peak = rss_start
+        # False where only the process's lifetime RSS peak is known
+        self.rss_sampled = rss_sampled
+        # Traced Python heap at the start and its peak (None without tracemalloc)
+        self.python_start = python_start
+        self.python_peak = python_start
+    
+    @property
+    def rss_growth(self) -> Optional[int]:
+        if not self.rss_sampled:
+            return None
+        return max(0, self.rss_peak - self.rss_start)
+    
+    @property
+    def python_growth(self) -> Optional[int]:
+        if self.python_start is None:
+            return None
+        return max(0, self.python_peak - self.python_start)
+    
+    def as_attrs(self) -> dict:
+        """Span attributes, in MB"""
+        attrs = {}
+        if self.rss_peak:
+            attrs['rss_peak_mb'] = round(self.rss_peak / 1e6, 1)
+        if self.rss_growth is not None:
+            attrs['rss_growth_mb'] = round(self.rss_growth / 1e6, 1)
+        if self.python_start is not None:
+            attrs['python_peak_mb'] = round(self.python_growth / 1e6, 1)
+        return attrs
+
+
+_active: List[MemoryUsage] = []
+_lock = threading.Lock()
+_wakeup = threading.Condition(_lock)
+# (pid, thread) of the RSS sampler - a forked child has to start its own
+_sampler: Optional[tuple] = None
+
+
+def start_tracemalloc(frames: int = 1):
+    """Trace Python allocations from now on (slows allocation-heavy code down)"""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def _fold_python_peak_locked():
+    """
+    Credit tracemalloc's peak to every active block, then reset it, so
+    a block starting or ending doesn't erase what the others have seen.
+    """
+    if not tracemalloc.is_tracing():
+        return
+    _, peak = tracemalloc.get_traced_memory()
+    for usage in _active:
+        if usage.python_peak is not None:
+            usage.python_peak = max(usage.python_peak, peak)
+    tracemalloc.reset_peak()
+
+
+def _fold_rss_locked(rss: int):
+    for usage in _active:
+        usage.rss_peak = max(usage.rss_peak, rss)
+
+
+def _sample_loop():
+    while True:
+        with _wakeup:
+            while not _active:
+                _wakeup.wait()
+        rss = current_rss_bytes()
+        with _lock:
+            _fold_rss_locked(rss)
+        time.sleep(RSS_SAMPLE_SECONDS)
+
+
+def _ensure_sampler_locked():
+    global _sampler
+    if not CURRENT_RSS_AVAILABLE:
+        return
+    if _sampler is not None and _sampler[0] == os.getpid() and _sampler[1].is_alive():
+        return
+    thread = threading.Thread(target=_sample_loop, name='rss-sampler', daemon=True)
+    thread.start()
+    _sampler = (os.getpid(), thread)
+
+
+def _rss_bytes() -> int:
+    return current_rss_bytes() if CURRENT_RSS_AVAILABLE else peak_rss_bytes()
+
+
+@contextmanager
+def track_memory():
+    """Yield a MemoryUsage that holds the block's high-water marks once it exits"""
+    rss = _rss_bytes()
+    with _wakeup:
+        _fold_python_peak_locked()
+        _fold_rss_locked(rss)
+        python_start = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        usage = MemoryUsage(rss, python_start, rss_sampled=CURRENT_RSS_AVAILABLE)
+        _active.append(usage)
+        _ensure_sampler_locked()
+        _wakeup.notify()
+    try:
+        yield usage
+    finally:
+        rss = _rss_bytes()
+        with _lock:
+            _fold_python_peak_locked()
+            _fold_rss_locked(rss)
+            _active.remove(usage)
@@ -0,0 +1,381 @@
+"""
+Prometheus-style metrics, rendered in the text exposition format by /metrics.
+
+Kept dependency-free: counters, gauges and histograms with labels, plus
+gauges/counters whose values are collected at scrape time (queue depth,
+cache stats). Worker processes forward their observations to the API
+process (see set_forwarder) so layer timings show up in either worker mode.
+"""
+import functools
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import config
+from utils.memory import MemoryUsage, start_tracemalloc, track_memory
+from utils.tracing import span
+
+# Latency buckets (seconds) - from a single frame up to a long video
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+# Memory buckets (bytes) - doubling from 1 MiB to 32 GiB
+MEMORY_BUCKETS = tuple(float(2 ** power) for power in range(20, 36))
+
+# When set (in worker processes), updates are sent here instead of being applied locally
+_forwarder: Optional[Callable] = None
+
+
+def set_forwarder(forwarder: Optional[Callable[[str, str, dict, float], None]]):
+    """Route every metric update through forwarder(kind, name, labels, value)"""
+    global _forwarder
+    _forwarder = forwarder
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    pairs = ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items())
+    return '{' + pairs + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    type_name = ''
+    
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 collect: Optional[Callable[[], Iterable[Tuple[dict, float]]]] = None):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        # collect() -> [(labels, value)], evaluated at scrape time instead of stored values
+        self.collect = collect
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+        REGISTRY.register(self)
+    
+    def _key(self, labels: dict) -> tuple:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+    
+    def _forward(self, kind: str, value: float, labels: dict) -> bool:
+        if _forwarder is None:
+            return False
+        try:
+            _forwarder(kind, self.name, labels, value)
+        except Exception as e:
+            print(f"Metric forward error: {e}")
+        return True
+    
+    def samples(self) -> List[Tuple[str, dict, float]]:
+        if self.collect is not None:
+            try:
+                return [(self.name, labels, value) for labels, value in self.collect()]
+            except Exception as e:
+                print(f"Metric collect error ({self.name}): {e}")
+                return []
+        with self._lock:
+            return [
+                (self.name, dict(zip(self.labelnames, key)), value)
+                for key, value in self._values.items()
+            ]
+    
+    def render(self) -> str:
+        lines = [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+        for name, labels, value in self.samples():
+            lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    type_name = 'counter'
+    
+    def inc(self, amount: float = 1, **labels):
+        if self._forward('inc', amount, labels):
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    type_name = 'gauge'
+    
+    def set(self, value: float, **labels):
+        if self._forward('set', value, labels):
+            return
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    type_name = 'histogram'
+    
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+        # labels key -> [per-bucket counts, sum, count]
+        self._series: Dict[tuple, list] = {}
+    
+    def observe(self, value: float, **labels):
+        if self._forward('observe', value, labels):
+            return
+        key = self._key(labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+    
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+    
+    def samples(self) -> List[Tuple[str, dict, float]]:
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in self._series.items():
+                labels = dict(zip(self.labelnames, key))
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    samples.append((f"{self.name}_bucket", {**labels, 'le': _format_value(bound)}, cumulative))
+                samples.append((f"{self.name}_sum", labels, total))
+                samples.append((f"{self.name}_count", labels, count))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+    
+    def register(self, metric: _Metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} already registered")
+            self._metrics[metric.name] = metric
+    
+    def get(self, name: str) -> Optional[_Metric]:
+        with self._lock:
+            return self._metrics.get(name)
+    
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+REGISTRY = Registry()
+
+
+def apply_forwarded(kind: str, name: str, labels: dict, value: float):
+    """Apply an update forwarded from a worker process"""
+    metric = REGISTRY.get(name)
+    if metric is None:
+        return
+    getattr(metric, kind)(value, **labels)
+
+
+# Shared metrics
+HTTP_REQUEST_DURATION = Histogram(
+    'veritas_http_request_duration_seconds',
+    'HTTP request latency by route',
+    ['method', 'route', 'status']
+)
+LAYER_DURATION = Histogram(
+    'veritas_layer_duration_seconds',
+    'Time spent in each analysis layer/analyzer call',
+    ['layer']
+)
+LAYER_ERRORS = Counter(
+    'veritas_layer_errors_total',
+    'Analysis layer calls that raised',
+    ['layer']
+)
+LAYER_PEAK_RSS = Histogram(
+    'veritas_layer_peak_rss_bytes',
+    'Process RSS high-water mark while each layer/analyzer call ran',
+    ['layer'],
+    buckets=MEMORY_BUCKETS
+)
+LAYER_RSS_GROWTH = Histogram(
+    'veritas_layer_rss_growth_bytes',
+    'RSS high-water mark of each layer call above the RSS it started at',
+    ['layer'],
+    buckets=MEMORY_BUCKETS
+)
+LAYER_PYTHON_PEAK = Histogram(
+    'veritas_layer_python_peak_bytes',
+    'tracemalloc high-water mark of each layer call above its starting heap (MEMORY_TRACEMALLOC)',
+    ['layer'],
+    buckets=MEMORY_BUCKETS
+)
+MODEL_LOAD_SECONDS = Gauge(
+    'veritas_model_load_seconds',
+    'Time taken by the most recent load of each model',
+    ['model']
+)
+
+
+# Per-process moving average of each layer's duration (kept even when
+# forwarding), used by utils.deadline to decide what fits in a budget
+_layer_costs: Dict[str, float] = {}
+_layer_costs_lock = threading.Lock()
+
+
+def _record_layer_cost(layer: str, seconds: float):
+    with _layer_costs_lock:
+        previous = _layer_costs.get(layer)
+        _layer_costs[layer] = seconds if previous is None else 0.7 * previous + 0.3 * seconds
+
+
+def layer_cost_estimate(layer: str) -> Optional[float]:
+    """Typical duration of a layer in this process, or None if it has not run yet"""
+    with _layer_costs_lock:
+        return _layer_costs.get(layer)
+
+
+def _memory_tracking():
+    if not config.MEMORY_ACCOUNTING_ENABLED:
+        return nullcontext()
+    if config.MEMORY_TRACEMALLOC:
+        start_tracemalloc()
+    return track_memory()
+
+
+def _record_layer_memory(layer: str, usage: MemoryUsage, layer_span):
+    # Unknown on some platforms (see utils.memory) - not recorded as zeros
+    if usage.rss_peak:
+        LAYER_PEAK_RSS.observe(usage.rss_peak, layer=layer)
+    if usage.rss_growth is not None:
+        LAYER_RSS_GROWTH.observe(usage.rss_growth, layer=layer)
+    if usage.python_growth is not None:
+        LAYER_PYTHON_PEAK.observe(usage.python_growth, layer=layer)
+    if layer_span is not None:
+        layer_span.attrs.update(usage.as_attrs())
+
+
+@contextmanager
+def layer_section(layer: str, **attrs):
+    """
+    Account a block as one analysis layer: its duration, errors and memory
+    high-water marks go to the layer metrics, and it runs in a trace span
+    (yielded - None outside a trace) that carries the memory figures too.
+    """
+    start = time.perf_counter()
+    layer_span = usage = None
+    try:
+        with span(layer, **attrs) as layer_span, _memory_tracking() as usage:
+            yield layer_span
+    except Exception:
+        LAYER_ERRORS.inc(layer=layer)
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        _record_layer_cost(layer, duration)
+        LAYER_DURATION.observe(duration, layer=layer)
+        if usage is not None:
+            _record_layer_memory(layer, usage, layer_span)
+
+
+def timed_layer(name: Optional[str] = None):
+    """
+    Decorator running every call as a layer_section: its duration under
+    veritas_layer_duration_seconds, its memory high-water marks under
+    veritas_layer_*_bytes, and a trace span for ?trace=1 output.
+    """
+    def decorator(func):
+        layer = name or func.__name__
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with layer_section(layer):
+                return func(*args, **kwargs)
+        
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def time_model_load(model: str):
+    """Record how long loading a model took"""
+    start = time.perf_counter()
+    yield
+    duration = time.perf_counter() - start
+    MODEL_LOAD_SECONDS.set(round(duration, 3), model=model)
+    print(f"{model} loaded in {duration:.1f}s")
+
+
+class MetricsMiddleware:
+    """ASGI middleware timing every HTTP request, labelled by route template"""
+    def __init__(self, app):
+        self.app = app
+        self._routes: Dict[object, str] = {}
+    
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        
+        start = time.perf_counter()
+        state = {'status': 500, 'streaming': False}
+        
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                state['status'] = message['status']
+                for header, value in message.get('headers', []):
+                    if header.lower() == b'content-type' and value.startswith(b'text/event-stream'):
+                        state['streaming'] = True
+            await send(message)
+        
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # SSE connections stay open for minutes - not request latency
+            if not state['streaming']:
+                HTTP_REQUEST_DURATION.observe(
+                    time.perf_counter() - start,
+                    method=scope['method'],
+                    route=self._route_for(scope),
+                    status=state['status']
+                )
+    
+    def _route_for(self, scope) -> str:
+        """Route template (e.g. /jobs/{job_id}) so IDs don't explode the label set"""
+        endpoint = scope.get('endpoint')
+        if endpoint is None:
+            return 'unmatched'
+        route = self._routes.get(endpoint)
+        if route is None:
+            route = 'unmatched'
+            for candidate in getattr(scope.get('app'), 'routes', []):
+                if getattr(candidate, 'endpoint', None) is endpoint:
+                    route = candidate.path
+                    break
+            self._routes[endpoint] = route
+        return route
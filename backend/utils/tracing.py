@@ -0,0 +1,197 @@
+"""
+Per-request stage tracing (opt-in with ?trace=1).
+
+A trace is a tree of spans, each with wall time and CPU time (CPU of the
+thread that ran it). The active span lives in a contextvar, so nested
+span()/@traced calls attach themselves to whatever request is being traced
+and cost a single contextvar lookup when nothing is.
+
+Traces are returned in the JSON response and, when TRACE_DIR is set, also
+written there as Chrome trace files (open in chrome://tracing or Perfetto).
+"""
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, Union
+
+import config
+
+
+class Span:
+    def __init__(self, name: str, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.children: list = []
+        self.ts = time.time()
+        self.pid = os.getpid()
+        self.tid = threading.get_ident()
+        self.wall: Optional[float] = None
+        self.cpu: Optional[float] = None
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.thread_time()
+    
+    def end(self):
+        if self.wall is None:
+            self.wall = time.perf_counter() - self._wall_start
+            self.cpu = self._elapsed_cpu()
+    
+    def _elapsed_cpu(self) -> float:
+        # Thread CPU clocks are per thread; a span handed across threads
+        # (request -> worker) reports the CPU of its children instead
+        if threading.get_ident() != self.tid:
+            return sum(
+                (child.cpu or 0.0) if isinstance(child, Span) else child['cpu']
+                for child in list(self.children)
+            )
+        return time.thread_time() - self._cpu_start
+    
+    def add_child(self, child: Union['Span', dict]):
+        """Attach a span, or a span serialized by to_dict() in another process"""
+        self.children.append(child)
+    
+    def to_dict(self) -> dict:
+        """Raw form with absolute timestamps - safe to pickle across processes"""
+        wall = self.wall if self.wall is not None else time.perf_counter() - self._wall_start
+        cpu = self.cpu if self.cpu is not None else self._elapsed_cpu()
+        return {
+            'name': self.name,
+            'ts': self.ts,
+            'wall': wall,
+            'cpu': cpu,
+            'pid': self.pid,
+            'tid': self.tid,
+            'attrs': self.attrs,
+            'children': [
+                child.to_dict() if isinstance(child, Span) else child
+                for child in list(self.children)
+            ],
+        }
+
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar(
+    'current_trace_span', default=None
+)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def start_trace(name: str, **attrs) -> Span:
+    """Root span for a traced request (not bound - see use_span)"""
+    return Span(name, **attrs)
+
+
+@contextmanager
+def use_span(span_: Optional[Span]):
+    """Make span_ the parent of spans opened in this context (no-op for None)"""
+    if span_ is None:
+        yield None
+        return
+    token = _current_span.set(span_)
+    try:
+        yield span_
+    finally:
+        _current_span.reset(token)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Record a child span of the active span; does nothing outside a trace"""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+    
+    child = Span(name, **attrs)
+    parent.add_child(child)
+    token = _current_span.set(child)
+    try:
+        yield child
+    finally:
+        child.end()
+        _current_span.reset(token)
+
+
+def traced(name: Optional[str] = None):
+    """Decorator: run the function inside a span named after it"""
+    def decorator(func):
+        span_name = name or func.__name__
+        
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if _current_span.get() is None:
+                return func(*args, **kwargs)
+            with span(span_name):
+                return func(*args, **kwargs)
+        
+        return wrapper
+    return decorator
+
+
+def attach(span_dict: dict):
+    """Graft a serialized span (e.g. from a worker process) onto the active span"""
+    parent = _current_span.get()
+    if parent is not None and span_dict:
+        parent.add_child(span_dict)
+
+
+def format_trace(raw: dict, origin: Optional[float] = None) -> dict:
+    """Response form: times in ms, starts relative to the root span"""
+    if origin is None:
+        origin = raw['ts']
+    node = {
+        'name': raw['name'],
+        'start_ms': round((raw['ts'] - origin) * 1000, 2),
+        'wall_ms': round(raw['wall'] * 1000, 2),
+        'cpu_ms': round(raw['cpu'] * 1000, 2),
+    }
+    if raw['attrs']:
+        node['attrs'] = raw['attrs']
+    if raw['children']:
+        node['children'] = [format_trace(child, origin) for child in raw['children']]
+    return node
+
+
+def to_chrome_trace(raw: dict) -> dict:
+    """Chrome trace event format ('X' complete events, microseconds)"""
+    events = []
+    
+    def walk(node):
+        events.append({
+            'name': node['name'],
+            'ph': 'X',
+            'ts': int(node['ts'] * 1e6),
+            'dur': int(node['wall'] * 1e6),
+            'pid': node['pid'],
+            'tid': node['tid'],
+            'args': {'cpu_ms': round(node['cpu'] * 1000, 2), **node['attrs']},
+        })
+        for child in node['children']:
+            walk(child)
+    
+    walk(raw)
+    return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+def finish_trace(root: Span, trace_id: str) -> dict:
+    """End the root span and build the response tree (writing the Chrome trace if enabled)"""
+    root.end()
+    raw = root.to_dict()
+    result = format_trace(raw)
+    
+    if config.TRACE_DIR:
+        path = os.path.join(config.TRACE_DIR, f"{trace_id}.trace.json")
+        try:
+            os.makedirs(config.TRACE_DIR, exist_ok=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(to_chrome_trace(raw), f)
+            result['chrome_trace_file'] = path
+        except Exception as e:
+            print(f"Trace write error: {e}")
+    
+    return result
@@ -0,0 +1 @@
+"""Command-line tools for the V.E.R.I.T.A.S backend (python -m veritas)"""
@@ -0,0 +1,119 @@
+"""
+python -m veritas <command>
+
+Commands:
+    bundle   download every model into an offline bundle (see MODEL_BUNDLE_DIR)
+    worker   serve analysis jobs from a job broker (see ANALYSIS_WORKER_MODE=broker)
+    scan     analyze every image and video under a directory into a resumable JSONL file
+"""
+import argparse
+import os
+import sys
+
+# Run from anywhere: the backend modules import each other as top-level packages
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import config
+
+
+def cmd_bundle(args) -> int:
+    from models.model_bundle import create_bundle
+    
+    try:
+        manifest = create_bundle(args.output, args.models)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    
+    print(f"Bundled {len(manifest['models'])} models in {os.path.abspath(args.output)}")
+    print(f"Set MODEL_BUNDLE_DIR={os.path.abspath(args.output)} to load them offline")
+    return 0
+
+
+def cmd_worker(args) -> int:
+    from services.job_broker import create_broker
+    from services.remote_workers import BrokerWorker, lane_priorities
+    
+    if args.broker.startswith('memory:'):
+        print("Error: a memory:// broker only exists inside the API process", file=sys.stderr)
+        return 2
+    
+    try:
+        broker = create_broker(args.broker, lane_priorities())
+        worker = BrokerWorker(broker, args.types, args.id)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+    
+    print(f"Worker {worker.worker_id} serving {', '.join(worker.analysis_types)} from {args.broker}")
+    try:
+        worker.serve()
+    except KeyboardInterrupt:
+        print(f"Worker {worker.worker_id} stopped after {worker.jobs_done} jobs")
+    finally:
+        broker.close()
+    return 0
+
+
+def cmd_scan(args) -> int:
+    from services.batch_scan import scan
+    
+    if not os.path.isdir(args.directory):
+        print(f"Error: {args.directory} is not a directory", file=sys.stderr)
+        return 2
+    
+    try:
+        counts = scan(args.directory, args.output, args.mode, args.workers,
+                      args.retry_errors, include_video=not args.images_only)
+    except KeyboardInterrupt:
+        print(f"Interrupted - rerun the same command to resume from {args.output}", file=sys.stderr)
+        return 130
+    
+    print(f"Scanned {counts['ok'] + counts['error']} files in {counts['seconds']}s "
+          f"({counts['ok']} ok, {counts['error']} failed, {counts['skipped']} already done)",
+          file=sys.stderr)
+    return 1 if counts['error'] else 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m veritas')
+    commands = parser.add_subparsers(dest='command', required=True)
+    
+    bundle = commands.add_parser('bundle', help='Download models into an offline, memory-mappable bundle')
+    bundle.add_argument('output', nargs='?', default=config.MODEL_BUNDLE_DIR or './model_bundle',
+                        help='Bundle directory (default: MODEL_BUNDLE_DIR or ./model_bundle)')
+    bundle.add_argument('--models', nargs='+', metavar='NAME',
+                        help='Only bundle these models (default: all)')
+    bundle.set_defaults(func=cmd_bundle)
+    
+    worker = commands.add_parser('worker', help='Run analysis jobs from a job broker')
+    worker.add_argument('--broker', default=config.JOB_BROKER_URL,
+                        help='Broker URL, e.g. redis://host:6379/0 or sqlite:///jobs.db (default: JOB_BROKER_URL)')
+    worker.add_argument('--types', nargs='+', metavar='TYPE',
+                        help='Only take these analysis types, e.g. image_comprehensive (default: all)')
+    worker.add_argument('--id', help='Worker ID reported to the API (default: host-pid-random)')
+    worker.set_defaults(func=cmd_worker)
+    
+    scan = commands.add_parser('scan', help='Analyze a directory tree in worker processes, one JSON line per file')
+    scan.add_argument('directory', help='Directory to scan (recursively)')
+    scan.add_argument('-o', '--output', default='scan.jsonl',
+                      help="JSONL output, also the checkpoint to resume from (default: scan.jsonl; '-' for stdout)")
+    scan.add_argument('--mode', choices=['quick', 'comprehensive'], default='comprehensive',
+                      help='Analysis depth (default: comprehensive)')
+    scan.add_argument('--workers', type=int, help='Worker processes (default: ANALYSIS_WORKERS)')
+    scan.add_argument('--retry-errors', action='store_true',
+                      help='Analyze files that failed in an earlier run again')
+    scan.add_argument('--images-only', action='store_true',
+                      help='Skip videos (and the video models)')
+    scan.set_defaults(func=cmd_scan)
+    
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())